@@ -0,0 +1,226 @@
+"""
+Admission control for the prediction endpoints.
+
+The endpoints are sync functions, so every request holds one of uvicorn's
+threadpool threads. Under a flood they queue there without bound and the
+latency of every request (health checks included) grows with the backlog.
+
+`AdmissionMiddleware` decides before the body is read or parsed. Each endpoint
+class (ENDPOINT_CLASSES) has its own in-flight limit and a short bounded wait
+queue:
+
+* `single` (one rider: /predict, /predict/sensitivity) may use up to ADMIT_SINGLE slots;
+* `batch` (/predict/batch, /predict/proba) at most ADMIT_BATCH (default: half
+  the CPU cores), so large requests can never occupy the threads and CPU the
+  small ones need.
+
+Single-rider requests have priority: a batch is not started while single
+requests are waiting, and a freed slot wakes waiting single requests first.
+A request that finds its class's queue full, or is still waiting after
+QUEUE_TIMEOUT_SECONDS, gets an immediate 503 with a Retry-After header, so the
+latency of admitted requests stays bounded by the limits instead of by the
+backlog. Everything else (/health, /info, /jobs, ...) is not gated.
+
+Oversize batches are shed by their Content-Length header, before a slot is
+taken and before the body is read: a body longer than the row limit
+(MAX_BATCH_ROWS, MAX_PROBA_ROWS) times MAX_ROW_BYTES gets a 413. A body under
+that bound is parsed, and the endpoint then checks the exact row count.
+
+All state lives on the event loop thread, so no locks are needed. `stats()`
+(GET /admission) reports, per class, in-flight and queued requests, the peak
+queue depth, admitted and rejected counts, and queue-wait and service-time
+percentiles of recent admitted requests.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+
+import numpy as np
+from starlette.responses import JSONResponse
+
+SINGLE, BATCH = "single", "batch"
+PRIORITY = (SINGLE, BATCH)
+ENDPOINT_CLASSES = {
+    ("POST", "/predict"): SINGLE,
+    ("POST", "/predict/sensitivity"): SINGLE,
+    ("POST", "/predict/batch"): BATCH,
+    ("POST", "/predict/proba"): BATCH,
+}
+ADMISSION_ENABLED = os.getenv("ADMISSION_CONTROL", "on").lower() not in ("0", "off", "false")
+# Batches are CPU-bound; half the cores (at least one) leaves the rest to single-rider requests
+IN_FLIGHT_LIMITS = {
+    SINGLE: int(os.getenv("ADMIT_SINGLE", "8")),
+    BATCH: int(os.getenv("ADMIT_BATCH", str(max(1, (os.cpu_count() or 2) // 2)))),
+}
+QUEUE_LIMITS = {SINGLE: int(os.getenv("QUEUE_SINGLE", "32")), BATCH: int(os.getenv("QUEUE_BATCH", "4"))}
+QUEUE_TIMEOUT_SECONDS = {SINGLE: 0.25, BATCH: 2.0}
+RETRY_AFTER_SECONDS = 1
+# Rows accepted in one request; larger tables belong in a /jobs upload
+MAX_BATCH_ROWS = int(os.getenv("MAX_BATCH_ROWS", "10000"))
+MAX_PROBA_ROWS = int(os.getenv("MAX_PROBA_ROWS", "200000"))
+ROW_LIMITS = {("POST", "/predict/batch"): MAX_BATCH_ROWS, ("POST", "/predict/proba"): MAX_PROBA_ROWS}
+# Upper bound of one row's JSON; a ChurnFeatures row with a user_id serializes to ~300 bytes
+MAX_ROW_BYTES = int(os.getenv("MAX_ROW_BYTES", "1024"))
+# Grid points of one /predict/sensitivity request; it runs in the single-rider class, so keep it small
+MAX_SENSITIVITY_POINTS = int(os.getenv("MAX_SENSITIVITY_POINTS", "1000"))
+RECENT = 2048  # admitted requests kept for the percentiles
+
+
+class _EndpointClass:
+    def __init__(self, name: str, limit: int, queue_limit: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.queue_limit = queue_limit
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiters = deque()
+        self.peak_queued = 0
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "timeout": 0}
+        self.wait_seconds = deque(maxlen=RECENT)
+        self.service_seconds = deque(maxlen=RECENT)
+
+    def stats(self) -> dict:
+        def ms(values, q):
+            return round(float(np.percentile(values, q)) * 1e3, 2) if values else None
+
+        return {
+            "in_flight": self.in_flight,
+            "queued": len(self.waiters),
+            "peak_queued": self.peak_queued,
+            "limits": {"in_flight": self.limit, "queue": self.queue_limit, "queue_timeout_s": self.queue_timeout},
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "queue_wait_ms": {"p50": ms(self.wait_seconds, 50), "p99": ms(self.wait_seconds, 99)},
+            "service_ms": {"p50": ms(self.service_seconds, 50), "p99": ms(self.service_seconds, 99)},
+        }
+
+
+class AdmissionController:
+    def __init__(self, limits: dict = IN_FLIGHT_LIMITS, queue_limits: dict = QUEUE_LIMITS,
+                 queue_timeouts: dict = QUEUE_TIMEOUT_SECONDS, enabled: bool = ADMISSION_ENABLED):
+        self.enabled = enabled
+        self.classes = {name: _EndpointClass(name, limits[name], queue_limits[name], queue_timeouts[name])
+                        for name in PRIORITY}
+
+    def _can_start(self, cls: _EndpointClass) -> bool:
+        if cls.in_flight >= cls.limit:
+            return False
+        # Waiting single-rider requests go first
+        return not any(self.classes[name].waiters for name in PRIORITY[:PRIORITY.index(cls.name)])
+
+    async def acquire(self, name: str) -> float | None:
+        """Seconds spent waiting for a slot, or None if the request must be rejected."""
+        cls = self.classes[name]
+        if not self.enabled or (self._can_start(cls) and not cls.waiters):
+            cls.in_flight += 1
+            cls.admitted += 1
+            return 0.0
+        if len(cls.waiters) >= cls.queue_limit:
+            cls.rejected["queue_full"] += 1
+            return None
+        start = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        cls.waiters.append(waiter)
+        cls.peak_queued = max(cls.peak_queued, len(cls.waiters))
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), cls.queue_timeout)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                cls.waiters.remove(waiter)
+                waiter.cancel()
+                cls.rejected["timeout"] += 1
+                self._dispatch()  # a waiting single request may have been all that held back a batch
+                return None
+        except BaseException:
+            # Cancelled while queued (client gone, shutdown, an outer timeout): give back the place or the slot
+            if not waiter.done():
+                cls.waiters.remove(waiter)
+                waiter.cancel()
+                self._dispatch()
+            else:
+                self.release(name)
+            raise
+        # The slot was handed over (and counted) by _dispatch
+        return time.perf_counter() - start
+
+    def release(self, name: str):
+        self.classes[name].in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """Hand free slots to waiting requests, single-rider requests first."""
+        for name in PRIORITY:
+            cls = self.classes[name]
+            while cls.waiters and cls.in_flight < cls.limit:
+                waiter = cls.waiters.popleft()
+                if waiter.done():
+                    continue
+                cls.in_flight += 1
+                cls.admitted += 1
+                waiter.set_result(None)
+            if cls.waiters:
+                return  # this class is still waiting, so lower-priority classes must too
+
+    def record(self, name: str, wait_seconds: float, service_seconds: float):
+        cls = self.classes[name]
+        cls.wait_seconds.append(wait_seconds)
+        cls.service_seconds.append(service_seconds)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "retry_after_s": RETRY_AFTER_SECONDS,
+            "max_rows": {"/predict/batch": MAX_BATCH_ROWS, "/predict/proba": MAX_PROBA_ROWS,
+                         "/predict/sensitivity": MAX_SENSITIVITY_POINTS},
+            "classes": {name: cls.stats() for name, cls in self.classes.items()},
+        }
+
+
+def _oversize(scope) -> str | None:
+    """Error detail when the declared body cannot fit the endpoint's row limit, else None."""
+    limit = ROW_LIMITS.get((scope["method"], scope["path"]))
+    length = dict(scope.get("headers") or []).get(b"content-length", b"")
+    if limit is None or not length.isdigit() or int(length) <= limit * MAX_ROW_BYTES:
+        return None
+    return (f"{int(length):,} bytes exceed the limit of {limit:,} rows per request; "
+            "split the request or submit the file to /jobs")
+
+
+class AdmissionMiddleware:
+    """
+    Pure ASGI middleware, so a rejected request (queue full, wait expired, or a
+    Content-Length over the row limit) costs no body read and no threadpool thread.
+    """
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        name = ENDPOINT_CLASSES.get((scope.get("method"), scope.get("path"))) if scope["type"] == "http" else None
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+        too_large = _oversize(scope)
+        if too_large is not None:
+            await JSONResponse({"detail": too_large}, status_code=413)(scope, receive, send)
+            return
+        waited = await self.controller.acquire(name)
+        if waited is None:
+            response = JSONResponse(
+                {"detail": f"Server busy ({name} requests); retry after {RETRY_AFTER_SECONDS} s"},
+                status_code=503, headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+            )
+            await response(scope, receive, send)
+            return
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(name)
+            self.controller.record(name, waited, time.perf_counter() - start)
+
+
+admission = AdmissionController()
@@ -0,0 +1,240 @@
+"""
+Audit log of every churn score served by /predict and /predict/batch.
+
+The request path only appends a reference to the rows it already built (input
+features, probabilities, risk levels, clusters, and the recommendation when
+one was served) to an in-memory ring buffer under a lock. The buffer holds at
+most AUDIT_BUFFER_ROWS rows; when the writer falls that far behind, the oldest
+entries are overwritten and counted as dropped, so memory stays bounded and a
+request never waits for the disk.
+
+One background thread wakes every AUDIT_FLUSH_SECONDS, or as soon as
+AUDIT_BATCH_ROWS rows are buffered, takes everything in the buffer and writes
+it in one transaction per AUDIT_BATCH_ROWS rows (group commit) to a SQLite
+database in WAL mode. Rows from /predict/batch, which serves no
+recommendation, get the one `ChurnModelService.recommendation` gives for their
+segment and risk. The table is append-only: triggers reject UPDATE and DELETE.
+On shutdown (`close`) the buffer is written before the connection is closed.
+
+A request whose rows cannot be turned into records, or a transaction that
+fails, is counted as failed and logged, and the writer carries on with the
+next one; `stats` (GET /audit) reports whether the writer thread is alive and
+its last error.
+
+`rider_history` reads a rider's scores through a separate read-only
+connection; WAL lets it run while the writer commits. Set AUDIT_DB_PATH to
+another file, or to an empty string to turn the audit log off.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+
+import pandas as pd
+
+from .model_loader import BASE_DIR, RAW_FEATURE_ORDER, model_service
+
+DEFAULT_AUDIT_PATH = BASE_DIR / "audit" / "predictions.db"
+AUDIT_BUFFER_ROWS = int(os.getenv("AUDIT_BUFFER_ROWS", "50000"))
+AUDIT_BATCH_ROWS = 5000       # rows per transaction; this many buffered rows wake the writer early
+AUDIT_FLUSH_SECONDS = float(os.getenv("AUDIT_FLUSH_SECONDS", "1.0"))
+HISTORY_LIMIT = 100
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = (["scored_at", "endpoint", "request_id", "model_version", "user_id"] + RAW_FEATURE_ORDER
+           + ["churn_probability", "risk_level", "recommendation", "cluster"])
+TYPES = {column: "TEXT" for column in COLUMNS}
+TYPES.update({column: "REAL" for column in RAW_FEATURE_ORDER[:8] + ["scored_at", "churn_probability"]})
+TYPES["cluster"] = "INTEGER"
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY,
+    {", ".join(f"{column} {kind}" for column, kind in TYPES.items())}
+);
+CREATE INDEX IF NOT EXISTS predictions_user ON predictions (user_id, scored_at);
+CREATE TRIGGER IF NOT EXISTS predictions_no_update BEFORE UPDATE ON predictions
+    BEGIN SELECT RAISE(ABORT, 'predictions is append-only'); END;
+CREATE TRIGGER IF NOT EXISTS predictions_no_delete BEFORE DELETE ON predictions
+    BEGIN SELECT RAISE(ABORT, 'predictions is append-only'); END;
+"""
+INSERT = f"INSERT INTO predictions ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+
+
+class AuditLog:
+    def __init__(self, service, path: Path = DEFAULT_AUDIT_PATH, buffer_rows: int = AUDIT_BUFFER_ROWS,
+                 flush_seconds: float = AUDIT_FLUSH_SECONDS):
+        self.service = service
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Durable against a crash of the process; a power loss can take the last commits
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+        self.buffer_rows = buffer_rows
+        self.flush_seconds = flush_seconds
+        self._buffer = deque()
+        self._buffered = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closing = False
+        self.submitted = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.transactions = 0
+        self._submit_seconds = 0.0
+        self._submit_calls = 0
+        self._last_flush = {"rows": 0, "ms": None}
+        self._last_error = None
+        self._worker = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._worker.start()
+
+    def submit(self, endpoint: str, rows: list[dict], probas: list[float], risks: list[str],
+               clusters: list, recommendations: list[str] | None = None):
+        """Buffer one served request; never blocks on the disk."""
+        start = time.perf_counter()
+        entry = (time.time(), endpoint, self.service.version, rows, probas, risks, clusters, recommendations)
+        with self._lock:
+            self._buffer.append(entry)
+            self._buffered += len(rows)
+            self.submitted += len(rows)
+            # Ring buffer: the oldest entries make room once the writer is this far behind
+            while self._buffered > self.buffer_rows and len(self._buffer) > 1:
+                oldest = self._buffer.popleft()
+                self._buffered -= len(oldest[3])
+                self.dropped += len(oldest[3])
+            wake = self._buffered >= AUDIT_BATCH_ROWS
+            self._submit_seconds += time.perf_counter() - start
+            self._submit_calls += 1
+        if wake:
+            self._wake.set()
+
+    def _run(self):
+        while not self._closing:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            self._safe_flush()
+        self._safe_flush()
+        self._conn.close()
+
+    def _safe_flush(self):
+        # _flush already isolates failures per request and per transaction; this keeps the thread alive regardless
+        try:
+            self._flush()
+        except Exception as e:
+            self._failure("flush", 0, e)
+
+    def _failure(self, what: str, rows: int, error: Exception):
+        self.failed += rows
+        self._last_error = {"at": time.time(), "what": what, "rows": rows, "error": repr(error)}
+        logger.error("Audit log: %s failed, %d row(s) not written: %r", what, rows, error)
+
+    def _records(self, entry: tuple) -> list[tuple]:
+        scored_at, endpoint, version, rows, probas, risks, clusters, recommendations = entry
+        request_id = uuid.uuid4().hex
+        records = []
+        for i, row in enumerate(rows):
+            recommendation = (recommendations[i] if recommendations is not None
+                              else self.service.recommendation(row["RFMS_segment"], risks[i]))
+            records.append((scored_at, endpoint, request_id, version, row.get("user_id"),
+                            *(row[f] for f in RAW_FEATURE_ORDER), float(probas[i]), risks[i], recommendation,
+                            None if clusters[i] is None else int(clusters[i])))
+        return records
+
+    def _flush(self):
+        with self._lock:
+            entries = list(self._buffer)
+            self._buffer.clear()
+            self._buffered = 0
+        if not entries:
+            return
+        start = time.perf_counter()
+        batch, n = [], 0
+        for entry in entries:
+            # One malformed request is dropped on its own; the rest of the buffer is still written
+            try:
+                batch.extend(self._records(entry))
+            except Exception as e:
+                self._failure(f"{entry[1]} request", len(entry[3]), e)
+            if len(batch) >= AUDIT_BATCH_ROWS:
+                n += self._commit(batch)
+                batch = []
+        if batch:
+            n += self._commit(batch)
+        self._last_flush = {"rows": n, "ms": round((time.perf_counter() - start) * 1e3, 2)}
+
+    def _commit(self, batch: list[tuple]) -> int:
+        # The connection autocommits (isolation_level=None), so the group commit is explicit
+        try:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(INSERT, batch)
+            self._conn.execute("COMMIT")
+        except Exception as e:
+            try:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            self._failure("transaction", len(batch), e)
+            return 0
+        self.written += len(batch)
+        self.transactions += 1
+        return len(batch)
+
+    def stats(self) -> dict:
+        with self._lock:
+            buffered = self._buffered
+        return {
+            "path": str(self.path),
+            "buffer": {"rows": buffered, "capacity": self.buffer_rows},
+            "rows": {"submitted": self.submitted, "written": self.written, "dropped": self.dropped,
+                     "failed": self.failed},
+            "transactions": self.transactions,
+            "flush_seconds": self.flush_seconds,
+            "last_flush": dict(self._last_flush),
+            "writer": {"alive": self._worker.is_alive(), "last_error": self._last_error},
+            "overhead": {"submit_us_mean": self._submit_seconds / max(self._submit_calls, 1) * 1e6},
+        }
+
+    def close(self, timeout: float = 10.0):
+        """Write what is buffered, then close the database."""
+        self._closing = True
+        self._wake.set()
+        self._worker.join(timeout)
+
+
+def rider_history(user_id: str, path: Path = DEFAULT_AUDIT_PATH, limit: int = HISTORY_LIMIT,
+                  since: str | None = None) -> pd.DataFrame:
+    """A rider's audited scores, newest first, from a read-only connection."""
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"No audit log at {path}")
+    query = f"SELECT {', '.join(COLUMNS)} FROM predictions WHERE user_id = ?"
+    params = [user_id]
+    if since is not None:
+        since = pd.Timestamp(since)
+        query += " AND scored_at >= ?"
+        params.append((since.tz_localize("UTC") if since.tzinfo is None else since).timestamp())
+    query += " ORDER BY scored_at DESC, id DESC LIMIT ?"
+    params.append(limit)
+    conn = sqlite3.connect(f"{path.as_uri()}?mode=ro", uri=True)
+    try:
+        df = pd.read_sql_query(query, conn, params=params)
+    finally:
+        conn.close()
+    df["scored_at"] = pd.to_datetime(df["scored_at"], unit="s", utc=True)
+    return df
+
+
+_audit_path = os.getenv("AUDIT_DB_PATH", str(DEFAULT_AUDIT_PATH))
+try:
+    audit_log = AuditLog(model_service, Path(_audit_path)) if model_service and _audit_path else None
+except (OSError, sqlite3.Error):
+    audit_log = None
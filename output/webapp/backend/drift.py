@@ -0,0 +1,221 @@
+"""
+Streaming drift monitor for the prediction path.
+
+Every scored row updates fixed-bin histograms, per city: one per numeric
+`ChurnFeatures` field (bin edges are the training deciles), the category counts
+of loyalty_status, RFMS_segment and city, and a 20-bin histogram of the predicted
+churn probability. An update is one broadcast comparison against the bin
+edges and one `bincount` per batch, and memory is fixed by the number of cities and bins.
+
+The training reference (edges and the same histograms for
+`riders_trips_rfms_churned`, scored by the live model) is written next to the
+model metadata by `python -m pipeline drift-reference` and by `pipeline train`.
+`report()` compares live counts with it using PSI and a binned two-sample KS
+statistic (the largest CDF gap at the bin edges).
+"""
+import threading
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from .model_loader import BASE_DIR
+
+DRIFT_REFERENCE_PATH = BASE_DIR / "model" / "drift_reference.joblib"
+
+NUMERIC_FEATURES = [
+    "recency", "total_trips", "avg_spend", "total_tip", "avg_tip",
+    "avg_rating_given", "avg_distance", "avg_duration",
+]
+CATEGORICAL_FEATURES = ["loyalty_status", "RFMS_segment", "city"]
+N_QUANTILE_BINS = 10
+SCORE_EDGES = np.linspace(0.0, 1.0, 21)[1:-1]  # interior edges of 20 equal-width bins
+OTHER = "__other__"
+ALL = "__all__"
+# Proportions are floored at this value so empty bins do not make PSI infinite
+PSI_EPSILON = 1e-4
+PSI_MODERATE, PSI_SIGNIFICANT = 0.1, 0.25
+
+
+class DriftHistograms:
+    """
+    Fixed-size counts per city group. All histograms of a group live in one row
+    of `counts` (numeric bins, then each categorical feature, then the score
+    bins), so a batch update is a single bincount; `numeric`, `categorical` and
+    `score` are views into it.
+    """
+
+    def __init__(self, groups: list[str], numeric_edges: list[np.ndarray], categories: dict[str, list[str]],
+                 counts: np.ndarray = None):
+        self.groups = list(groups)
+        self.numeric_edges = [np.asarray(e, dtype=np.float64) for e in numeric_edges]
+        self.categories = {f: list(c) for f, c in categories.items()}
+        self._group_index = {g: i for i, g in enumerate(self.groups)}
+        self._category_index = {f: {c: i for i, c in enumerate(cats)} for f, cats in self.categories.items()}
+
+        self._n_bins = max(len(e) for e in self.numeric_edges) + 1
+        self._edge_matrix = np.full((len(NUMERIC_FEATURES), self._n_bins - 1), np.inf)
+        for j, edges in enumerate(self.numeric_edges):
+            self._edge_matrix[j, :len(edges)] = edges
+        self._numeric_slot = np.arange(len(NUMERIC_FEATURES)) * self._n_bins
+        numeric_width = offset = len(NUMERIC_FEATURES) * self._n_bins
+        self._offsets = {}
+        for feature, cats in self.categories.items():
+            self._offsets[feature] = offset
+            offset += len(cats) + 1  # last slot counts values not seen in training
+        self._score_offset = offset
+        width = offset + len(SCORE_EDGES) + 1
+
+        shape = (len(self.groups), width)
+        self.counts = np.zeros(shape, dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+        if self.counts.shape != shape:
+            raise ValueError(f"Counts have shape {self.counts.shape}, expected {shape}")
+        # Splitting the last axis of a row slice is always a view, never a copy
+        self.numeric = self.counts[:, :numeric_width].reshape(len(self.groups), len(NUMERIC_FEATURES), self._n_bins)
+        self.categorical = {f: self.counts[:, o:o + len(self.categories[f]) + 1] for f, o in self._offsets.items()}
+        self.score = self.counts[:, self._score_offset:]
+
+    def update(self, numeric: np.ndarray, categorical: dict[str, list], proba: np.ndarray):
+        """Add a batch: `numeric` is (rows x NUMERIC_FEATURES), `categorical` maps feature -> values."""
+        other = self._group_index[OTHER]
+        base = np.array([self._group_index.get(c, other) for c in categorical["city"]], dtype=np.intp)
+        base *= self.counts.shape[1]
+        # Bin of x = number of edges <= x (searchsorted side="right"); padding edges are +inf
+        slots = [self._numeric_slot + (numeric[:, :, None] >= self._edge_matrix).sum(axis=2)]
+        slots.append(np.array([[self._offsets[f] + self._category_index[f].get(v, len(self.categories[f]))
+                                for f, v in zip(self.categories, values)]
+                               for values in zip(*(categorical[f] for f in self.categories))],
+                              dtype=np.intp).reshape(len(base), -1))
+        if proba is not None:
+            slots.append(self._score_offset + np.searchsorted(SCORE_EDGES, proba, side="right")[:, None])
+        flat = self.counts.reshape(-1)
+        flat += np.bincount((base[:, None] + np.hstack(slots)).ravel(), minlength=flat.size)
+
+    def group_counts(self, group: str):
+        """Copies of the (numeric, categorical, score) counts of one city group, or summed over all for ALL."""
+        if group == ALL:
+            return (self.numeric.sum(axis=0), {f: c.sum(axis=0) for f, c in self.categorical.items()},
+                    self.score.sum(axis=0))
+        i = self._group_index[group]
+        return self.numeric[i].copy(), {f: c[i].copy() for f, c in self.categorical.items()}, self.score[i].copy()
+
+
+def split_rows(rows) -> tuple[np.ndarray, dict[str, list]]:
+    """Numeric matrix and categorical value lists from a DataFrame or a list of feature dicts."""
+    if isinstance(rows, pd.DataFrame):
+        return (rows[NUMERIC_FEATURES].to_numpy(dtype=np.float64),
+                {f: rows[f].tolist() for f in CATEGORICAL_FEATURES})
+    numeric = np.array([[r[f] for f in NUMERIC_FEATURES] for r in rows], dtype=np.float64).reshape(-1, len(NUMERIC_FEATURES))
+    return numeric, {f: [r[f] for r in rows] for f in CATEGORICAL_FEATURES}
+
+
+def build_reference(df: pd.DataFrame, proba: np.ndarray) -> dict:
+    """Training histograms: decile edges per numeric feature, then the same counts the monitor keeps."""
+    numeric, categorical = split_rows(df)
+    quantiles = np.linspace(0, 1, N_QUANTILE_BINS + 1)[1:-1]
+    edges = [np.unique(np.quantile(numeric[:, j], quantiles)) for j in range(numeric.shape[1])]
+    categories = {f: sorted(pd.unique(df[f]).tolist()) for f in CATEGORICAL_FEATURES}
+    hist = DriftHistograms(categories["city"] + [OTHER], edges, categories)
+    hist.update(numeric, categorical, np.asarray(proba, dtype=np.float64))
+    return {
+        "groups": hist.groups,
+        "numeric_edges": hist.numeric_edges,
+        "categories": hist.categories,
+        "counts": hist.counts,
+        "rows": len(df),
+    }
+
+
+def save_reference(reference: dict, path: Path = DRIFT_REFERENCE_PATH) -> Path:
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    joblib.dump(reference, tmp)
+    tmp.replace(path)
+    return path
+
+
+def psi(expected: np.ndarray, actual: np.ndarray) -> float:
+    e = np.maximum(expected / max(expected.sum(), 1), PSI_EPSILON)
+    a = np.maximum(actual / max(actual.sum(), 1), PSI_EPSILON)
+    return float(((a - e) * np.log(a / e)).sum())
+
+
+def binned_ks(expected: np.ndarray, actual: np.ndarray) -> float:
+    return float(np.abs(np.cumsum(expected) / max(expected.sum(), 1) - np.cumsum(actual) / max(actual.sum(), 1)).max())
+
+
+def _status(value: float) -> str:
+    if value >= PSI_SIGNIFICANT:
+        return "significant"
+    if value >= PSI_MODERATE:
+        return "moderate"
+    return "stable"
+
+
+class DriftMonitor:
+    def __init__(self, path: Path = DRIFT_REFERENCE_PATH):
+        if not path.exists():
+            raise FileNotFoundError(f"Drift reference not found: {path}")
+        self.reference = joblib.load(path)
+        self._ref = DriftHistograms(self.reference["groups"], self.reference["numeric_edges"],
+                                    self.reference["categories"], self.reference["counts"])
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._live = DriftHistograms(self._ref.groups, self._ref.numeric_edges, self._ref.categories)
+
+    def update(self, rows, proba=None):
+        """Add scored rows (DataFrame or list of feature dicts) and their churn probabilities."""
+        numeric, categorical = split_rows(rows)
+        proba = None if proba is None else np.asarray(proba, dtype=np.float64)
+        with self._lock:
+            self._live.update(numeric, categorical, proba)
+
+    def report(self, city: str = None) -> dict:
+        """PSI and binned KS per feature and for the score, for one city or all traffic."""
+        group = ALL if city is None else (city if city in self._ref.groups else OTHER)
+        with self._lock:
+            live_numeric, live_categorical, live_score = self._live.group_counts(group)
+        ref_numeric, ref_categorical, ref_score = self._ref.group_counts(group)
+        rows = int(live_categorical["city"].sum())
+
+        features = {}
+        for j, feature in enumerate(NUMERIC_FEATURES):
+            n_bins = len(self._ref.numeric_edges[j]) + 1
+            expected, actual = ref_numeric[j, :n_bins], live_numeric[j, :n_bins]
+            value = psi(expected, actual) if rows else None
+            features[feature] = {"psi": value, "ks": binned_ks(expected, actual) if rows else None,
+                                 "status": _status(value) if rows else None}
+        for feature, categories in self._ref.categories.items():
+            expected, actual = ref_categorical[feature], live_categorical[feature]
+            value = psi(expected, actual) if rows else None
+            labels = categories + ["unseen"]
+            features[feature] = {
+                "psi": value,
+                "ks": None,
+                "status": _status(value) if rows else None,
+                "live_share": {c: float(n / max(actual.sum(), 1)) for c, n in zip(labels, actual)},
+                "reference_share": {c: float(n / max(expected.sum(), 1)) for c, n in zip(labels, expected)},
+            }
+        score_psi = psi(ref_score, live_score) if live_score.sum() else None
+        return {
+            "city": city,
+            "live_rows": rows,
+            "reference_rows": int(ref_score.sum()),
+            "features": features,
+            "churn_probability": {
+                "psi": score_psi,
+                "ks": binned_ks(ref_score, live_score) if live_score.sum() else None,
+                "status": _status(score_psi) if score_psi is not None else None,
+            },
+            "thresholds": {"moderate": PSI_MODERATE, "significant": PSI_SIGNIFICANT},
+        }
+
+
+try:
+    drift_monitor = DriftMonitor()
+except (FileNotFoundError, KeyError):
+    drift_monitor = None
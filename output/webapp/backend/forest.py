@@ -0,0 +1,192 @@
+"""
+Flattened tree-ensemble artifact and vectorized evaluator.
+
+`export_forest` packs every tree of a fitted sklearn RandomForestClassifier (or
+a single DecisionTreeClassifier) into contiguous node arrays in one file:
+
+    8-byte magic | uint64 header length | JSON header | 64-byte aligned arrays
+
+The arrays are `feature` (int32), `threshold` (float64), `left`/`right`
+(int32, global node ids, leaves point to themselves) and `value` (float64,
+P(class 1) at each node), plus `roots` (int32, one per tree). `FlatForest`
+maps the file read-only, so worker processes share its pages, and it has no
+dependency on the sklearn version that trained the model.
+
+Prediction walks all trees for a batch of rows level by level: one gather per
+level moves every active (row, tree) cursor to its child.
+Rows are cast to float32 before comparing, as sklearn's tree code does, so
+the leaves reached are the same as `predict_proba`'s.
+"""
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+MAGIC = b"RWFOREST"
+FORMAT_VERSION = 1
+ALIGN = 64
+# Rows per evaluation block; bounds the (rows x trees) cursor matrix
+EVAL_BATCH_ROWS = 4096
+# Tree levels advanced between removals of cursors that reached a leaf
+COMPACT_EVERY = 4
+
+_ARRAYS = {
+    "feature": np.int32,
+    "threshold": np.float64,
+    "left": np.int32,
+    "right": np.int32,
+    "value": np.float64,
+    "roots": np.int32,
+}
+
+
+def file_sha256(path: Path) -> str:
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def export_forest(model, path, source_sha256: str = None) -> Path:
+    """Write a fitted binary tree classifier/forest as a flat artifact."""
+    estimators = getattr(model, "estimators_", [model])
+    if list(model.classes_) != [0, 1]:
+        raise ValueError(f"Only binary 0/1 classifiers are supported, got classes {list(model.classes_)}")
+
+    parts = {name: [] for name in _ARRAYS}
+    offset = 0
+    max_depth = 0
+    for est in estimators:
+        tree = est.tree_
+        n = tree.node_count
+        ids = np.arange(n, dtype=np.int64) + offset
+        leaf = tree.children_left == -1
+        counts = tree.value[:, 0, :]
+        parts["feature"].append(np.where(leaf, 0, tree.feature))
+        parts["threshold"].append(np.where(leaf, 0.0, tree.threshold))
+        parts["left"].append(np.where(leaf, ids, tree.children_left + offset))
+        parts["right"].append(np.where(leaf, ids, tree.children_right + offset))
+        parts["value"].append(counts[:, 1] / counts.sum(axis=1))
+        parts["roots"].append([offset])
+        offset += n
+        max_depth = max(max_depth, tree.max_depth)
+    arrays = {name: np.ascontiguousarray(np.concatenate(parts[name]), dtype=dtype) for name, dtype in _ARRAYS.items()}
+    if offset > np.iinfo(np.int32).max:
+        raise ValueError("Forest has too many nodes for int32 node ids")
+
+    header = {
+        "format_version": FORMAT_VERSION,
+        "n_trees": len(estimators),
+        "n_nodes": offset,
+        "n_features": int(model.n_features_in_),
+        "max_depth": int(max_depth),
+        "feature_names": [str(f) for f in getattr(model, "feature_names_in_", [])],
+        "estimator": type(model).__name__,
+        "source_sha256": source_sha256,
+        "arrays": {},
+    }
+    # Offsets are relative to the first aligned byte after the header
+    position = 0
+    for name, arr in arrays.items():
+        header["arrays"][name] = {"offset": position, "dtype": arr.dtype.str, "length": len(arr)}
+        position += -(-arr.nbytes // ALIGN) * ALIGN
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = -(-(len(MAGIC) + 8 + len(header_bytes)) // ALIGN) * ALIGN
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(np.uint64(len(header_bytes)).tobytes())
+        f.write(header_bytes)
+        f.write(b"\0" * (data_start - f.tell()))
+        for name, arr in arrays.items():
+            f.seek(data_start + header["arrays"][name]["offset"])
+            f.write(arr.tobytes())
+        f.truncate(data_start + position)
+    tmp.replace(path)
+    return path
+
+
+class FlatForest:
+    """Read-only, memory-mapped forest with an sklearn-like `predict_proba`."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{self.path} is not a flattened forest file")
+            header_len = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+            self.header = json.loads(f.read(header_len))
+        if self.header["format_version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported forest format version {self.header['format_version']}")
+        data_start = -(-(len(MAGIC) + 8 + header_len) // ALIGN) * ALIGN
+        buffer = np.memmap(self.path, dtype=np.uint8, mode="r")
+        for name, spec in self.header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            start = data_start + spec["offset"]
+            view = buffer[start:start + spec["length"] * dtype.itemsize].view(dtype)
+            setattr(self, name, view)
+        self.n_trees = self.header["n_trees"]
+        self.max_depth = self.header["max_depth"]
+        self.n_features_in_ = self.header["n_features"]
+        self.feature_names_in_ = np.array(self.header["feature_names"], dtype=object)
+        self.classes_ = np.array([0, 1])
+
+        # Derived lookup tables (a few bytes per node), built once per process:
+        # children[2 * node + went_right] and a float32 threshold such that
+        # float32(x) <= threshold32  <=>  float32(x) <= threshold (float64)
+        self._children = np.column_stack([self.left, self.right]).ravel().astype(np.int32)
+        self._is_leaf = self.left == np.arange(len(self.left))
+        t32 = self.threshold.astype(np.float32)
+        self._threshold32 = np.where(t32 > self.threshold, np.nextafter(t32, np.float32(-np.inf)), t32)
+
+    def __repr__(self) -> str:
+        return (f"FlatForest({self.path.name}: {self.header['estimator']}, {self.n_trees} trees, "
+                f"{self.header['n_nodes']} nodes)")
+
+    def _to_matrix(self, X) -> np.ndarray:
+        if isinstance(X, pd.DataFrame) and len(self.feature_names_in_):
+            X = X[list(self.feature_names_in_)]
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has shape {X.shape}, but the forest expects {self.n_features_in_} features")
+        return X
+
+    def predict_churn_proba(self, X) -> np.ndarray:
+        """P(class 1) per row."""
+        X = self._to_matrix(X)
+        out = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), EVAL_BATCH_ROWS):
+            out[start:start + EVAL_BATCH_ROWS] = self._evaluate(X[start:start + EVAL_BATCH_ROWS])
+        return out
+
+    def _evaluate(self, X: np.ndarray) -> np.ndarray:
+        """
+        Advance all (row, tree) cursors one level per step. Leaves point to
+        themselves, so a cursor that has reached one stays put; every
+        COMPACT_EVERY steps finished cursors are dropped from the active set, so
+        later steps only touch the paths that are still descending.
+        """
+        n, n_features = X.shape
+        X_flat = X.ravel()
+        leaf = np.tile(self.roots, n)
+        active = np.arange(n * self.n_trees, dtype=np.int32)
+        node = leaf.copy()
+        row_base = (active // self.n_trees) * np.int32(n_features)
+        while active.size:
+            for _ in range(COMPACT_EVERY):
+                went_right = X_flat.take(row_base + self.feature.take(node)) > self._threshold32.take(node)
+                node = self._children.take(2 * node + went_right)
+            done = self._is_leaf.take(node)
+            leaf[active[done]] = node[done]
+            descending = np.flatnonzero(~done)
+            active, node, row_base = active[descending], node[descending], row_base[descending]
+        return self.value.take(leaf).reshape(n, self.n_trees).mean(axis=1)
+
+    def predict_proba(self, X) -> np.ndarray:
+        p = self.predict_churn_proba(X)
+        return np.column_stack([1.0 - p, p])
+
+    def predict(self, X) -> np.ndarray:
+        # argmax over [1 - p, p]; ties go to class 0 as in sklearn
+        return (self.predict_churn_proba(X) > 0.5).astype(int)
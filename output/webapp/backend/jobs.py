@@ -0,0 +1,323 @@
+"""
+Asynchronous bulk-scoring jobs.
+
+`POST /jobs` stores the uploaded CSV in its own directory under JOBS_DIR (or
+records a server-side path under JOBS_INPUT_ROOT, accepted only when that
+variable is set) and returns at once. A fixed pool of worker threads scores queued jobs in chunks of JOB_CHUNK_ROWS rows
+with the live `ChurnModelService` (one vectorized call per chunk) and appends each
+chunk to `result.csv.part`. After every chunk the job's `state.json` (rows done and
+the byte length of the partial result) is rewritten atomically. A restart resumes
+queued and running jobs from the last completed chunk, and `result.csv` appears
+only once every row is scored.
+
+Rows are validated per chunk against the `ChurnFeatures` constraints, as
+/predict/batch does: a row with a missing or non-numeric value, a value out of
+range or an empty category is written with an `error` message and no score,
+and counted in `rows_invalid`, instead of failing the whole job.
+
+Cancellation takes effect between chunks. Each client (the X-Client-Id header,
+or the remote address) may have at most JOBS_PER_CLIENT queued or running jobs,
+and the server at most JOB_QUEUE_LIMIT. Bulk jobs are not live traffic, so the
+shadow scorer and drift monitor skip them.
+"""
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .model_loader import BASE_DIR, RAW_FEATURE_ORDER, model_service
+from .schema import ChurnFeatures
+from .segmentation import segment_assigner
+from .shadow import RISK_BANDS, risk_bands
+
+JOBS_DIR = Path(os.getenv("JOBS_DIR", BASE_DIR / "jobs"))
+# Server-side inputs must resolve inside this directory; without it only uploads are accepted
+JOBS_INPUT_ROOT = Path(os.environ["JOBS_INPUT_ROOT"]).resolve() if os.getenv("JOBS_INPUT_ROOT") else None
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_CHUNK_ROWS = 5000
+JOB_QUEUE_LIMIT = 64  # queued + running jobs, all clients
+JOBS_PER_CLIENT = 2   # queued + running jobs per client
+RETRY_AFTER_SECONDS = 30
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+ACTIVE = {QUEUED, RUNNING}
+
+
+class JobLimitError(Exception):
+    """The client or the server already has the maximum number of active jobs."""
+
+
+def count_rows(path: Path) -> int:
+    """Data rows of a CSV (lines after the header), counted in 1 MiB blocks."""
+    lines, last = 0, b"\n"
+    with open(path, "rb") as f:
+        while block := f.read(1 << 20):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    lines += last != b"\n"  # final line without a newline
+    return max(lines - 1, 0)
+
+
+def _bounds() -> dict[str, tuple[float, float]]:
+    """(lower, upper) of every numeric feature, from the Field constraints of ChurnFeatures."""
+    bounds = {}
+    for name, field in ChurnFeatures.model_fields.items():
+        if field.annotation is not float:
+            continue
+        lower = next((m.ge for m in field.metadata if hasattr(m, "ge")), -np.inf)
+        upper = next((m.le for m in field.metadata if hasattr(m, "le")), np.inf)
+        bounds[name] = (lower, upper)
+    return bounds
+
+
+NUMERIC_BOUNDS = _bounds()
+CATEGORICAL = [c for c in RAW_FEATURE_ORDER if c not in NUMERIC_BOUNDS]
+
+
+def validate_rows(chunk: pd.DataFrame) -> pd.Series:
+    """Per row, a message naming the invalid features, or an empty string."""
+    problems = []
+    for column, (lower, upper) in NUMERIC_BOUNDS.items():
+        values = pd.to_numeric(chunk[column], errors="coerce").to_numpy(dtype=np.float64)
+        with np.errstate(invalid="ignore"):
+            bad = ~np.isfinite(values) | (values < lower) | (values > upper)
+        problems.append(np.where(bad, f"{column}; ", ""))
+    for column in CATEGORICAL:
+        text = chunk[column].astype(object)
+        bad = text.isna().to_numpy() | (text.astype(str).str.strip() == "").to_numpy()
+        problems.append(np.where(bad, f"{column}; ", ""))
+    joined = pd.Series(np.sum(np.array(problems, dtype=object), axis=0), index=chunk.index, dtype=object)
+    return joined.where(joined == "", "invalid: " + joined.str.rstrip("; "))
+
+
+def _write_json(path: Path, data: dict):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data, indent=2))
+    tmp.replace(path)
+
+
+class JobManager:
+    def __init__(self, service, jobs_dir: Path = JOBS_DIR, workers: int = JOB_WORKERS,
+                 chunk_rows: int = JOB_CHUNK_ROWS, assigner=None):
+        self.service = service
+        self.assigner = assigner
+        self.dir = Path(jobs_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.chunk_rows = chunk_rows
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._cancelled = set()
+        self._stopping = threading.Event()
+        self._queue = queue.Queue()
+        self._recover()
+        self._workers = [threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+                         for i in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def _recover(self):
+        """Reload every job from disk and re-queue the unfinished ones, oldest first."""
+        states = []
+        for path in self.dir.glob("*/state.json"):
+            try:
+                states.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue
+        for state in sorted(states, key=lambda s: s["created_at"]):
+            self._jobs[state["id"]] = state
+            if state["status"] in ACTIVE:
+                state["status"] = QUEUED
+                self._save(state)
+                self._queue.put(state["id"])
+
+    def _save(self, state: dict):
+        state["updated_at"] = time.time()
+        _write_json(self.dir / state["id"] / "state.json", state)
+
+    def _update(self, job_id: str, **changes) -> dict:
+        with self._lock:
+            state = self._jobs[job_id]
+            state.update(changes)
+            self._save(state)
+            return dict(state)
+
+    def submit(self, client: str, upload=None, filename: str = None, path: str = None) -> dict:
+        """Register a job for an uploaded file object or a server-side path and queue it."""
+        if (upload is None) == (path is None):
+            raise ValueError("Send either a file or a server-side path")
+        if path is not None:
+            if JOBS_INPUT_ROOT is None:
+                raise ValueError("Server-side paths are disabled; upload the file or set JOBS_INPUT_ROOT")
+            source = Path(path)
+            source = (source if source.is_absolute() else JOBS_INPUT_ROOT / source).resolve()
+            if not source.is_relative_to(JOBS_INPUT_ROOT):
+                raise ValueError("Path must be inside JOBS_INPUT_ROOT")
+            # Never another job's upload or result, even when the jobs live under the input root
+            if source.is_relative_to(self.dir.resolve()):
+                raise ValueError("Path must not point into the jobs directory")
+            if not source.is_file():
+                raise FileNotFoundError(f"No such file: {path}")
+
+        job_id = uuid.uuid4().hex
+        job_dir = self.dir / job_id
+        with self._lock:
+            active = [s for s in self._jobs.values() if s["status"] in ACTIVE]
+            if len(active) >= JOB_QUEUE_LIMIT:
+                raise JobLimitError(f"{len(active)} jobs are queued or running; try again later")
+            if sum(s["client"] == client for s in active) >= JOBS_PER_CLIENT:
+                raise JobLimitError(f"Client already has {JOBS_PER_CLIENT} active jobs")
+            state = {
+                "id": job_id,
+                "client": client,
+                "status": QUEUED,
+                "input": str(source) if path is not None else str(job_dir / "input.csv"),
+                "filename": filename or (source.name if path is not None else "input.csv"),
+                "chunk_rows": self.chunk_rows,
+                "rows_total": None,
+                "rows_done": 0,
+                "rows_invalid": 0,
+                "result_bytes": 0,
+                "error": None,
+                "model_version": self.service.version,
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+            }
+            job_dir.mkdir()
+            self._jobs[job_id] = state
+        try:
+            if upload is not None:
+                with open(job_dir / "input.csv", "wb") as f:
+                    shutil.copyfileobj(upload, f, 1 << 20)
+            state = self._update(job_id)
+        except OSError as e:
+            self._update(job_id, status=FAILED, error=f"Could not store the upload: {e}", finished_at=time.time())
+            raise
+        self._queue.put(job_id)
+        return state
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            state = self._jobs.get(job_id)
+            return None if state is None else dict(state)
+
+    def cancel(self, job_id: str) -> dict | None:
+        """Cancel a queued job now, or a running one after its current chunk."""
+        with self._lock:
+            state = self._jobs.get(job_id)
+            if state is None:
+                return None
+            if state["status"] == QUEUED:
+                state.update(status=CANCELLED, finished_at=time.time())
+                self._save(state)
+            elif state["status"] == RUNNING:
+                self._cancelled.add(job_id)
+            return dict(state)
+
+    def result_path(self, job_id: str) -> Path:
+        return self.dir / job_id / "result.csv"
+
+    def summary(self) -> dict:
+        with self._lock:
+            counts = {}
+            for state in self._jobs.values():
+                counts[state["status"]] = counts.get(state["status"], 0) + 1
+        return {"workers": len(self._workers), "chunk_rows": self.chunk_rows, "jobs": counts,
+                "limits": {"per_client": JOBS_PER_CLIENT, "server": JOB_QUEUE_LIMIT}}
+
+    def _run(self):
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            try:
+                self._process(job_id)
+            except Exception as e:
+                self._update(job_id, status=FAILED, error=f"{type(e).__name__}: {e}", finished_at=time.time())
+
+    def _process(self, job_id: str):
+        state = self.get(job_id)
+        if state is None or state["status"] != QUEUED:
+            return
+        input_path = Path(state["input"])
+        if state["rows_total"] is None:
+            state["rows_total"] = count_rows(input_path)
+        state = self._update(job_id, status=RUNNING, rows_total=state["rows_total"],
+                             started_at=state["started_at"] or time.time())
+        done, invalid = state["rows_done"], state.get("rows_invalid", 0)
+        part_path = self.dir / job_id / "result.csv.part"
+        with open(part_path, "r+b" if part_path.exists() else "w+b") as out:
+            # Drop anything written after the last recorded chunk (a crash mid-write)
+            out.truncate(state["result_bytes"])
+            out.seek(state["result_bytes"])
+            # Rows already scored are dropped from the parsed chunks, so the skip counts CSV
+            # records whatever their line breaks (skiprows is documented in lines, and a
+            # range of millions of rows becomes a set of that many ints)
+            skip = done
+            for chunk in pd.read_csv(input_path, chunksize=state["chunk_rows"]):
+                if skip >= len(chunk):
+                    skip -= len(chunk)
+                    continue
+                chunk, skip = chunk.iloc[skip:], 0
+                if job_id in self._cancelled:
+                    self._cancelled.discard(job_id)
+                    self._update(job_id, status=CANCELLED, finished_at=time.time())
+                    return
+                if self._stopping.is_set():
+                    return  # left as running on disk; resumed on the next start
+                scored = self._score(chunk)
+                scored.to_csv(out, header=done == 0, index=False, lineterminator="\n")
+                out.flush()
+                os.fsync(out.fileno())
+                done += len(chunk)
+                invalid += int((scored["error"] != "").sum())
+                self._update(job_id, rows_done=done, rows_invalid=invalid, result_bytes=out.tell())
+        part_path.replace(self.result_path(job_id))
+        self._cancelled.discard(job_id)
+        self._update(job_id, status=SUCCEEDED, rows_total=done, finished_at=time.time())
+
+    def _score(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        missing = [c for c in RAW_FEATURE_ORDER if c not in chunk.columns]
+        if missing:
+            raise ValueError(f"Missing columns: {missing}")
+        error = validate_rows(chunk)
+        valid = (error == "").to_numpy()
+        # Only valid rows reach the model; invalid ones keep empty score columns
+        features = chunk.loc[valid, RAW_FEATURE_ORDER].astype({c: np.float64 for c in NUMERIC_BOUNDS})
+        proba = np.full(len(chunk), np.nan)
+        label = pd.array([pd.NA] * len(chunk), dtype="Int64")
+        risk = np.full(len(chunk), None, dtype=object)
+        if valid.any():
+            proba[valid] = self.service.predict_proba_frame(features)
+            label[valid] = (proba[valid] >= self.service.threshold).astype(int)
+            risk[valid] = np.asarray(RISK_BANDS, dtype=object)[
+                risk_bands(proba[valid], self.service.threshold, self.service.thr_mid)]
+        scored = chunk.assign(churn_probability=proba, churn_label=label, risk_level=risk)
+        if self.assigner is not None:
+            cluster = pd.array([pd.NA] * len(chunk), dtype="Int64")
+            if valid.any():
+                cluster[valid] = self.assigner.assign(features)
+            scored["cluster"] = cluster
+        scored["error"] = error.to_numpy()
+        return scored
+
+    def close(self, timeout: float = 5.0):
+        """Stop after the current chunks; unfinished jobs resume on the next start."""
+        self._stopping.set()
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout)
+
+
+try:
+    job_manager = JobManager(model_service, assigner=segment_assigner) if model_service else None
+except OSError:
+    job_manager = None
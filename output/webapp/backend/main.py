@@ -1,9 +1,33 @@
 """RideWise Churn Prediction API - FastAPI backend."""
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+
+import pandas as pd
+from fastapi import FastAPI, File, Form, Header, HTTPException, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse
+from pydantic import ValidationError
+
+from .admission import MAX_BATCH_ROWS, MAX_PROBA_ROWS, MAX_SENSITIVITY_POINTS, AdmissionMiddleware, admission
+from .audit import HISTORY_LIMIT, audit_log, rider_history
+from .drift import drift_monitor
+from .jobs import RETRY_AFTER_SECONDS, SUCCEEDED, JobLimitError, job_manager
+from .schema import ChurnFeatures, ChurnPredictionResponse, SensitivityRequest
+from .model_loader import RAW_FEATURE_ORDER, model_service
+from .segmentation import segment_assigner
+from .sensitivity import categorical_levels, curves, resolve_grid, sensitivity_frame
+from .shadow import RISK_BANDS, risk_bands, shadow_scorer
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    if job_manager is not None:
+        job_manager.close()
+    if shadow_scorer is not None:
+        shadow_scorer.close()
+    if audit_log is not None:
+        audit_log.close()
 
-from .schema import ChurnFeatures, ChurnPredictionResponse
-from .model_loader import model_service
 
 app = FastAPI(
     title="RideWise Churn Prediction API",
@@ -11,8 +35,11 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
+# Added before CORS so that CORS wraps it and 503 rejections carry the CORS headers too
+app.add_middleware(AdmissionMiddleware, controller=admission)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -40,9 +67,21 @@ def info():
         "version": "1.0.0",
         "threshold": model_service.threshold,
         "feature_count": len(model_service.feature_columns),
+        "model_version": model_service.version,
+        "segmentation": None if segment_assigner is None else {
+            "clusters": segment_assigner.k,
+            "features": segment_assigner.features,
+            "algorithm": segment_assigner.algorithm,
+        },
     }
 
 
+def _check_rows(rows: list, limit: int):
+    if len(rows) > limit:
+        raise HTTPException(413, f"{len(rows):,} rows exceed the limit of {limit:,} per request; "
+                                 "split the request or submit the file to /jobs")
+
+
 @app.post("/predict", response_model=ChurnPredictionResponse)
 def predict_churn(features: ChurnFeatures):
     """Predict churn probability and label for a single rider."""
@@ -56,6 +95,14 @@ def predict_churn(features: ChurnFeatures):
         risk = model_service.risk_level(proba, model_service.threshold, model_service.thr_mid)
         
         recommendation = model_service.recommendation(features_dict["RFMS_segment"], risk)
+
+        cluster = None if segment_assigner is None else int(segment_assigner.assign([features_dict])[0])
+        if shadow_scorer is not None:
+            shadow_scorer.submit([features_dict], [proba])
+        if drift_monitor is not None:
+            drift_monitor.update([features_dict], [proba])
+        if audit_log is not None:
+            audit_log.submit("/predict", [features_dict], [proba], [risk], [cluster], [recommendation])
         
         print(f"Churn probability: {proba})")
         print(f"Churn label: {label}")
@@ -68,6 +115,7 @@ def predict_churn(features: ChurnFeatures):
             threshold=model_service.threshold,
             risk_level=risk,
             recommendation=recommendation,
+            cluster=cluster,
         )
     except Exception as e:
         raise HTTPException(500, detail=f"Prediction failed: {type(e).__name__}: {e}")
@@ -78,15 +126,213 @@ def predict_batch(features_list: list[ChurnFeatures]):
     """Batch predict churn for multiple riders."""
     if model_service is None:
         raise HTTPException(503, "Model not loaded. Train and save the model first.")
+    _check_rows(features_list, MAX_BATCH_ROWS)
+    rows = [f.model_dump() for f in features_list]
+    # One vectorized nearest-centroid lookup and one model call for the whole batch
+    clusters = segment_assigner.assign(rows).tolist() if segment_assigner is not None and rows else [None] * len(rows)
+    probas = model_service.predict_proba_frame(pd.DataFrame(rows, columns=RAW_FEATURE_ORDER)).tolist() if rows else []
     results = []
-    for f in features_list:
-        d = f.model_dump()
-        label, proba = model_service.predict_label(d)
-        risk = model_service.risk_level(proba)
+    for proba, cluster in zip(probas, clusters):
+        risk = model_service.risk_level(proba, model_service.threshold, model_service.thr_mid)
         results.append({
             "churn_probability": proba,
-            "churn_label": label,
+            "churn_label": int(proba >= model_service.threshold),
             "threshold": model_service.threshold,
             "risk_level": risk,
+            "cluster": cluster,
         })
+    if shadow_scorer is not None and rows:
+        shadow_scorer.submit(rows, probas)
+    if drift_monitor is not None and rows:
+        drift_monitor.update(rows, probas)
+    if audit_log is not None and rows:
+        audit_log.submit("/predict/batch", rows, probas, [r["risk_level"] for r in results], clusters)
     return {"predictions": results, "count": len(results)}
+
+
+@app.post("/predict/proba")
+def predict_proba_table(features_list: list[ChurnFeatures]):
+    """
+    Churn probabilities only, for scoring a whole rider table (e.g. the Exposure
+    Analysis page) in one model call. Not live traffic, so /shadow and /drift skip it.
+    """
+    if model_service is None:
+        raise HTTPException(503, "Model not loaded. Train and save the model first.")
+    _check_rows(features_list, MAX_PROBA_ROWS)
+    rows = [f.model_dump() for f in features_list]
+    probas = model_service.predict_proba_frame(pd.DataFrame(rows, columns=RAW_FEATURE_ORDER)).tolist() if rows else []
+    return {
+        "churn_probability": probas,
+        "threshold": model_service.threshold,
+        "model_version": model_service.version,
+        "count": len(probas),
+    }
+
+
+@app.post("/predict/sensitivity")
+def predict_sensitivity(request: SensitivityRequest):
+    """
+    What-if curves for one rider: churn probability and risk band at every grid
+    value of each requested feature, all other features held at the rider's
+    values. The rider and the whole grid are scored in one model call. Not live
+    traffic, so /shadow and /drift skip it.
+    """
+    if model_service is None:
+        raise HTTPException(503, "Model not loaded. Train and save the model first.")
+    rider = request.rider.model_dump()
+    try:
+        grid = resolve_grid(request.grid, categorical_levels(model_service.preprocessor))
+        points = sum(len(values) for values in grid.values())
+        if points > MAX_SENSITIVITY_POINTS:
+            raise HTTPException(413, f"{points:,} grid points exceed the limit of {MAX_SENSITIVITY_POINTS:,}")
+        # The rider itself goes first, as the baseline
+        X = pd.concat([pd.DataFrame([rider], columns=RAW_FEATURE_ORDER), sensitivity_frame(rider, grid)],
+                      ignore_index=True)
+    except ValidationError as e:
+        raise HTTPException(422, detail=e.errors(include_url=False, include_context=False))
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+    proba = model_service.predict_proba_frame(X)
+    threshold, thr_mid = model_service.threshold, model_service.thr_mid
+    return {
+        "baseline": {
+            "churn_probability": float(proba[0]),
+            "risk_level": RISK_BANDS[int(risk_bands(proba[:1], threshold, thr_mid)[0])],
+        },
+        "curves": curves(grid, proba[1:], threshold, thr_mid),
+        "threshold": threshold,
+        "thr_mid": thr_mid,
+        "model_version": model_service.version,
+        "count": points,
+    }
+
+
+@app.get("/shadow")
+def shadow_stats():
+    """Running agreement between the live model and the shadow challenger."""
+    if shadow_scorer is None:
+        raise HTTPException(404, "Shadow scoring is disabled (no challenger model, or SHADOW_MODEL_PATH is empty).")
+    return shadow_scorer.stats()
+
+
+@app.get("/drift")
+def drift(city: str | None = None):
+    """PSI / binned KS of the traffic scored since startup against the training distributions."""
+    if drift_monitor is None:
+        raise HTTPException(404, "No drift reference. Run `python -m pipeline drift-reference` first.")
+    return drift_monitor.report(city)
+
+
+@app.get("/admission")
+def admission_stats():
+    """In-flight and queued requests, rejections and latency percentiles per endpoint class."""
+    return admission.stats()
+
+
+@app.get("/audit")
+def audit_stats():
+    """Audit log buffer, rows written, dropped and failed, group commits, writer liveness and the request-path overhead."""
+    if audit_log is None:
+        raise HTTPException(404, "The audit log is disabled (model not loaded, or AUDIT_DB_PATH is empty).")
+    return audit_log.stats()
+
+
+@app.get("/audit/riders/{user_id}")
+def audit_rider_history(user_id: str, limit: int = HISTORY_LIMIT, since: str | None = None):
+    """A rider's audited scores, newest first. Rows still in the buffer appear after the next flush."""
+    if audit_log is None:
+        raise HTTPException(404, "The audit log is disabled (model not loaded, or AUDIT_DB_PATH is empty).")
+    try:
+        history = rider_history(user_id, audit_log.path, limit=limit, since=since)
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+    history["scored_at"] = history["scored_at"].map(lambda ts: ts.isoformat())
+    # NULL clusters come back as NaN, which JSON cannot carry
+    history = history.astype(object).where(history.notna(), None)
+    return {"user_id": user_id, "count": len(history), "scores": history.to_dict(orient="records")}
+
+
+def _job_view(state: dict) -> dict:
+    total = state["rows_total"]
+    return {
+        # Internal bookkeeping and the submitting client's address or id stay on the server
+        **{k: v for k, v in state.items() if k not in ("input", "result_bytes", "client")},
+        "progress": state["rows_done"] / total if total else (1.0 if state["status"] == SUCCEEDED else 0.0),
+        "result_url": f"/jobs/{state['id']}/result" if state["status"] == SUCCEEDED else None,
+    }
+
+
+def _require_jobs():
+    if job_manager is None:
+        raise HTTPException(503, "Model not loaded. Train and save the model first.")
+
+
+@app.post("/jobs", status_code=202)
+def create_job(
+    request: Request,
+    file: UploadFile | None = File(None),
+    path: str | None = Form(None),
+    x_client_id: str | None = Header(None),
+):
+    """
+    Queue a bulk-scoring job for an uploaded CSV (`file`) or a CSV already on the
+    server (`path`, relative to JOBS_INPUT_ROOT; only when that is set) with the 11 feature columns.
+    Poll GET /jobs/{id}; the scored CSV is at `result_url` once it succeeds.
+    """
+    _require_jobs()
+    client = x_client_id or (request.client.host if request.client else "unknown")
+    try:
+        state = job_manager.submit(
+            client,
+            upload=file.file if file is not None else None,
+            filename=file.filename if file is not None else None,
+            path=path,
+        )
+    except JobLimitError as e:
+        return JSONResponse({"detail": str(e)}, status_code=429,
+                            headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+    except FileNotFoundError as e:
+        raise HTTPException(404, str(e))
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+    return _job_view(state)
+
+
+@app.get("/jobs")
+def jobs_summary():
+    """Worker pool size, limits and job counts by status."""
+    _require_jobs()
+    return job_manager.summary()
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Status and progress of a job, with the result location once it has succeeded."""
+    _require_jobs()
+    state = job_manager.get(job_id)
+    if state is None:
+        raise HTTPException(404, f"Unknown job {job_id}")
+    return _job_view(state)
+
+
+@app.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    """Cancel a queued job, or stop a running one after its current chunk."""
+    _require_jobs()
+    state = job_manager.cancel(job_id)
+    if state is None:
+        raise HTTPException(404, f"Unknown job {job_id}")
+    return _job_view(state)
+
+
+@app.get("/jobs/{job_id}/result")
+def job_result(job_id: str):
+    """The input rows with churn_probability, churn_label, risk_level and cluster, as CSV."""
+    _require_jobs()
+    state = job_manager.get(job_id)
+    if state is None:
+        raise HTTPException(404, f"Unknown job {job_id}")
+    if state["status"] != SUCCEEDED:
+        raise HTTPException(409, f"Job is {state['status']}")
+    return FileResponse(job_manager.result_path(job_id), media_type="text/csv",
+                        filename=f"predictions_{state['filename']}")
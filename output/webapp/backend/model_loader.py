@@ -1,9 +1,12 @@
 """Load and serve the churn prediction model using preprocessor + model from 03_SHAP Explainability."""
+import hashlib
 import joblib
 from pathlib import Path
 
 import pandas as pd
 
+from .forest import FlatForest, file_sha256
+
 # Webapp root (directory containing backend/, frontend/, model/)
 BASE_DIR = Path(__file__).resolve().parent.parent
 PREPROCESSOR_PATH = BASE_DIR / "model" / "preprocessor.joblib"
@@ -22,6 +25,33 @@ def _patch_tree_monotonic_cst(estimator):
             pass
 
 
+def load_model(path: Path):
+    """
+    Load a classifier saved with joblib. Tree ensembles exported with
+    `python -m pipeline export-forest` have a `.forest` file next to the joblib
+    file; it is memory-mapped instead of unpickled when it was exported from
+    exactly this joblib file (same SHA-256).
+    """
+    flat_path = path.with_suffix(".forest")
+    if flat_path.exists():
+        try:
+            forest = FlatForest(flat_path)
+            if forest.header.get("source_sha256") == file_sha256(path):
+                return forest
+        except (ValueError, KeyError):
+            pass  # unreadable or older format: fall back to the pickle
+    model = joblib.load(path)
+    _patch_tree_monotonic_cst(model)
+    return model
+
+
+def model_version() -> str:
+    """Short content hash of the deployed preprocessor, model and metadata files."""
+    digest = hashlib.sha256()
+    for path in (PREPROCESSOR_PATH, MODEL_PATH, METADATA_PATH):
+        digest.update(file_sha256(path).encode())
+    return digest.hexdigest()[:12]
+
 
 # Column order for raw features (must match 03_SHAP X before transform)
 RAW_FEATURE_ORDER = [
@@ -63,14 +93,14 @@ class ChurnModelService:
                 f"Preprocessor not found. Save it from 03_SHAP Explainability to {PREPROCESSOR_PATH}"
             )
         try:
-            self.model = joblib.load(MODEL_PATH)
+            # Patches sklearn DecisionTree/RandomForest models missing monotonic_cst
+            self.model = load_model(MODEL_PATH)
             print(f"self.model: {self.model}")
-            _patch_tree_monotonic_cst(self.model)
-            # Patch for sklearn DecisionTree/RandomForest models missing monotonic_cst
             self.metadata = joblib.load(METADATA_PATH)
             self.preprocessor = joblib.load(PREPROCESSOR_PATH)
             self.threshold = self.metadata.get("business_threshold", 0.35)
             self.feature_columns = self.metadata.get("feature_columns", [])
+            self.version = model_version()
         except Exception as e:
             raise RuntimeError(f"Failed to load model or preprocessor: {e}")
         self._loaded = True
@@ -108,6 +138,12 @@ class ChurnModelService:
             raise
         return proba
 
+    def predict_proba_frame(self, X: pd.DataFrame):
+        """P(churn) for every row of a raw-feature DataFrame, in one preprocessor and model call."""
+        X_t = pd.DataFrame(self.preprocessor.transform(X[RAW_FEATURE_ORDER]),
+                           columns=self.preprocessor.get_feature_names_out())
+        return self.model.predict_proba(X_t)[:, 1]
+
     def predict_label(self, features_dict: dict) -> tuple[int, float]:
         proba = self.predict_proba(features_dict)
         label = int(proba >= self.threshold)
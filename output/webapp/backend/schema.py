@@ -19,8 +19,16 @@ class ChurnFeatures(BaseModel):
     loyalty_status: str = Field(description="Bronze | Silver | Gold | Platinum")
     RFMS_segment: str = Field(description="At Risk | Occasional Riders | Core Loyal Riders | High-Value Surge-Tolerant")
     city: str = Field(description="Cairo | Lagos | Nairobi")
+    user_id: str | None = Field(default=None, description="Rider id, recorded with the score in the audit log")
 
 
+class SensitivityRequest(BaseModel):
+    """One rider and, per feature to vary, the values to try (empty list: every known category)."""
+    rider: ChurnFeatures
+    grid: dict[str, list[float | str]] = Field(
+        description='Feature -> grid values, e.g. {"recency": [0, 10, ..., 90], "loyalty_status": []}'
+    )
+
 
 class ChurnPredictionResponse(BaseModel):
     churn_probability: float
@@ -28,3 +36,4 @@ class ChurnPredictionResponse(BaseModel):
     threshold: float
     risk_level: str  # Low, Medium, High, Critical
     recommendation: str = ""  # Suggested action based on segment and risk
+    cluster: int | None = None  # Behavioural cluster (None when no segmentation artifact is deployed)
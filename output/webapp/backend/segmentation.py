@@ -0,0 +1,58 @@
+"""Assign riders to the behavioural clusters fitted by `python -m pipeline segment`."""
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+SEGMENTATION_PATH = BASE_DIR / "model" / "segmentation.joblib"
+
+# Rows per distance block; bounds the (rows x k) distance matrix
+ASSIGN_BATCH_ROWS = 65_536
+
+
+def nearest_centroid(X: np.ndarray, centroids: np.ndarray, batch_size: int = ASSIGN_BATCH_ROWS) -> np.ndarray:
+    """Index of the closest centroid (squared Euclidean) for each row of X, computed in row blocks."""
+    X = np.asarray(X, dtype=np.float64)
+    centroids = np.asarray(centroids, dtype=np.float64)
+    c_sq = (centroids ** 2).sum(axis=1)
+    labels = np.empty(len(X), dtype=np.int64)
+    for start in range(0, len(X), batch_size):
+        block = X[start:start + batch_size]
+        # ||x - c||^2 without the ||x||^2 term, which is the same for every centroid
+        labels[start:start + batch_size] = np.argmin(c_sq - 2.0 * block @ centroids.T, axis=1)
+    return labels
+
+
+class SegmentAssigner:
+    """
+    Scales raw rider features with the persisted RobustScaler parameters (the
+    `data_preprocessed.csv` transform) and assigns the nearest persisted centroid.
+    """
+
+    def __init__(self, path: Path = SEGMENTATION_PATH):
+        if not path.exists():
+            raise FileNotFoundError(f"Segmentation artifact not found: {path}")
+        artifact = joblib.load(path)
+        self.features = list(artifact["features"])
+        self.center = np.asarray(artifact["center"], dtype=np.float64)
+        self.scale = np.asarray(artifact["scale"], dtype=np.float64)
+        self.centroids = np.asarray(artifact["centroids"], dtype=np.float64)
+        self.k = len(self.centroids)
+        self.algorithm = artifact.get("algorithm", "kmeans")
+
+    def transform(self, rows) -> np.ndarray:
+        df = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(list(rows))
+        X = df[self.features].to_numpy(dtype=np.float64)
+        return (X - self.center) / self.scale
+
+    def assign(self, rows) -> np.ndarray:
+        """Cluster index per rider; `rows` is a DataFrame or a list of feature dicts."""
+        return nearest_centroid(self.transform(rows), self.centroids)
+
+
+try:
+    segment_assigner = SegmentAssigner()
+except (FileNotFoundError, KeyError):
+    segment_assigner = None
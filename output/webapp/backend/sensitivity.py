@@ -0,0 +1,82 @@
+"""
+What-if sensitivity curves for one rider.
+
+A request names one rider and a grid of values per feature (e.g. recency
+0-90, or every loyalty_status). `sensitivity_frame` repeats the rider once per
+grid point, with only that feature changed, and stacks the points of all
+features into one raw-feature table, so the whole grid is scored in a single
+`predict_proba_frame` call. `curves` splits the probabilities back per feature
+and adds the risk band of every point and the transitions: the consecutive grid
+points between which the band changes.
+
+A categorical feature with an empty value list is swept over every level the
+deployed preprocessor knows (`categorical_levels`).
+"""
+import numpy as np
+import pandas as pd
+
+from .model_loader import RAW_FEATURE_ORDER
+from .schema import ChurnFeatures
+from .shadow import RISK_BANDS, risk_bands
+
+
+def categorical_levels(preprocessor) -> dict[str, list[str]]:
+    """Column -> levels of every categorical encoder in the (fitted) ColumnTransformer."""
+    levels = {}
+    for _, transformer, columns in preprocessor.transformers_:
+        encoder = transformer.steps[-1][1] if hasattr(transformer, "steps") else transformer
+        if hasattr(encoder, "categories_"):
+            levels.update({column: [str(v) for v in values] for column, values in zip(columns, encoder.categories_)})
+    return levels
+
+
+def resolve_grid(grid: dict, levels: dict) -> dict[str, list]:
+    """Check feature names and fill empty categorical value lists; raises ValueError."""
+    unknown = [feature for feature in grid if feature not in RAW_FEATURE_ORDER]
+    if unknown:
+        raise ValueError(f"Unknown feature(s) {unknown}; expected some of {RAW_FEATURE_ORDER}")
+    resolved = {}
+    for feature, values in grid.items():
+        if not values:
+            if feature not in levels:
+                raise ValueError(f"{feature}: a numeric feature needs explicit grid values")
+            values = levels[feature]
+        resolved[feature] = list(values)
+    return resolved
+
+
+def sensitivity_frame(rider: dict, grid: dict[str, list]) -> pd.DataFrame:
+    """
+    The rider repeated once per grid point, feature by feature, as a raw-feature
+    table. Every point is validated like a /predict body, so a grid cannot reach
+    values the endpoint itself would reject (e.g. a negative recency).
+    """
+    rows = []
+    for feature, values in grid.items():
+        for value in values:
+            point = ChurnFeatures.model_validate({**rider, feature: value})
+            rows.append(point.model_dump())
+    return pd.DataFrame(rows, columns=RAW_FEATURE_ORDER)
+
+
+def curves(grid: dict[str, list], proba: np.ndarray, threshold: float, thr_mid: float) -> dict:
+    """Per feature: the values, their probabilities and risk bands, and the band transitions along the grid."""
+    bands = risk_bands(proba, threshold, thr_mid)
+    out = {}
+    start = 0
+    for feature, values in grid.items():
+        end = start + len(values)
+        p, b = proba[start:end], bands[start:end]
+        changes = np.flatnonzero(b[1:] != b[:-1])
+        out[feature] = {
+            "values": values,
+            "churn_probability": p.tolist(),
+            "risk_level": [RISK_BANDS[i] for i in b],
+            "transitions": [
+                {"from_value": values[i], "to_value": values[i + 1],
+                 "from": RISK_BANDS[b[i]], "to": RISK_BANDS[b[i + 1]]}
+                for i in changes
+            ],
+        }
+        start = end
+    return out
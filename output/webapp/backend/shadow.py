@@ -0,0 +1,216 @@
+"""
+Shadow scoring of a challenger churn model on live traffic.
+
+The live model answers every request. The raw feature rows and the live
+probabilities are then offered to a bounded queue with `put_nowait`; a full
+queue drops the batch (counted) instead of blocking the request. One
+background thread drains the queue, scores the requests that arrived within a
+short linger window in one challenger call and folds the results into running agreement statistics:
+label confusion (flips), probability deltas and the risk-band confusion.
+
+The challenger defaults to `model/rf_churn_model.joblib` (loaded through
+`load_model`, so its `.forest` export is used when present). Point
+SHADOW_MODEL_PATH at another joblib file (e.g. a `pipeline train --output-dir`
+retrain; a `preprocessor.joblib` and `*_metadata.joblib` next to it are used
+too), or set it to an empty string to disable shadow mode.
+"""
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from .model_loader import BASE_DIR, PREPROCESSOR_PATH, RAW_FEATURE_ORDER, load_model, model_service
+
+DEFAULT_CHALLENGER_PATH = BASE_DIR / "model" / "rf_churn_model.joblib"
+SHADOW_QUEUE_SIZE = 1024  # queued requests (a batch request is one entry)
+SHADOW_MAX_ROWS = 8192    # rows scored per challenger call
+SHADOW_LINGER_SECONDS = 0.5  # collect requests this long before scoring them together
+RISK_BANDS = ["Low Risk", "Medium Risk", "High Risk"]
+DELTA_BINS = np.linspace(-1.0, 1.0, 41)
+
+
+def risk_bands(proba: np.ndarray, threshold: float, thr_mid: float) -> np.ndarray:
+    """Vectorized `ChurnModelService.risk_level`: index into RISK_BANDS."""
+    return np.where(proba < threshold, 0, np.where(proba < thr_mid, 1, 2))
+
+
+class ShadowStats:
+    """Running agreement statistics; memory does not grow with traffic."""
+
+    def __init__(self):
+        self.rows = 0
+        self.label_confusion = np.zeros((2, 2), dtype=np.int64)  # [live label, challenger label]
+        self.band_confusion = np.zeros((3, 3), dtype=np.int64)   # [live band, challenger band]
+        self.delta_hist = np.zeros(len(DELTA_BINS) - 1, dtype=np.int64)
+        self.delta_sum = 0.0
+        self.abs_delta_sum = 0.0
+        self.delta_sq_sum = 0.0
+        self.max_abs_delta = 0.0
+
+    def update(self, live_proba, live_label, live_band, shadow_proba, shadow_label, shadow_band):
+        delta = shadow_proba - live_proba
+        self.rows += len(delta)
+        np.add.at(self.label_confusion, (live_label, shadow_label), 1)
+        np.add.at(self.band_confusion, (live_band, shadow_band), 1)
+        self.delta_hist += np.histogram(delta, bins=DELTA_BINS)[0]
+        self.delta_sum += float(delta.sum())
+        self.abs_delta_sum += float(np.abs(delta).sum())
+        self.delta_sq_sum += float((delta ** 2).sum())
+        self.max_abs_delta = max(self.max_abs_delta, float(np.abs(delta).max(initial=0.0)))
+
+    def to_dict(self) -> dict:
+        n = max(self.rows, 1)
+        flips = int(self.label_confusion[0, 1] + self.label_confusion[1, 0])
+        return {
+            "rows_scored": self.rows,
+            "label_agreement": 1.0 - flips / n if self.rows else None,
+            "label_flips": {
+                "total": flips,
+                "live_0_challenger_1": int(self.label_confusion[0, 1]),
+                "live_1_challenger_0": int(self.label_confusion[1, 0]),
+            },
+            "probability_delta": {
+                "mean": self.delta_sum / n,
+                "mean_abs": self.abs_delta_sum / n,
+                "rmse": (self.delta_sq_sum / n) ** 0.5,
+                "max_abs": self.max_abs_delta,
+                "histogram": {"bin_edges": DELTA_BINS.round(2).tolist(), "counts": self.delta_hist.tolist()},
+            },
+            "risk_band_confusion": {
+                live: {challenger: int(self.band_confusion[i, j]) for j, challenger in enumerate(RISK_BANDS)}
+                for i, live in enumerate(RISK_BANDS)
+            },
+            "risk_band_agreement": float(np.trace(self.band_confusion)) / n if self.rows else None,
+        }
+
+
+class ShadowScorer:
+    def __init__(self, live_service, challenger_path: Path = DEFAULT_CHALLENGER_PATH,
+                 queue_size: int = SHADOW_QUEUE_SIZE):
+        challenger_path = Path(challenger_path)
+        if not challenger_path.exists():
+            raise FileNotFoundError(f"Challenger model not found: {challenger_path}")
+        metadata_path = challenger_path.with_name(challenger_path.stem + "_metadata.joblib")
+        preprocessor_path = challenger_path.parent / PREPROCESSOR_PATH.name
+        metadata = joblib.load(metadata_path) if metadata_path.exists() else {}
+
+        self.live = live_service
+        self.challenger_path = challenger_path
+        self.model = load_model(challenger_path)
+        self.preprocessor = joblib.load(preprocessor_path) if preprocessor_path.exists() else live_service.preprocessor
+        self.threshold = metadata.get("business_threshold", live_service.threshold)
+        self._columns = self.preprocessor.get_feature_names_out()
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._submit_lock = threading.Lock()
+        self._stats = ShadowStats()
+        self.submitted = 0
+        self.dropped = 0
+        self.failed = 0
+        self._submit_seconds = 0.0
+        self._score_seconds = 0.0
+        self._worker = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+        self._worker.start()
+
+    def submit(self, rows: list[dict], live_proba: list[float]):
+        """Offer a scored request to the challenger; never blocks the caller."""
+        start = time.perf_counter()
+        try:
+            self._queue.put_nowait((rows, live_proba))
+            accepted = True
+        except queue.Full:
+            accepted = False
+        with self._submit_lock:
+            if accepted:
+                self.submitted += 1
+            else:
+                self.dropped += 1
+            self._submit_seconds += time.perf_counter() - start
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            # Collect what arrives during the linger window into one challenger call, so
+            # the per-call pandas/preprocessor overhead is paid once per window, not per request
+            items, n_rows = [item], len(item[0])
+            deadline = time.monotonic() + SHADOW_LINGER_SECONDS
+            while n_rows < SHADOW_MAX_ROWS:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0.0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._score(items)
+                    return
+                items.append(item)
+                n_rows += len(item[0])
+            self._score(items)
+
+    def _score(self, items: list[tuple]):
+        start = time.perf_counter()
+        try:
+            rows = [row for batch, _ in items for row in batch]
+            live_proba = np.fromiter((p for _, probas in items for p in probas), dtype=np.float64, count=len(rows))
+            X = pd.DataFrame(rows, columns=RAW_FEATURE_ORDER)
+            X_t = pd.DataFrame(self.preprocessor.transform(X), columns=self._columns)
+            shadow_proba = np.asarray(self.model.predict_proba(X_t))[:, 1]
+        except Exception:
+            self.failed += len(items)
+            return
+        thr_mid = self.live.thr_mid
+        with self._lock:
+            self._stats.update(
+                live_proba, (live_proba >= self.live.threshold).astype(int),
+                risk_bands(live_proba, self.live.threshold, thr_mid),
+                shadow_proba, (shadow_proba >= self.threshold).astype(int),
+                risk_bands(shadow_proba, self.threshold, thr_mid),
+            )
+            self._score_seconds += time.perf_counter() - start
+
+    def stats(self) -> dict:
+        with self._lock:
+            result = self._stats.to_dict()
+            score_seconds = self._score_seconds
+        return {
+            "challenger": {
+                "path": self.challenger_path.name,
+                "model": repr(self.model),
+                "threshold": self.threshold,
+            },
+            "live_threshold": self.live.threshold,
+            "queue": {
+                "submitted": self.submitted,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "pending": self._queue.qsize(),
+                "capacity": self._queue.maxsize,
+            },
+            "overhead": {
+                "submit_us_mean": self._submit_seconds / max(self.submitted + self.dropped, 1) * 1e6,
+                "challenger_ms_per_row": score_seconds / max(result["rows_scored"], 1) * 1e3,
+            },
+            **result,
+        }
+
+    def close(self, timeout: float = 5.0):
+        """Score what is already queued, then stop the worker."""
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._worker.join(timeout)
+
+
+_challenger_path = os.getenv("SHADOW_MODEL_PATH", str(DEFAULT_CHALLENGER_PATH))
+try:
+    shadow_scorer = ShadowScorer(model_service, Path(_challenger_path)) if model_service and _challenger_path else None
+except (FileNotFoundError, RuntimeError, ValueError, KeyError):
+    shadow_scorer = None
@@ -0,0 +1,193 @@
+"""
+Vectorized parsing of ISO-8601 timestamp columns to UTC epochs.
+
+Event times in the data are fixed-layout strings such as
+"2025-04-27 18:57:06+02:05" (per-row, non-standard UTC offsets) or
+"2025-04-02 14:46:29+00:00". With mixed offsets `pd.to_datetime(..., utc=True)`
+falls back to parsing element by element. Here the strings are viewed as a
+(rows x width) byte matrix and the date, time and offset fields are decoded with
+NumPy column arithmetic.
+
+The fast path only accepts columns where every non-null value has the same
+layout (one of LAYOUTS) and valid field ranges; anything else is handed to
+`pd.to_datetime` as a whole, so results always equal
+`pd.to_datetime(values, utc=True)` (values and dtype).
+
+Shared by the data pipeline (`output.webapp.common.timestamps`) and the
+frontend (`common.timestamps`, see frontend/webapp_path.py); it has no
+Streamlit dependency.
+"""
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+NAT = np.iinfo(np.int64).min
+NS_PER_SECOND = 1_000_000_000
+
+# width -> (date/time separator position or None, offset sign position or None, "Z" suffix)
+LAYOUTS = {
+    10: (None, None, False),  # 2025-01-24
+    19: (10, None, False),    # 2025-01-24 10:00:00
+    20: (10, None, True),     # 2025-01-24T10:00:00Z
+    25: (10, 19, False),      # 2025-01-24 10:00:00+02:05
+}
+
+# Keep epochs inside the datetime64[ns] range
+_MIN_YEAR, _MAX_YEAR = 1678, 2261
+
+
+def _digits(b: np.ndarray, start: int, count: int):
+    """Integer value of `count` ASCII digits starting at column `start`, and whether they were all digits."""
+    d = b[:, start:start + count].astype(np.int64) - 48
+    ok = ((d >= 0) & (d <= 9)).all(axis=1)
+    value = np.zeros(len(b), dtype=np.int64)
+    for i in range(count):
+        value = value * 10 + d[:, i]
+    return value, ok
+
+
+def _days_from_civil(y, m, d):
+    """Days since 1970-01-01 of proleptic Gregorian dates (vectorized)."""
+    y = y - (m <= 2)
+    era = np.floor_divide(y, 400)
+    yoe = y - era * 400
+    doy = (153 * np.where(m > 2, m - 3, m + 9) + 2) // 5 + d - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+
+def _days_in_month(y, m):
+    leap = ((y % 4 == 0) & (y % 100 != 0)) | (y % 400 == 0)
+    days = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])[m.clip(0, 12)]
+    return days + ((m == 2) & leap)
+
+
+def _fast_epoch_ns(strings: np.ndarray):
+    """Epoch nanoseconds of non-null strings sharing one layout, or None if any value needs pandas."""
+    try:
+        raw = strings.astype("S")
+    except (UnicodeEncodeError, ValueError, TypeError):
+        return None
+    width = raw.dtype.itemsize
+    if width not in LAYOUTS or (np.char.str_len(raw) != width).any():
+        return None
+    sep, sign_at, zulu = LAYOUTS[width]
+    b = raw.view(np.uint8).reshape(len(raw), width)
+
+    year, ok_y = _digits(b, 0, 4)
+    month, ok_m = _digits(b, 5, 2)
+    day, ok_d = _digits(b, 8, 2)
+    ok = ok_y & ok_m & ok_d & (b[:, 4] == ord("-")) & (b[:, 7] == ord("-"))
+    ok &= (year >= _MIN_YEAR) & (year <= _MAX_YEAR) & (month >= 1) & (month <= 12)
+    ok &= (day >= 1) & (day <= _days_in_month(year, month))
+    seconds = _days_from_civil(year, month, day) * 86400
+
+    if sep is not None:
+        hour, ok_h = _digits(b, 11, 2)
+        minute, ok_mi = _digits(b, 14, 2)
+        second, ok_s = _digits(b, 17, 2)
+        # pandas infers one format from the first value, so the separator must not vary
+        ok &= ok_h & ok_mi & ok_s & (b[:, sep] == b[0, sep]) & ((b[0, sep] == ord(" ")) | (b[0, sep] == ord("T")))
+        ok &= (b[:, 13] == ord(":")) & (b[:, 16] == ord(":"))
+        ok &= (hour <= 23) & (minute <= 59) & (second <= 59)
+        seconds += hour * 3600 + minute * 60 + second
+    if zulu:
+        ok &= b[:, 19] == ord("Z")
+    if sign_at is not None:
+        sign = b[:, sign_at]
+        off_h, ok_oh = _digits(b, sign_at + 1, 2)
+        off_m, ok_om = _digits(b, sign_at + 4, 2)
+        ok &= ok_oh & ok_om & (b[:, sign_at + 3] == ord(":")) & ((sign == ord("+")) | (sign == ord("-")))
+        ok &= (off_h <= 23) & (off_m <= 59)
+        offset = off_h * 3600 + off_m * 60
+        seconds -= np.where(sign == ord("-"), -offset, offset)
+
+    if not ok.all():
+        return None
+    return seconds * NS_PER_SECOND
+
+
+def epoch_ns(values) -> np.ndarray:
+    """int64 UTC epoch nanoseconds of ISO timestamp strings; missing or unparseable values are NAT."""
+    return _as_epoch_ns(to_datetime_utc(values, errors="coerce"))
+
+
+def _as_epoch_ns(series: pd.Series) -> np.ndarray:
+    return series.dt.tz_convert(None).dt.as_unit("ns").to_numpy().view(np.int64)
+
+
+def to_datetime_utc(values, errors: str = "raise") -> pd.Series:
+    """Drop-in for `pd.to_datetime(values, utc=True, errors=errors)` that returns a Series."""
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    if isinstance(series.dtype, pd.DatetimeTZDtype) or pd.api.types.is_datetime64_dtype(series.dtype):
+        return pd.to_datetime(series, utc=True, errors=errors)
+
+    obj = series.to_numpy(dtype=object, na_value=None)
+    present = ~pd.isna(obj)
+    epochs = None
+    if present.any() and isinstance(obj[present][0], str):
+        fast = _fast_epoch_ns(obj[present])
+        if fast is not None:
+            epochs = np.full(len(obj), NAT, dtype=np.int64)
+            epochs[present] = fast
+    if epochs is None:
+        return pd.to_datetime(series, utc=True, errors=errors)
+
+    # Match the resolution pandas would infer for these strings (ns in pandas 2, us in pandas 3)
+    unit = pd.to_datetime(pd.Series(obj[present][:1]), utc=True).dt.unit
+    result = pd.Series(epochs.view("M8[ns]"), index=series.index, name=series.name).dt.tz_localize("UTC")
+    return result.dt.as_unit(unit)
+
+
+def from_epoch_ns(epochs: np.ndarray, index=None, name=None, unit: str = "ns") -> pd.Series:
+    """datetime64[unit, UTC] Series from int64 epoch nanoseconds (NAT -> NaT)."""
+    result = pd.Series(np.asarray(epochs, dtype=np.int64).view("M8[ns]"), index=index, name=name)
+    return result.dt.tz_localize("UTC").dt.as_unit(unit)
+
+
+def _cache_path(csv_path: Path, column: str) -> Path:
+    stat = os.stat(csv_path)
+    return csv_path.parent / ".cache" / f"{csv_path.stem}.{column}.{stat.st_size}-{stat.st_mtime_ns}.npz"
+
+
+def _persist(path: Path, epochs: np.ndarray, unit: str):
+    try:
+        path.parent.mkdir(exist_ok=True)
+        for stale in path.parent.glob(path.name.rsplit(".", 2)[0] + ".*.npz"):
+            stale.unlink(missing_ok=True)
+        tmp = path.with_name(path.stem + ".tmp.npz")
+        np.savez(tmp, epochs=epochs, unit=np.array(unit))
+        tmp.replace(path)
+    except OSError:
+        pass  # read-only data directory: parse again on the next load
+
+
+def read_csv_utc(csv_path, time_columns: list[str], **read_csv_kwargs) -> pd.DataFrame:
+    """
+    `pd.read_csv` with `time_columns` parsed as UTC datetimes.
+
+    Parsed epochs are persisted next to the CSV (.cache/, keyed by file size and
+    mtime), so later loads skip both reading and parsing those columns.
+    """
+    csv_path = Path(csv_path)
+    cached = {}
+    for column in time_columns:
+        path = _cache_path(csv_path, column)
+        if path.exists():
+            with np.load(path) as f:
+                cached[column] = (f["epochs"], str(f["unit"]))
+
+    header = pd.read_csv(csv_path, nrows=0).columns
+    df = pd.read_csv(csv_path, usecols=[c for c in header if c not in cached], **read_csv_kwargs)
+
+    for column in time_columns:
+        if column in cached:
+            epochs, unit = cached[column]
+            df[column] = from_epoch_ns(epochs, index=df.index, name=column, unit=unit)
+        else:
+            parsed = to_datetime_utc(df[column])
+            _persist(_cache_path(csv_path, column), _as_epoch_ns(parsed), parsed.dt.unit)
+            df[column] = parsed
+    return df[list(header)]
@@ -1,24 +1,17 @@
-import os
 import streamlit as st
-from style import inject_sidebar_style
-import requests
+from style import inject_sidebar_style, inject_background_style
+import api_client
+import rerun_memory
 
-try:
-    from style import inject_background_style
-except ImportError:
-    inject_background_style = lambda: None
-
-API_URL = os.getenv("API_URL", "http://localhost:8000")
-try:
-    requests.get(f"{API_URL}/health", timeout=2)
-except Exception:
-    pass
+# Wake the API in the background instead of blocking the first paint on it
+api_client.warm_up()
 
 st.set_page_config(
     page_title="RideWise Dashboard",
     layout="wide"
 )
 
+# Injected once per run here for every page; pages don't re-inject styles
 inject_sidebar_style()
 inject_background_style()
 
@@ -34,7 +27,11 @@ pages = [
     st.Page("pages/2_Demand_Revenue.py", title="Demand & Revenue"),
     st.Page("pages/4_Exposure_Analysis.py", title="Exposure Analysis"),
     st.Page("pages/5_Churn_Predictor.py", title="Churn Predictor"),
+    st.Page("pages/6_Promotions.py", title="Promotions"),
 ]
 
 pg = st.navigation(pages, position="top")
-pg.run()
+# Allocations of the page run (opt-in: DASHBOARD_MEMORY_PROFILE=1)
+with rerun_memory.measure(pg.title):
+    pg.run()
+rerun_memory.show()
@@ -0,0 +1,103 @@
+"""Shared HTTP client for the churn API, used by every Streamlit page."""
+import os
+import threading
+import time
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+API_URL = os.getenv("API_URL", "http://localhost:8000")
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (3.05, 10)
+HEALTH_TIMEOUT = (2, 3)
+HEALTH_TTL = 15
+POOL_SIZE = 16
+
+
+@st.cache_resource(show_spinner=False)
+def get_session() -> requests.Session:
+    """
+    One keep-alive session per process, shared across reruns and user sessions.
+
+    GETs are retried on connection errors and 502/503/504; POSTs are only retried
+    when the connection could not be made, so a prediction is never sent twice.
+    """
+    retry = Retry(
+        total=2,
+        connect=2,
+        read=1,
+        backoff_factor=0.3,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({"GET"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get(path: str, timeout=DEFAULT_TIMEOUT, **kwargs) -> requests.Response:
+    return get_session().get(f"{API_URL}{path}", timeout=timeout, **kwargs)
+
+
+def post(path: str, payload, timeout=DEFAULT_TIMEOUT, **kwargs) -> requests.Response:
+    return get_session().post(f"{API_URL}{path}", json=payload, timeout=timeout, **kwargs)
+
+
+def _check_health(session: requests.Session) -> tuple[bool, str]:
+    try:
+        r = session.get(f"{API_URL}/health", timeout=HEALTH_TIMEOUT)
+        r.raise_for_status()
+        data = r.json()
+        if not data.get("model_loaded", False):
+            return False, "Model not loaded on backend. Train the model first."
+        return True, "Connected"
+    except requests.exceptions.ConnectionError:
+        return False, "Cannot reach API. Start backend: uvicorn backend.main:app"
+    except Exception as e:
+        return False, str(e)
+
+
+class _HealthMonitor:
+    """Last known /health result, refreshed on a background thread once it is older than HEALTH_TTL."""
+
+    def __init__(self, session: requests.Session):
+        self._session = session
+        self._lock = threading.Lock()
+        self._status = None
+        self._checked_at = 0.0
+        self._refreshing = False
+
+    def status(self):
+        with self._lock:
+            if time.monotonic() - self._checked_at > HEALTH_TTL and not self._refreshing:
+                self._refreshing = True
+                threading.Thread(target=self._refresh, daemon=True).start()
+            return self._status
+
+    def _refresh(self):
+        result = _check_health(self._session)
+        with self._lock:
+            self._status = result
+            self._checked_at = time.monotonic()
+            self._refreshing = False
+
+
+@st.cache_resource(show_spinner=False)
+def _health_monitor() -> _HealthMonitor:
+    return _HealthMonitor(get_session())
+
+
+def health_status():
+    """(ok, message) from the last background health check, or None before the first one finishes. Never blocks."""
+    return _health_monitor().status()
+
+
+def warm_up():
+    """Start a background health check (also wakes an idle backend) without waiting for it."""
+    _health_monitor().status()
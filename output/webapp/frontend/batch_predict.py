@@ -0,0 +1,183 @@
+"""
+Chunked, concurrent and resumable batch submission to the churn API, and the
+client side of the server's bulk-scoring jobs (`/jobs`) for large files.
+"""
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+import requests
+import urllib3
+
+import api_client
+
+REQUIRED_COLUMNS = [
+    "recency", "total_trips", "avg_spend", "total_tip", "avg_tip", "avg_rating_given",
+    "loyalty_status", "city", "avg_distance", "avg_duration", "RFMS_segment",
+]
+
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_WORKERS = 4  # keep below api_client.POOL_SIZE
+DEFAULT_RETRIES = 3
+CHUNK_TIMEOUT = 30
+# Uploads at least this large default to a server-side job instead of chunked requests
+JOB_ROWS_THRESHOLD = 20_000
+JOB_POLL_SECONDS = 2
+UPLOAD_TIMEOUT = (3.05, 120)
+
+
+def _error_detail(response) -> str:
+    detail = response.text
+    try:
+        detail = response.json().get("detail", detail)
+    except Exception:
+        pass
+    return f"API error ({response.status_code}): {detail}"
+
+
+def _never_sent(error: requests.exceptions.RequestException) -> bool:
+    """True when the connection could not be made, so the server cannot have scored (or audited) the chunk."""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, urllib3.exceptions.NewConnectionError)
+
+
+def _post_chunk(session: requests.Session, records: list[dict], retries: int, timeout: float) -> list[dict]:
+    """
+    POST one chunk to /predict/batch. Like `api_client.get_session`, a prediction is
+    never sent twice: only a failed connection, or a 503 with Retry-After from the
+    server's admission control (which rejects before scoring), is retried, no sooner
+    than Retry-After asks. A read timeout, a dropped connection or any other 5xx may
+    come after the chunk was scored, so it fails the chunk instead.
+    """
+    for attempt in range(retries + 1):
+        delay = 0.5 * 2 ** attempt
+        try:
+            r = session.post(f"{api_client.API_URL}/predict/batch", json=records, timeout=timeout)
+        except requests.exceptions.RequestException as e:
+            if attempt == retries or not _never_sent(e):
+                raise
+        else:
+            retry_after = r.headers.get("Retry-After", "")
+            if r.status_code != 503 or not retry_after.isdigit() or attempt == retries:
+                if r.status_code >= 400:
+                    raise RuntimeError(_error_detail(r))
+                return r.json()["predictions"]
+            delay = max(delay, int(retry_after))
+        time.sleep(delay)
+
+
+class BatchRun:
+    """
+    One batch prediction run over an uploaded DataFrame.
+
+    The frame is split into fixed-size row chunks. Results and errors are kept per
+    chunk, so calling `run` again only re-sends the chunks that have not succeeded.
+    """
+
+    def __init__(self, df: pd.DataFrame, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.df = df.reset_index(drop=True)
+        self.chunk_size = chunk_size
+        self.chunks = [(start, min(start + chunk_size, len(self.df))) for start in range(0, len(self.df), chunk_size)]
+        self.results: dict[int, list[dict]] = {}
+        self.errors: dict[int, str] = {}
+
+    @property
+    def pending(self) -> list[int]:
+        return [i for i in range(len(self.chunks)) if i not in self.results]
+
+    @property
+    def is_complete(self) -> bool:
+        return not self.pending
+
+    def run(self, max_workers: int = DEFAULT_WORKERS, retries: int = DEFAULT_RETRIES,
+            timeout: float = CHUNK_TIMEOUT, on_progress=None):
+        """Send all pending chunks over a bounded thread pool; `on_progress(done, total)` runs on the caller's thread."""
+        # Fetched on the script thread; the pooled session is then shared by the workers
+        session = api_client.get_session()
+        pending = self.pending
+        total = len(self.chunks)
+        done = total - len(pending)
+        if on_progress:
+            on_progress(done, total)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(self._send_chunk, i, session, retries, timeout): i for i in pending}
+
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    self.results[i] = future.result()
+                    self.errors.pop(i, None)
+                except Exception as e:
+                    self.errors[i] = str(e)
+                done += 1
+                if on_progress:
+                    on_progress(done, total)
+
+    def _send_chunk(self, i: int, session: requests.Session, retries: int, timeout: float) -> list[dict]:
+        start, stop = self.chunks[i]
+        chunk = self.df.iloc[start:stop]
+        records = chunk[REQUIRED_COLUMNS].to_dict(orient="records")
+        # Rider ids go along when the file has them, for the API's audit log
+        if "user_id" in chunk.columns:
+            for record, user_id in zip(records, chunk["user_id"]):
+                record["user_id"] = None if pd.isna(user_id) else str(user_id)
+        return _post_chunk(session, records, retries, timeout)
+
+    def error_report(self) -> pd.DataFrame:
+        """One row per failed chunk with the input row range it covers."""
+        rows = [
+            {"chunk": i, "first_row": self.chunks[i][0], "last_row": self.chunks[i][1] - 1, "error": err}
+            for i, err in sorted(self.errors.items())
+        ]
+        return pd.DataFrame(rows, columns=["chunk", "first_row", "last_row", "error"])
+
+    def assembled(self) -> pd.DataFrame:
+        """Predictions for all succeeded chunks, in input row order."""
+        frames = []
+        for i in sorted(self.results):
+            start, stop = self.chunks[i]
+            chunk = pd.DataFrame(self.results[i])
+            chunk.insert(0, "row", range(start, stop))
+            frames.append(chunk)
+        if not frames:
+            return pd.DataFrame(columns=["row", "churn_probability", "churn_label", "threshold", "risk_level", "cluster"])
+        return pd.concat(frames, ignore_index=True)
+
+
+def submit_job(filename: str, content: bytes, client_id: str) -> dict:
+    """Upload a CSV as a bulk-scoring job; returns the job state (id, status, ...)."""
+    r = api_client.get_session().post(
+        f"{api_client.API_URL}/jobs",
+        files={"file": (filename, content, "text/csv")},
+        headers={"X-Client-Id": client_id},
+        timeout=UPLOAD_TIMEOUT,
+    )
+    if r.status_code >= 400:
+        raise RuntimeError(_error_detail(r))
+    return r.json()
+
+
+def job_status(job_id: str) -> dict:
+    r = api_client.get(f"/jobs/{job_id}")
+    if r.status_code >= 400:
+        raise RuntimeError(_error_detail(r))
+    return r.json()
+
+
+def cancel_job(job_id: str) -> dict:
+    r = api_client.get_session().post(f"{api_client.API_URL}/jobs/{job_id}/cancel", timeout=api_client.DEFAULT_TIMEOUT)
+    if r.status_code >= 400:
+        raise RuntimeError(_error_detail(r))
+    return r.json()
+
+
+def job_result(job_id: str) -> pd.DataFrame:
+    """The scored rows of a succeeded job."""
+    r = api_client.get(f"/jobs/{job_id}/result", timeout=UPLOAD_TIMEOUT)
+    if r.status_code >= 400:
+        raise RuntimeError(_error_detail(r))
+    return pd.read_csv(io.BytesIO(r.content))
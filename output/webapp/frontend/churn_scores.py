@@ -0,0 +1,49 @@
+"""
+Churn probabilities for every rider, scored once per model version and data file.
+
+The rider table is the pipeline's `riders_trips_rfms_churned.csv` (see
+`data_loader.processed_path`), so every pipeline run refreshes it. Its user_id
+and the model's raw features are sent to the backend's `/predict/proba` in one
+request and scored with one vectorized model call. The result is cached on the backend's
+`model_version` and the file's size/mtime, so reruns reuse it and a retrained
+model or a new data file triggers exactly one re-score.
+"""
+import os
+
+import pandas as pd
+import requests
+import streamlit as st
+
+import api_client
+from batch_predict import REQUIRED_COLUMNS
+from data_loader import processed_path
+
+RIDERS_DATASET = "riders_trips_rfms_churned.csv"
+SCORE_TIMEOUT = (3.05, 120)
+VERSION_TTL = 60
+
+
+@st.cache_data(ttl=VERSION_TTL, show_spinner=False)
+def model_version():
+    """(model_version, threshold) from the backend's /info, or None when it cannot be reached."""
+    try:
+        r = api_client.get("/info", timeout=api_client.HEALTH_TIMEOUT)
+        r.raise_for_status()
+        info = r.json()
+        return info.get("model_version"), info["threshold"]
+    except (requests.exceptions.RequestException, KeyError, ValueError):
+        return None
+
+
+def data_signature() -> tuple[int, int]:
+    stat = os.stat(processed_path(RIDERS_DATASET))
+    return stat.st_size, stat.st_mtime_ns
+
+
+@st.cache_data(show_spinner="Scoring riders with the churn model...", max_entries=4)
+def scored_riders(version: str, signature: tuple[int, int]) -> pd.DataFrame:
+    """user_id, city and churn_probability for every rider; the arguments are the cache key."""
+    riders = pd.read_csv(processed_path(RIDERS_DATASET), usecols=["user_id", *REQUIRED_COLUMNS])
+    r = api_client.post("/predict/proba", riders[REQUIRED_COLUMNS].to_dict(orient="records"), timeout=SCORE_TIMEOUT)
+    r.raise_for_status()
+    return riders[["user_id", "city"]].assign(churn_probability=r.json()["churn_probability"])
@@ -0,0 +1,143 @@
+"""
+Cached computations behind the Overview and Demand & Revenue pages.
+
+Every function takes only the filter values its output depends on, so Streamlit
+keeps one small result (a KPI dict, an aggregated frame or a Plotly figure) per
+filter combination and a rerun with unchanged filters is a cache lookup. On a
+miss they select from the process-wide, read-only trip table
+(`data_loader.trip_table`) by row position; row selections are shared too, and
+an unfiltered selection is a view. The pages call these from `st.fragment`
+regions, so a filter change reruns that region only.
+"""
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+from data_loader import trip_table, trips_signature
+
+ALL = "All"
+COLORS = ['#cccccc', '#3b3b3b', '#6c757d', '#9ca3af', '#d1d5db']
+LINE_COLOR = ["#6c757d"]
+CACHE_ENTRIES = 64
+
+
+def trips() -> pd.DataFrame:
+    """The trip table shared by every session (a copy-on-write shallow copy)."""
+    return trip_table()
+
+
+@st.cache_data(show_spinner=False)
+def filter_options() -> dict[str, list]:
+    """Choices for the page filters: cities and tiers in data order, years and months sorted."""
+    df = trips()
+    return {
+        "city": list(df["city"].unique()),
+        "loyalty_status": list(df["loyalty_status"].unique()),
+        "pickup_year": [int(y) for y in sorted(df["pickup_year"].dropna().unique())],
+        "pickup_month_num": [int(m) for m in sorted(df["pickup_month_num"].dropna().unique())],
+    }
+
+
+@st.cache_resource(show_spinner=False, max_entries=CACHE_ENTRIES)
+def _rows(choices: tuple, signature: tuple) -> np.ndarray:
+    """
+    Positions of the trips matching every (column, choice) that is not ALL;
+    year "All" still drops trips without a pickup time. Shared read-only by every
+    session; `signature` (the trip file's) keys it to the loaded table.
+    """
+    df = trips()
+    mask = np.ones(len(df), dtype=bool)
+    for column, choice in choices:
+        if choice != ALL:
+            mask &= (df[column] == choice).to_numpy()
+        elif column == "pickup_year":
+            mask &= df[column].notna().to_numpy()
+    rows = np.flatnonzero(mask)
+    rows.flags.writeable = False
+    return rows
+
+
+def _filtered(columns: list[str], **choices) -> pd.DataFrame:
+    """The given columns of the matching trips; the selection is shared by every figure for the same filters."""
+    df = trips()
+    rows = _rows(tuple(choices.items()), trips_signature())
+    # Every row selected: a column view instead of a copy
+    return df[columns] if len(rows) == len(df) else df[columns].take(rows)
+
+
+# -------------------------------------------------------------------------------- Overview
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_ENTRIES)
+def overview_metrics(city: str, loyalty: str) -> dict:
+    df = _filtered(["trip_id", "total_fare_with_tip"], city=city, loyalty_status=loyalty)
+    return {"total_trips": df["trip_id"].nunique(), "revenue": df["total_fare_with_tip"].sum()}
+
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_ENTRIES)
+def loyalty_figure(city: str, loyalty: str):
+    df = _filtered(["loyalty_status", "user_id"], city=city, loyalty_status=loyalty)
+    customer = df.groupby('loyalty_status')['user_id'].count().reset_index()
+    customer.columns = ['loyalty_status', 'count']
+    customer['percentage'] = customer['count'] / customer['count'].sum()
+    return px.pie(customer, values='percentage', names='loyalty_status', color='loyalty_status',
+                  color_discrete_sequence=COLORS)
+
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_ENTRIES)
+def city_figure(city: str, loyalty: str):
+    df = _filtered(["city", "user_id"], city=city, loyalty_status=loyalty)
+    city_seg = df.groupby('city')['user_id'].count().reset_index()
+    city_seg.columns = ['city', 'count']
+    fig = px.bar(city_seg, x='count', y='city', orientation='h', color="city", color_discrete_sequence=COLORS)
+    fig.update_layout(margin=dict(l=20, r=20, t=40, b=20), height=450)
+    return fig
+
+
+# -------------------------------------------------------------------------------- Demand & Revenue
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_ENTRIES)
+def demand_revenue_metrics(year, month, city: str) -> dict:
+    df = _filtered(["user_id", "trip_id", "total_fare_with_tip"], pickup_year=year, pickup_month_num=month, city=city)
+    return {
+        "total_users": df["user_id"].nunique(),
+        "total_trips": df["trip_id"].nunique(),
+        "revenue": df["total_fare_with_tip"].sum(),
+        "avg_fare": df["total_fare_with_tip"].mean(),
+    }
+
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_ENTRIES)
+def hourly_figure(year, month, city: str, revenue: bool):
+    """Trips (or fare revenue) per pickup hour."""
+    column, label = ("total_fare", "Revenue") if revenue else ("trip_id", "Trips")
+    df = _filtered(["pickup_hour", column], pickup_year=year, pickup_month_num=month, city=city)
+    grouped = df.groupby("pickup_hour")[column]
+    hourly = (grouped.sum() if revenue else grouped.count()).reset_index()
+    return px.bar(
+        hourly,
+        x="pickup_hour",
+        y=column,
+        labels={column: label},
+        title="Revenue by Hour" if revenue else "Hourly Trips within the Day (24-hour format)",
+        color_discrete_sequence=LINE_COLOR,
+    )
+
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_ENTRIES)
+def daily_figure(year, month, city: str, revenue: bool):
+    """Trips (or fare revenue) per pickup date."""
+    column, name, label = ("total_fare", "Total_Revenue", "Revenue") if revenue else ("trip_id", "Total_Trips", "Trips")
+    df = _filtered(["pickup_time", column], pickup_year=year, pickup_month_num=month, city=city)
+    grouped = df.groupby(df["pickup_time"].dt.date)[column]
+    daily = (grouped.sum() if revenue else grouped.count()).reset_index()
+    daily.columns = ["Date", name]
+    return px.line(
+        daily,
+        x="Date",
+        y=name,
+        title="Daily Revenue over the Month" if revenue else "Daily Demand over the Month",
+        markers=True,
+        labels={name: label},
+        color_discrete_sequence=LINE_COLOR,
+    )
@@ -1,15 +1,48 @@
+import os
+
 import pandas as pd
 import streamlit as st
 from pathlib import Path
 
+import webapp_path  # noqa: F401  (makes `common` importable)
+from common.timestamps import read_csv_utc
+
 BASE_DIR = Path(__file__).resolve().parent
-DATA_DIR = BASE_DIR / "data"
+# Another data directory (e.g. generated with `python -m pipeline synth`) can stand in for data/
+DATA_DIR = Path(os.getenv("DASHBOARD_DATA_DIR", BASE_DIR / "data"))
+TRIPS_PATH = DATA_DIR / "riders_trips.csv"
+# Raw data shared with the pipeline (riders, sessions, promotions)
+REPO_DATA_DIR = BASE_DIR.parents[2] / "data"
+PROCESSED_DATA_DIR = REPO_DATA_DIR / "processed_data"
+# Copy-on-write is what keeps the shared trip table safe (see trip_table): pandas 3
+# always has it, pandas 2 is switched to it here
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+
+def data_path(name: str) -> Path:
+    """The web app's copy of a data file when present, otherwise the repository's raw data."""
+    local = DATA_DIR / name
+    return local if local.exists() else REPO_DATA_DIR / name
+
+
+def processed_path(name: str) -> Path:
+    """The web app's copy of a pipeline output when present, otherwise data/processed_data/ (python -m pipeline)."""
+    local = DATA_DIR / name
+    return local if local.exists() else PROCESSED_DATA_DIR / name
 
-@st.cache_data(show_spinner="Loading data...")
-def load_data():
-    file_path = DATA_DIR / "riders_trips.csv"
-    df = pd.read_csv(file_path)
-    df['pickup_time'] = pd.to_datetime(df['pickup_time'], utc=True)
+
+def trips_signature() -> tuple[int, int]:
+    """Size and mtime of the trip file; a new file means a new shared table."""
+    stat = os.stat(TRIPS_PATH)
+    return stat.st_size, stat.st_mtime_ns
+
+
+@st.cache_resource(show_spinner="Loading data...", max_entries=1)
+def _trip_table(signature: tuple[int, int]) -> pd.DataFrame:
+    """Read once per process and data file version (the argument is the cache key)."""
+    # pickup_time is parsed once and the UTC epochs are reused while the file is unchanged
+    df = read_csv_utc(TRIPS_PATH, ['pickup_time'])
 
     df['pickup_year'] = df['pickup_time'].dt.year
     df['pickup_month_num'] = df['pickup_time'].dt.month
@@ -17,6 +50,21 @@ def load_data():
 
     return df
 
+
+def trip_table() -> pd.DataFrame:
+    """
+    The trip table shared by every page and session of this process, handed out
+    as a shallow copy. No data is copied, and under copy-on-write any write to
+    it (`.loc`, a new or replaced column) copies only what it touches into the
+    caller's frame, so it can never reach the cached table or other users.
+    """
+    return _trip_table(trips_signature()).copy(deep=False)
+
+
+def load_data() -> pd.DataFrame:
+    """The trip table; the same as `trip_table()`."""
+    return trip_table()
+
 def load_data_segments():
     file_path = DATA_DIR / "rfm_data.csv"
     df = pd.read_csv(file_path)
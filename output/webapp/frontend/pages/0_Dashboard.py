@@ -1,9 +1,5 @@
 import streamlit as st
 from data_loader import load_data
-from style import inject_sidebar_style, inject_background_style
-
-inject_sidebar_style()
-inject_background_style()
 
 
 st.title("Rideshare Executive Dashboard")
@@ -26,6 +22,7 @@ Explore the RideWise Ltd. business with interactive charts and filters. See trip
 - **Revenue Analysis** – When revenue comes in: by hour and by day (compare with demand)
 - **Exposure Analysis** – Revenue at risk if customers go inactive; see segments and who to re-engage
 - **Churn Predictor** – Predict churn risk for a rider from RFMS and engagement features
+- **Promotions** – Sessions and trips attributed to each promotion and A/B uplift over Control
 """)
 
 st.info("Use the navigation bar above to move between pages.")
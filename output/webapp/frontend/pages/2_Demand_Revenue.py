@@ -2,128 +2,74 @@
 
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-from data_loader import load_data
-from style import inject_sidebar_style
-try:
-    from style import inject_background_style
-except ImportError:
-    inject_background_style = lambda: None
+from dashboard_data import ALL, daily_figure, demand_revenue_metrics, filter_options, hourly_figure
 from widgets.metric_card import metric_card
 
-inject_sidebar_style()
-inject_background_style()
 
-df = load_data()
 st.set_page_config(page_title="Rideshare Analytics Dashboard", layout="wide")
 
 st.title("🚗 Rideshare Interactive Dashboard")
 st.caption("Track demand and revenue by hour and day. Use the tabs below to switch between Demand and Revenue views.")
-st.subheader("📊 Key Metrics")
-
-# -----------------------------
-# Sidebar filters (shared) – "All" or single choice
-# -----------------------------
 st.sidebar.header("Filters")
-years = sorted(df["pickup_year"].dropna().unique())
-year_options = ["All"] + list(years)
-year_choice = st.sidebar.selectbox("Select Year", options=year_options, index=0)
-selected_years = list(years) if year_choice == "All" else [year_choice]
 
-months = sorted(df["pickup_month_num"].unique())
-month_options = ["All"] + list(months)
-month_choice = st.sidebar.selectbox(
-    "Select Month",
-    options=month_options,
-    format_func=lambda x: "All" if x == "All" else pd.to_datetime(str(x), format="%m").strftime("%b"),
-    index=0,
-)
-selected_months = list(months) if month_choice == "All" else [month_choice]
 
-city_options = ["All"] + list(df["city"].unique())
-city_choice = st.sidebar.selectbox("Select City", options=city_options, index=0)
-cities = list(df["city"].unique()) if city_choice == "All" else [city_choice]
+@st.fragment
+def demand_revenue():
+    """
+    Filters, KPIs and the open tab. A filter or tab change reruns only this
+    region; KPIs and figures are cached per (year, month, city), and the
+    closed tab is not computed.
+    """
+    # -----------------------------
+    # Sidebar filters (shared) – "All" or single choice
+    # -----------------------------
+    options = filter_options()
+    year = st.sidebar.selectbox("Select Year", options=[ALL] + options["pickup_year"], index=0)
+    month = st.sidebar.selectbox(
+        "Select Month",
+        options=[ALL] + options["pickup_month_num"],
+        format_func=lambda x: ALL if x == ALL else pd.to_datetime(str(x), format="%m").strftime("%b"),
+        index=0,
+    )
+    city = st.sidebar.selectbox("Select City", options=[ALL] + options["city"], index=0)
 
-filtered_df = df[
-    (df["pickup_year"].isin(selected_years))
-    & (df["pickup_month_num"].isin(selected_months))
-    & (df["city"].isin(cities))
-]
+    # -----------------------------
+    # Shared KPIs
+    # -----------------------------
+    st.subheader("📊 Key Metrics")
+    metrics = demand_revenue_metrics(year, month, city)
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        metric_card("👥 Total Users", metrics["total_users"])
+    with col2:
+        metric_card("🚕 Total Trips", metrics["total_trips"])
+    with col3:
+        metric_card("💰 Revenue", f"${metrics['revenue']:,.0f}")
+    with col4:
+        metric_card("Avg Fare", f"${metrics['avg_fare']:.2f}")
 
-# -----------------------------
-# Shared KPIs
-# -----------------------------
-col1, col2, col3, col4 = st.columns(4)
-with col1:
-    metric_card("👥 Total Users", filtered_df["user_id"].nunique())
-with col2:
-    metric_card("🚕 Total Trips", filtered_df["trip_id"].nunique())
-with col3:
-    metric_card("💰 Revenue", f"${filtered_df['total_fare_with_tip'].sum():,.0f}")
-with col4:
-    metric_card("Avg Fare", f"${filtered_df['total_fare_with_tip'].mean():.2f}")
+    st.markdown("---")
 
-st.markdown("---")
+    # -----------------------------
+    # Tabs: Demand | Revenue (only the open one is built)
+    # -----------------------------
+    tab_demand, tab_revenue = st.tabs(
+        ["⏰ Demand Analysis", "💰 Revenue Analysis"], key="demand_revenue_tab", on_change="rerun"
+    )
 
-# -----------------------------
-# Tabs: Demand | Revenue
-# -----------------------------
-tab_demand, tab_revenue = st.tabs(["⏰ Demand Analysis", "💰 Revenue Analysis"])
+    if tab_demand.open:
+        with tab_demand:
+            st.subheader("Demand Analysis")
+            st.plotly_chart(hourly_figure(year, month, city, revenue=False), use_container_width=True)
+            st.markdown("---")
+            st.plotly_chart(daily_figure(year, month, city, revenue=False), use_container_width=True)
 
-with tab_demand:
-    st.subheader("Demand Analysis")
-    hourly = filtered_df.groupby("pickup_hour")["trip_id"].count().reset_index()
-    fig_hour = px.bar(
-        hourly,
-        x="pickup_hour",
-        y="trip_id",
-        labels={"trip_id": "Trips"},
-        title="Hourly Trips within the Day (24-hour format)",
-        color_discrete_sequence=["#6c757d"],
-    )
-    st.plotly_chart(fig_hour, use_container_width=True)
-    st.markdown("---")
-    daily_totals = (
-        filtered_df.groupby(filtered_df["pickup_time"].dt.date)["trip_id"].count().reset_index()
-    )
-    daily_totals.columns = ["Date", "Total_Trips"]
-    daily_totals["Month_Label"] = pd.to_datetime(daily_totals["Date"]).dt.strftime("%b %Y")
-    fig_month = px.line(
-        daily_totals,
-        x="Date",
-        y="Total_Trips",
-        title="Daily Demand over the Month",
-        markers=True,
-        labels={"Total_Trips": "Trips"},
-        color_discrete_sequence=["#6c757d"],
-    )
-    st.plotly_chart(fig_month, use_container_width=True)
+    if tab_revenue.open:
+        with tab_revenue:
+            st.subheader("Revenue Analysis")
+            st.plotly_chart(hourly_figure(year, month, city, revenue=True), use_container_width=True)
+            st.markdown("---")
+            st.plotly_chart(daily_figure(year, month, city, revenue=True), use_container_width=True)
 
-with tab_revenue:
-    st.subheader("Revenue Analysis")
-    hourly_rev = filtered_df.groupby("pickup_hour")["total_fare"].sum().reset_index()
-    fig_hour_rev = px.bar(
-        hourly_rev,
-        x="pickup_hour",
-        y="total_fare",
-        labels={"total_fare": "Revenue"},
-        title="Revenue by Hour",
-        color_discrete_sequence=["#6c757d"],
-    )
-    st.plotly_chart(fig_hour_rev, use_container_width=True)
-    st.markdown("---")
-    daily_rev = (
-        filtered_df.groupby(filtered_df["pickup_time"].dt.date)["total_fare"].sum().reset_index()
-    )
-    daily_rev.columns = ["Date", "Total_Revenue"]
-    daily_rev["Month_Label"] = pd.to_datetime(daily_rev["Date"]).dt.strftime("%b %Y")
-    fig_month_rev = px.line(
-        daily_rev,
-        x="Date",
-        y="Total_Revenue",
-        title="Daily Revenue over the Month",
-        markers=True,
-        labels={"Total_Revenue": "Revenue"},
-        color_discrete_sequence=["#6c757d"],
-    )
-    st.plotly_chart(fig_month_rev, use_container_width=True)
+
+demand_revenue()
@@ -1,20 +1,18 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from style import inject_sidebar_style
-try:
-    from style import inject_background_style
-except ImportError:
-    inject_background_style = lambda: None
+import requests
+from churn_scores import data_signature, model_version, scored_riders
 from data_loader import load_data_segments
 from widgets.metric_card import metric_card
 from widgets.date_card import date_card
+from widgets.data_table import data_table
 
-inject_sidebar_style()
-inject_background_style()
 
 st.title("🚗 Rideshare Interactive Dashboard")
-st.caption(" Maximum potential revenue lost if customers inactive for the selected number of days are not re-engaged.")
+
+RECENCY_MODE = "Recency cutoff"
+MODEL_MODE = "Churn model (P(churn) × monetary)"
 
 st.html("""
     <style>
@@ -27,24 +25,64 @@ st.html("""
 
 rfm = load_data_segments()
 
-# Sidebar Filters (Global)
-st.sidebar.title("Inactivity Threshold")
-inactivity_threshold  = st.sidebar.slider(
-    "Days since last activity", 
-    min_value=7, 
-    max_value=90, 
-    value=7, 
-    step=7
-)
-
-at_risk_customers  = rfm[rfm['recency'] <= inactivity_threshold]
-
-exposure_by_segment  = (
-    at_risk_customers
-    .groupby('segments', as_index=False)['monetary']
-    .sum()
-    .rename(columns={'segments': 'Segments', 'monetary': 'Revenue Exposure'})
-)
+st.sidebar.title("Exposure Mode")
+mode = st.sidebar.radio("Revenue at risk from", [RECENCY_MODE, MODEL_MODE], key="exposure_mode")
+
+scores = None
+if mode == MODEL_MODE:
+    info = model_version()
+    try:
+        if info is None:
+            raise requests.exceptions.ConnectionError("Churn API unreachable")
+        scores = scored_riders(info[0], data_signature())
+        churn_threshold = info[1]
+    except (requests.exceptions.RequestException, FileNotFoundError, KeyError) as e:
+        st.sidebar.warning(f"Model-based exposure unavailable ({e}); showing the recency cutoff.")
+        mode = RECENCY_MODE
+
+if mode == RECENCY_MODE:
+    st.caption(" Maximum potential revenue lost if customers inactive for the selected number of days are not re-engaged.")
+
+    # Sidebar Filters (Global)
+    st.sidebar.title("Inactivity Threshold")
+    inactivity_threshold  = st.sidebar.slider(
+        "Days since last activity", 
+        min_value=7, 
+        max_value=90, 
+        value=7, 
+        step=7
+    )
+
+    at_risk_customers  = rfm[rfm['recency'] <= inactivity_threshold]
+
+    exposure_by_segment  = (
+        at_risk_customers
+        .groupby('segments', as_index=False)['monetary']
+        .sum()
+        .rename(columns={'segments': 'Segments', 'monetary': 'Revenue Exposure'})
+    )
+    total_revenue_exposed = at_risk_customers["monetary"].sum()
+    total_customers_exposed = at_risk_customers["user_id"].nunique()
+    revenue_title, customers_title = "Revenue at Risk", "Customers Exposed"
+    treemap_path, treemap_title = ["Segments"], "Proportion of Revenue Lost by Customer Segments"
+    table_sort_columns = ["monetary", "recency", "frequency"]
+else:
+    st.caption(" Expected revenue lost: each rider's monetary value weighted by the churn model's probability that they churn.")
+
+    at_risk_customers = rfm.merge(scores, on="user_id", how="inner")
+    at_risk_customers["expected_loss"] = at_risk_customers["churn_probability"] * at_risk_customers["monetary"]
+
+    exposure_by_segment = (
+        at_risk_customers
+        .groupby(['segments', 'city'], as_index=False)['expected_loss']
+        .sum()
+        .rename(columns={'segments': 'Segments', 'city': 'City', 'expected_loss': 'Revenue Exposure'})
+    )
+    total_revenue_exposed = at_risk_customers["expected_loss"].sum()
+    total_customers_exposed = int((at_risk_customers["churn_probability"] >= churn_threshold).sum())
+    revenue_title, customers_title = "Expected Revenue Loss", "Riders Above Churn Threshold"
+    treemap_path, treemap_title = ["Segments", "City"], "Expected Revenue Loss by Customer Segment and City"
+    table_sort_columns = ["expected_loss", "churn_probability", "monetary", "recency", "frequency"]
 
 if not exposure_by_segment.empty:
     exposure_by_segment["Proportion"] = (
@@ -54,18 +92,15 @@ if not exposure_by_segment.empty:
 
 st.subheader("📊 Key Metrics")
 
-total_revenue_exposed = at_risk_customers["monetary"].sum()
-total_customers_exposed = at_risk_customers["user_id"].nunique()
-
 top_row_left_col, top_row_right_col = st.columns([1.2, 1])
 
 with top_row_left_col:
     with st.container():
         col1, col2 = st.columns(2)
         with col1:
-            metric_card("Revenue at Risk", f"£{total_revenue_exposed:,.0f}")
+            metric_card(revenue_title, f"£{total_revenue_exposed:,.0f}")
         with col2:
-            metric_card("Customers Exposed", f"{total_customers_exposed:,.0f}")
+            metric_card(customers_title, f"{total_customers_exposed:,.0f}")
 
 with top_row_right_col:
     customers_min_date = at_risk_customers['last_trip_time'].min()
@@ -83,12 +118,12 @@ with left_col:
     with st.container():
         fig = px.treemap(
             exposure_by_segment,
-            path=["Segments"],
+            path=treemap_path,
             values="Revenue Exposure",
             custom_data=["Proportion"],
             color="Revenue Exposure",
             color_continuous_scale="Greys",
-            title="Proportion of Revenue Lost by Customer Segments",
+            title=treemap_title,
         )
 
         fig.update_layout(
@@ -101,7 +136,8 @@ with left_col:
 
         fig.update_traces(
             textfont_size=25,
-            texttemplate="<b>%{label}<br><b>%{customdata[0]:.1%}",
+            # percentRoot also labels the segment level when cities are nested under it
+            texttemplate="<b>%{label}<br><b>%{percentRoot:.1%}",
             hovertemplate=
                 "<b>%{label}</b><br>" +
                 "Amount: $%{value}<br>" +
@@ -114,4 +150,11 @@ with left_col:
 
 with right_col:
     st.subheader("👥 Customers Driving Exposure")
-    st.dataframe(at_risk_customers.drop(columns=['last_trip_time']), height=525)
\ No newline at end of file
+    data_table(
+        at_risk_customers.drop(columns=['last_trip_time']),
+        key="exposure_customers",
+        sort_columns=table_sort_columns,
+        search_columns=["user_id", "segments"],
+        height=420,
+        file_name="customers_driving_exposure.csv",
+    )
\ No newline at end of file
@@ -2,19 +2,20 @@
 RideWise Churn Prediction - Professional Streamlit Frontend
 ML-powered customer churn risk assessment for ride-sharing analytics.
 """
-import os
+import uuid
+
 import streamlit as st
 import requests
 import pandas as pd
+import plotly.graph_objects as go
 from typing import Optional
 
-from style import inject_sidebar_style
-try:
-    from style import inject_background_style
-except ImportError:
-    inject_background_style = lambda: None
-
-API_URL = os.getenv("API_URL", "http://localhost:8000")
+from widgets.data_table import data_table
+from batch_predict import (
+    BatchRun, JOB_POLL_SECONDS, JOB_ROWS_THRESHOLD, REQUIRED_COLUMNS,
+    cancel_job, job_result, job_status, submit_job,
+)
+import api_client
 
 # Page config - must be first Streamlit command
 st.set_page_config(
@@ -24,29 +25,26 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
-inject_sidebar_style()
-inject_background_style()
 
 
-def check_api_health() -> tuple[bool, str]:
-    """Verify backend is reachable."""
-    try:
-        r = requests.get(f"{API_URL}/health", timeout=3)
-        r.raise_for_status()
-        data = r.json()
-        if not data.get("model_loaded", False):
-            return False, "Model not loaded on backend. Train the model first."
-        return True, "Connected"
-    except requests.exceptions.ConnectionError:
-        return False, "Cannot reach API. Start backend: uvicorn backend.main:app"
-    except Exception as e:
-        return False, str(e)
+@st.fragment(run_every=5)
+def api_status_badge():
+    """Sidebar API status from the cached background health check; re-renders on its own."""
+    status = api_client.health_status()
+    if status is None:
+        st.info("Checking API...")
+        return
+    ok, msg = status
+    if ok:
+        st.success("✓ API ready")
+    else:
+        st.error(f"⚠ {msg}")
 
 
-def predict(features: dict) -> Optional[dict]:
-    """Call predict endpoint."""
+def _post(path: str, payload: dict) -> Optional[dict]:
+    """POST to the API; errors are shown on the page and give None."""
     try:
-        r = requests.post(f"{API_URL}/predict", json=features, timeout=10)
+        r = api_client.post(path, payload)
         r.raise_for_status()
         return r.json()
     except requests.exceptions.HTTPError as e:
@@ -62,6 +60,27 @@ def predict(features: dict) -> Optional[dict]:
         return None
 
 
+def predict(features: dict) -> Optional[dict]:
+    """Call predict endpoint."""
+    return _post("/predict", features)
+
+
+def sensitivity(features: dict) -> Optional[dict]:
+    """What-if curves for every feature of one rider, in one request (one model call on the API)."""
+    return _post("/predict/sensitivity", {"rider": features, "grid": sensitivity_grid(features)})
+
+
+def sensitivity_grid(features: dict) -> dict:
+    """Evenly spaced values per numeric feature; categorical features get every category the model knows."""
+    grid = {}
+    for feature, upper in SENSITIVITY_RANGES.items():
+        upper = upper if feature == "avg_rating_given" else max(upper, 2 * features[feature])
+        step = upper / (SENSITIVITY_POINTS - 1)
+        grid[feature] = [round(i * step, 2) for i in range(SENSITIVITY_POINTS)]
+    grid.update({feature: [] for feature in ("loyalty_status", "RFMS_segment", "city")})
+    return grid
+
+
 def risk_class(p: float) -> str:
     if p < 0.25: return "risk-low"
     if p < 0.5: return "risk-medium"
@@ -85,13 +104,49 @@ def show_result_dialog(res: dict):
         st.info(rec)
 
 
+def sensitivity_figure(feature: str, curve: dict, rider: dict, threshold: float, thr_mid: float) -> go.Figure:
+    """Churn probability along one feature's grid, points coloured by risk band, the rider's own value marked."""
+    values, proba = curve["values"], curve["churn_probability"]
+    colors = [RISK_COLORS[band] for band in curve["risk_level"]]
+    hover = f"{feature}: %{{x}}<br>Churn probability: %{{y:.1%}}<br>%{{text}}<extra></extra>"
+    fig = go.Figure()
+    if feature in SENSITIVITY_RANGES:
+        fig.add_scatter(x=values, y=proba, mode="lines+markers", line_color="#9e9e9e",
+                        marker_color=colors, text=curve["risk_level"], hovertemplate=hover)
+        fig.add_vline(x=rider[feature], line_dash="dot", annotation_text="this rider")
+    else:
+        fig.add_bar(x=values, y=proba, marker_color=colors, text=curve["risk_level"], hovertemplate=hover,
+                    marker_line_width=[3 if v == rider[feature] else 0 for v in values], marker_line_color="#212121")
+    fig.add_hline(y=threshold, line_dash="dash", line_color=RISK_COLORS["Medium Risk"],
+                  annotation_text="Medium risk")
+    fig.add_hline(y=thr_mid, line_dash="dash", line_color=RISK_COLORS["High Risk"], annotation_text="High risk")
+    fig.update_layout(title=f"Churn probability vs {feature}", xaxis_title=feature, yaxis_title="Churn probability",
+                      yaxis_range=[0, 1], yaxis_tickformat=".0%", showlegend=False, height=420)
+    return fig
+
+
+def show_sensitivity(result: dict, rider: dict):
+    """What-if curves from the stored sensitivity response; switching features sends no request."""
+    st.subheader("What-if Curves")
+    st.caption("Churn probability when one feature changes and the others keep this rider's values.")
+    curves = result["curves"]
+    feature = st.selectbox("Feature", list(curves), key="sensitivity_feature")
+    st.plotly_chart(sensitivity_figure(feature, curves[feature], rider, result["threshold"], result["thr_mid"]),
+                    use_container_width=True)
+    transitions = pd.DataFrame(
+        [{"feature": name, **t} for name, curve in curves.items() for t in curve["transitions"]],
+        columns=["feature", "from_value", "to_value", "from", "to"],
+    ).astype({"from_value": str, "to_value": str})
+    st.markdown("**Risk-band transitions**")
+    if transitions.empty:
+        st.info("The risk band does not change anywhere on these grids.")
+    else:
+        st.dataframe(transitions, use_container_width=True, hide_index=True)
+
+
 # Sidebar
 with st.sidebar:
-    ok, msg = check_api_health()
-    if ok:
-        st.success("✓ API ready")
-    else:
-        st.error(f"⚠ {msg}")
+    api_status_badge()
     st.divider()
 
 # Main layout
@@ -104,12 +159,26 @@ tab1, tab2, tab3 = st.tabs(["📊 Single Predict", "📁 Batch Predict", "ℹ️
 LOYALTY_OPTIONS = ["Bronze", "Silver", "Gold", "Platinum"]
 RFMS_OPTIONS = ["At Risk", "Occasional Riders", "Core Loyal Riders", "High-Value Surge-Tolerant"]
 CITY_OPTIONS = ["Cairo", "Lagos", "Nairobi"]
+# What-if grids: numeric features from 0 to this value (or twice the rider's value, if larger)
+SENSITIVITY_RANGES = {
+    "recency": 90.0,
+    "total_trips": 100.0,
+    "avg_spend": 50.0,
+    "total_tip": 20.0,
+    "avg_tip": 2.0,
+    "avg_rating_given": 5.0,
+    "avg_distance": 30.0,
+    "avg_duration": 60.0,
+}
+SENSITIVITY_POINTS = 31
+RISK_COLORS = {"Low Risk": "#2e7d32", "Medium Risk": "#f9a825", "High Risk": "#c62828"}
 
 with tab1:
     st.subheader("Rider Features")
 
     if "churn_result" not in st.session_state:
         st.session_state.churn_result = None
+        st.session_state.churn_sensitivity = None
 
     # Form: changing any input does not trigger a rerun; only the submit button does (no fade).
     with st.form("churn_predict_form"):
@@ -131,6 +200,7 @@ with tab1:
             avg_duration = st.number_input("Avg Duration (min)", min_value=0.0, value=18.0, step=1.0)
             RFMS_segment = st.selectbox("RFMS Segment", RFMS_OPTIONS)
             city = st.selectbox("City", CITY_OPTIONS)
+            user_id = st.text_input("Rider ID (optional)", help="Recorded with the score in the API's audit log")
 
         with col3:
             res = st.session_state.churn_result
@@ -152,11 +222,67 @@ with tab1:
             "avg_duration": float(avg_duration),
             "RFMS_segment": RFMS_segment,
         }
+        if user_id.strip():
+            payload["user_id"] = user_id.strip()
         res = predict(payload)
         if res:
             st.session_state.churn_result = res
+            st.session_state.churn_sensitivity = (payload, sensitivity(payload))
             show_result_dialog(res)
 
+    if st.session_state.churn_sensitivity and st.session_state.churn_sensitivity[1]:
+        rider, curves = st.session_state.churn_sensitivity
+        show_sensitivity(curves, rider)
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def job_progress(job_id: str):
+    """Polls the job until it finishes, then reruns the page once to show the result."""
+    try:
+        state = job_status(job_id)
+    except (requests.exceptions.RequestException, RuntimeError) as e:
+        st.warning(f"Cannot read job status: {e}")
+        return
+    if state["status"] not in ("queued", "running"):
+        st.rerun()
+    done, total = state["rows_done"], state["rows_total"]
+    st.progress(state["progress"], text=f"{state['status'].title()}: {done:,} / {total:,} rows" if total else "Queued")
+    if st.button("Cancel job", key=f"cancel_{job_id}"):
+        try:
+            cancel_job(job_id)
+        except (requests.exceptions.RequestException, RuntimeError) as e:
+            st.warning(f"Could not cancel the job: {e}")
+
+
+def show_job(job_id: str):
+    st.caption(f"Job `{job_id}`")
+    try:
+        state = job_status(job_id)
+    except (requests.exceptions.RequestException, RuntimeError) as e:
+        st.error(f"Cannot read job status: {e}")
+        return
+    if state["status"] in ("queued", "running"):
+        job_progress(job_id)
+    elif state["status"] == "succeeded":
+        results = st.session_state.setdefault("batch_job_results", {})
+        if job_id not in results:
+            with st.spinner("Downloading results..."):
+                results[job_id] = job_result(job_id)
+        st.success(f"Scored {state['rows_done']:,} rows")
+        if state.get("rows_invalid"):
+            st.warning(f"{state['rows_invalid']:,} rows were invalid and not scored; see their `error` column.")
+        data_table(
+            results[job_id],
+            key="batch_job_table",
+            sort_columns=["churn_probability"],
+            search_columns=["risk_level"],
+            file_name="predictions.csv",
+        )
+    elif state["status"] == "failed":
+        st.error(f"Job failed: {state['error']}")
+    else:
+        st.warning(f"Job {state['status']} after {state['rows_done']:,} rows")
+
+
 with tab2:
     st.subheader("Batch Upload")
     st.markdown("Upload a CSV with columns matching the single-predict inputs. See About for schema.")
@@ -164,25 +290,60 @@ with tab2:
     if uploaded:
         df = pd.read_csv(uploaded)
         st.dataframe(df.head(10), use_container_width=True)
-        if st.button("Predict batch"):
-            required = [
-                "recency", "total_trips", "avg_spend", "total_tip", "avg_tip", "avg_rating_given",
-                "loyalty_status", "city", "avg_distance", "avg_duration", "RFMS_segment",
-            ]
-            missing = [c for c in required if c not in df.columns]
-            if missing:
-                st.error(f"Missing columns: {missing}")
+        missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+        if missing:
+            st.error(f"Missing columns: {missing}")
+        elif st.toggle(
+            "Score as a background job on the server",
+            value=len(df) >= JOB_ROWS_THRESHOLD,
+            help="The file is uploaded once and scored by the API in the background; "
+                 "progress survives page reloads and dropped connections.",
+        ):
+            jobs = st.session_state.setdefault("batch_jobs", {})
+            client_id = st.session_state.setdefault("job_client_id", uuid.uuid4().hex)
+            job_id = jobs.get(uploaded.file_id)
+            if job_id is None:
+                if st.button("Submit job"):
+                    try:
+                        jobs[uploaded.file_id] = submit_job(uploaded.name, uploaded.getvalue(), client_id)["id"]
+                        st.rerun()
+                    except (requests.exceptions.RequestException, RuntimeError) as e:
+                        st.error(f"Could not submit the job: {e}")
             else:
-                try:
-                    r = requests.post(f"{API_URL}/predict/batch", json=df.to_dict(orient="records"), timeout=30)
-                    r.raise_for_status()
-                    out = r.json()
-                    preds = pd.DataFrame(out["predictions"])
-                    st.success(f"Processed {out['count']} rows")
-                    st.dataframe(preds, use_container_width=True)
-                    st.download_button("Download results", preds.to_csv(index=False), "predictions.csv", "text/csv")
-                except Exception as e:
-                    st.error(str(e))
+                show_job(job_id)
+        else:
+            # A new upload starts a new run; the same upload keeps its finished chunks so it can be resumed
+            if st.session_state.get("batch_run_file") != uploaded.file_id:
+                st.session_state.batch_run = BatchRun(df)
+                st.session_state.batch_run_file = uploaded.file_id
+            run = st.session_state.batch_run
+
+            resuming = bool(run.results) and not run.is_complete
+            st.caption(f"{len(df):,} rows in {len(run.chunks):,} chunks of up to {run.chunk_size:,}")
+            if st.button("Resume batch" if resuming else "Predict batch", disabled=run.is_complete):
+                progress = st.progress(0.0, text="Submitting...")
+                run.run(
+                    on_progress=lambda done, total: progress.progress(
+                        done / total if total else 1.0, text=f"{done:,} / {total:,} chunks"
+                    ),
+                )
+
+            if run.results:
+                n_done = sum(len(r) for r in run.results.values())
+                st.success(f"Processed {n_done:,} of {len(df):,} rows")
+            if run.errors:
+                st.warning(f"{len(run.errors)} chunk(s) failed. Click **Resume batch** to retry only those chunks.")
+                st.dataframe(run.error_report(), use_container_width=True, hide_index=True)
+
+            # Kept in session state so paging/sorting the results doesn't re-run the batch
+            if run.results:
+                data_table(
+                    run.assembled(),
+                    key="batch_predictions_table",
+                    sort_columns=["churn_probability", "row"],
+                    search_columns=["risk_level"],
+                    file_name="predictions.csv",
+                )
 
 with tab3:
     st.subheader("About")
@@ -190,8 +351,8 @@ with tab3:
     **RideWise Churn Predictor** estimates how likely a rider is to churn (stop using the service) and suggests actions to retain them.
 
     **What you can do**
-    - **Single Predict** — Enter one rider’s engagement and RFMS details; click **Predict Churn Risk** to see a pop-up with churn probability, risk level (Low / Medium / High), and a **recommendation** tailored to their segment and risk.
-    - **Batch Predict** — Upload a CSV with the same 11 columns; get churn probabilities and risk levels for all rows and download the results.
+    - **Single Predict** — Enter one rider’s engagement and RFMS details; click **Predict Churn Risk** to see a pop-up with churn probability, risk level (Low / Medium / High), and a **recommendation** tailored to their segment and risk. Below the form, **What-if Curves** show how the probability and risk band change as each feature varies.
+    - **Batch Predict** — Upload a CSV with the same 11 columns (plus an optional user_id); get churn probabilities and risk levels for all rows and download the results. Files of 20,000+ rows are scored as a background job on the server by default.
 
     **Inputs (11 features)**  
     The model uses: **recency** (days since last trip), **total_trips**, **avg_spend**, **total_tip**, **avg_tip**, **avg_rating_given**, **avg_distance**, **avg_duration**, **loyalty_status** (Bronze / Silver / Gold / Platinum), **RFMS_segment** (At Risk, Occasional Riders, Core Loyal Riders, High-Value Surge-Tolerant), and **city** (Cairo, Lagos, Nairobi).
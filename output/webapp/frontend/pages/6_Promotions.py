@@ -0,0 +1,139 @@
+import os
+
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+import webapp_path  # noqa: F401  (makes `common` importable)
+from common.timestamps import read_csv_utc
+from data_loader import TRIPS_PATH, data_path, trip_table
+from promotions import CONTROL, PromotionAnalyzer
+from widgets.data_table import data_table
+from widgets.metric_card import metric_card
+
+DATA_FILES = ["promotions.csv", "riders.csv", "sessions.csv"]
+
+METRIC_LABELS = {
+    "conversion_rate": "Conversion rate",
+    "sessions_per_rider": "Sessions per rider",
+    "trips_per_rider": "Trips per rider",
+    "revenue_per_rider": "Revenue per rider",
+}
+
+
+def data_signature() -> tuple:
+    paths = [data_path(name) for name in DATA_FILES] + ([TRIPS_PATH] if TRIPS_PATH.exists() else [])
+    return tuple((str(p), os.stat(p).st_size, os.stat(p).st_mtime_ns) for p in paths)
+
+
+@st.cache_resource(show_spinner="Indexing sessions and trips by city and time...", max_entries=2)
+def promotion_analyzer(signature: tuple) -> PromotionAnalyzer:
+    """One analyzer per data version; its per-promotion results are cached on it across reruns."""
+    promotions = pd.read_csv(data_path("promotions.csv"))
+    riders = pd.read_csv(data_path("riders.csv"))
+    sessions = read_csv_utc(data_path("sessions.csv"), ["session_time"])
+    trips = trip_table() if TRIPS_PATH.exists() else None
+    return PromotionAnalyzer(promotions, riders, sessions, trips)
+
+
+st.title("🎯 Promotion Uplift")
+st.caption(" Sessions and trips attributed to each promotion, and each A/B variant's uplift over Control with 95% confidence intervals.")
+
+try:
+    analyzer = promotion_analyzer(data_signature())
+except FileNotFoundError as e:
+    st.error(f"Promotion data not found: {e}")
+    st.stop()
+
+attribution = analyzer.attribution()
+
+st.subheader("📋 Promotions")
+data_table(
+    attribution,
+    key="promotion_attribution",
+    sort_columns=[c for c in ["sessions", "trips", "start_date"] if c in attribution.columns],
+    search_columns=["promo_id", "promo_name", "city_scope"],
+    height=300,
+    file_name="promotion_attribution.csv",
+)
+
+st.markdown("---")
+
+labels = dict(zip(attribution["promo_id"], attribution["promo_id"] + " – " + attribution["promo_name"]))
+promo_id = st.selectbox("Promotion", list(labels), format_func=labels.get, key="promotion_id")
+result = analyzer.analyze(promo_id)
+promo = result["promotion"]
+
+col1, col2, col3, col4 = st.columns(4)
+with col1:
+    metric_card("Target Segment", promo["target_segment"])
+with col2:
+    metric_card("City Scope", promo["city_scope"])
+with col3:
+    metric_card("Eligible Riders", f"{result['eligible_riders']:,}")
+with col4:
+    metric_card("Window", f"{promo['start_date']} → {promo['end_date']}")
+
+if result["simulated_assignment"] and len(result["variants"]) > 1:
+    st.info(
+        "A/B assignment is not recorded in the data, so riders are split into variants by a hash of their id. "
+        "Differences from Control are therefore chance by construction; the intervals show how large such "
+        "differences get at these group sizes, not an effect of the promotion."
+    )
+for note in result["notes"]:
+    st.info(note)
+
+variants, uplift = result["variants"], result["uplift"]
+
+left_col, right_col = st.columns([1.2, 1])
+
+with left_col:
+    metric = st.radio(
+        "Metric",
+        [m for m in METRIC_LABELS if m in variants.columns],
+        format_func=METRIC_LABELS.get,
+        horizontal=True,
+        key="promotion_metric",
+    )
+    fig = go.Figure()
+    for _, row in variants.iterrows():
+        match = uplift[(uplift["variant"] == row["variant"]) & (uplift["metric"] == metric)]
+        # Error bars show the interval of the difference vs Control, centred on the variant's value
+        error = None
+        if not match.empty:
+            error = dict(
+                type="data",
+                symmetric=False,
+                array=[match["ci_high"].iloc[0] - match["uplift"].iloc[0]],
+                arrayminus=[match["uplift"].iloc[0] - match["ci_low"].iloc[0]],
+            )
+        fig.add_bar(
+            x=[row["variant"]],
+            y=[row[metric]],
+            error_y=error,
+            marker_color="#9e9e9e" if row["variant"] == CONTROL else "#424242",
+            name=row["variant"],
+            hovertemplate=f"<b>{row['variant']}</b><br>{METRIC_LABELS[metric]}: %{{y:.3f}}<br>Riders: {row['riders']:,}<extra></extra>",
+        )
+    fig.update_layout(
+        title=f"{METRIC_LABELS[metric]} by Variant",
+        showlegend=False,
+        height=420,
+        title_font_size=20,
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+with right_col:
+    st.subheader("👥 Variants")
+    st.dataframe(variants, hide_index=True, use_container_width=True)
+
+if not uplift.empty:
+    st.subheader("📈 Uplift vs Control")
+    st.dataframe(
+        uplift.assign(metric=uplift["metric"].map(METRIC_LABELS)),
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            "relative_uplift": st.column_config.NumberColumn("relative_uplift", format="percent"),
+        },
+    )
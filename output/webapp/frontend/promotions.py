@@ -0,0 +1,280 @@
+"""
+Promotion attribution and A/B uplift.
+
+Promotions (`promotions.csv`) run in a city scope over a date window. Events
+(app sessions, and trips when `riders_trips.csv` is available) are attributed to
+the promotions active in their city at their time with a sort-based interval
+join: events are sorted once into a single int64 (city, UTC time) key, and each
+(promotion, city) interval is one key range found with two `searchsorted`
+calls. The join costs O((events + intervals) log events + matches) instead of
+the events x promotions comparisons of a cross join, and the attribution
+summary needs only the range bounds (O(events + intervals log events)).
+
+A/B assignment is not recorded in the data, so eligible riders are split into
+`ab_test_groups` by `test_allocation` with a stable hash of (promo_id, user_id).
+Each variant is compared with Control on riders' conversion (any converted
+session; Wald interval) and on sessions, trips and revenue per rider (Welch
+normal interval), at 95%. Promotions without a Control group only report
+per-group metrics. Because the split is simulated, any difference between a
+variant and Control is noise by construction: results carry
+`simulated_assignment` and no significance verdict, and the intervals only
+show how large chance differences get at these group sizes.
+
+This module has no Streamlit dependency.
+"""
+import ast
+
+import numpy as np
+import pandas as pd
+
+import webapp_path  # noqa: F401  (makes `common` importable)
+from common.timestamps import NAT, epoch_ns, to_datetime_utc
+
+NS_PER_DAY = 86_400 * 1_000_000_000
+ALL_CITIES = "All-Cities"
+CONTROL = "Control"
+Z_95 = 1.959963984540054
+# Window used by the "New" (signed up within) and "Active" (event within) target segments
+SEGMENT_LOOKBACK_DAYS = 30
+TRIP_REVENUE_COLUMNS = ["total_fare_with_tip", "total_fare", "fare"]
+
+
+def parse_promotions(promotions: pd.DataFrame) -> pd.DataFrame:
+    """Promotions with UTC window bounds in epoch ns ([start_date, end_date + 1 day)) and parsed A/B groups."""
+    df = promotions.reset_index(drop=True).copy()
+    df["start_ns"] = epoch_ns(df["start_date"])
+    df["end_ns"] = epoch_ns(df["end_date"]) + NS_PER_DAY
+    df["groups"] = df["ab_test_groups"].map(ast.literal_eval)
+    df["allocation"] = df["test_allocation"].map(lambda v: [float(a) for a in ast.literal_eval(v)])
+    return df
+
+
+class EventIndex:
+    """Event positions sorted by (city, time), with one int64 key per event for range lookups."""
+
+    def __init__(self, city_codes: np.ndarray, times_ns: np.ndarray):
+        valid = (city_codes >= 0) & (times_ns != NAT)
+        positions = np.flatnonzero(valid)
+        codes, times = city_codes[positions], times_ns[positions]
+        self.t0 = int(times.min()) if len(times) else 0
+        # Width of one city's key range; every event offset is in [0, span)
+        self.span = int(times.max()) - self.t0 + 1 if len(times) else 1
+        keys = codes.astype(np.int64) * self.span + (times - self.t0)
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.positions = positions[order]
+
+    def ranges(self, city_codes: np.ndarray, start_ns: np.ndarray, end_ns: np.ndarray):
+        """[lo, hi) into the sorted events for each (city, [start, end)) interval."""
+        base = np.asarray(city_codes, dtype=np.int64) * self.span
+        start = np.clip(np.asarray(start_ns, dtype=np.int64) - self.t0, 0, self.span)
+        end = np.clip(np.asarray(end_ns, dtype=np.int64) - self.t0, 0, self.span)
+        return np.searchsorted(self.keys, base + start), np.searchsorted(self.keys, base + end)
+
+    def join(self, city_codes: np.ndarray, start_ns: np.ndarray, end_ns: np.ndarray):
+        """(interval index, event position) for every event inside every interval."""
+        lo, hi = self.ranges(city_codes, start_ns, end_ns)
+        counts = hi - lo
+        interval = np.repeat(np.arange(len(lo)), counts)
+        first = np.cumsum(counts) - counts
+        sorted_idx = np.arange(counts.sum()) - np.repeat(first - lo, counts)
+        return interval, self.positions[sorted_idx]
+
+
+def assign_variants(user_ids, promo_id: str, groups: list[str], allocation: list[float]) -> np.ndarray:
+    """Stable group index per rider: hash of (promo_id, user_id) mapped onto the cumulative allocation."""
+    keys = pd.Series(user_ids, dtype=object).map(lambda u: f"{promo_id}|{u}")
+    unit = pd.util.hash_pandas_object(keys, index=False).to_numpy() / float(2 ** 64)
+    bounds = np.cumsum(allocation) / np.sum(allocation)
+    return np.minimum(np.searchsorted(bounds, unit, side="right"), len(groups) - 1)
+
+
+def proportion_diff_ci(x1, n1, x0, n0):
+    p1, p0 = x1 / n1, x0 / n0
+    se = np.sqrt(p1 * (1 - p1) / n1 + p0 * (1 - p0) / n0)
+    return p1 - p0, p1 - p0 - Z_95 * se, p1 - p0 + Z_95 * se
+
+
+def mean_diff_ci(values1: np.ndarray, values0: np.ndarray):
+    diff = values1.mean() - values0.mean()
+    se = np.sqrt(values1.var(ddof=1) / len(values1) + values0.var(ddof=1) / len(values0))
+    return diff, diff - Z_95 * se, diff + Z_95 * se
+
+
+class PromotionAnalyzer:
+    """Attribution and per-variant uplift for every promotion; results are cached per promo_id."""
+
+    def __init__(self, promotions: pd.DataFrame, riders: pd.DataFrame, sessions: pd.DataFrame,
+                 trips: pd.DataFrame = None):
+        self.promotions = parse_promotions(promotions)
+        self.riders = riders.reset_index(drop=True)
+        self._rider_index = pd.Index(self.riders["user_id"])
+        self.cities = sorted(set(self.riders["city"].dropna()) | set(sessions["city"].dropna()))
+        self._city_codes = {c: i for i, c in enumerate(self.cities)}
+        self._signup_ns = epoch_ns(self.riders["signup_date"])
+        self._loyalty = self.riders["loyalty_status"].to_numpy()
+        self._home_city = self._codes(self.riders["city"])
+
+        self._sessions = {
+            "rider": self._rider_index.get_indexer(sessions["rider_id"]),
+            "time": epoch_ns(sessions["session_time"]),
+            "converted": sessions["converted"].to_numpy(dtype=np.float64),
+        }
+        self._sessions["index"] = EventIndex(self._codes(sessions["city"]), self._sessions["time"])
+        self._trips = None
+        if trips is not None and len(trips):
+            revenue = next((c for c in TRIP_REVENUE_COLUMNS if c in trips.columns), None)
+            times = to_datetime_utc(trips["pickup_time"], errors="coerce")
+            self._trips = {
+                "rider": self._rider_index.get_indexer(trips["user_id"]),
+                "time": times.dt.tz_convert(None).dt.as_unit("ns").to_numpy().view(np.int64),
+                "revenue": trips[revenue].fillna(0).to_numpy(dtype=np.float64) if revenue else None,
+            }
+            self._trips["index"] = EventIndex(self._codes(trips["city"]), self._trips["time"])
+        self._results = {}
+
+    @property
+    def has_trips(self) -> bool:
+        return self._trips is not None
+
+    def _codes(self, cities: pd.Series) -> np.ndarray:
+        return cities.map(self._city_codes).fillna(-1).to_numpy(dtype=np.int64)
+
+    def _scope(self, city_scope: str) -> list[int]:
+        if city_scope == ALL_CITIES:
+            return list(range(len(self.cities)))
+        return [self._city_codes[city_scope]] if city_scope in self._city_codes else []
+
+    def intervals(self) -> pd.DataFrame:
+        """One row per (promotion, city) in its scope."""
+        rows = [(i, c, p.start_ns, p.end_ns) for i, p in self.promotions.iterrows() for c in self._scope(p.city_scope)]
+        return pd.DataFrame(rows, columns=["promo", "city", "start_ns", "end_ns"])
+
+    def attribution(self) -> pd.DataFrame:
+        """
+        Sessions (and trips) attributed to each promotion and how many promotions
+        were active on them on average. Only the interval bounds are used: counts are
+        hi - lo, and the number of active promotions per event is a prefix sum of
+        +1/-1 at the bounds, so no (promotion, event) pairs are materialized.
+        """
+        intervals = self.intervals()
+        promo = intervals["promo"].to_numpy()
+        summary = self.promotions[["promo_id", "promo_name", "city_scope", "start_date", "end_date"]].copy()
+        events = [("sessions", self._sessions)] + ([("trips", self._trips)] if self.has_trips else [])
+        for name, data in events:
+            index = data["index"]
+            lo, hi = index.ranges(intervals["city"], intervals["start_ns"], intervals["end_ns"])
+            # Active promotions per event, in sorted order, and its prefix sums
+            active = np.cumsum(np.bincount(lo, minlength=len(index.keys) + 1)
+                               - np.bincount(hi, minlength=len(index.keys) + 1))[:-1]
+            active_cumsum = np.concatenate([[0], np.cumsum(active)])
+            counts = np.bincount(promo, weights=hi - lo, minlength=len(summary))
+            summary[name] = counts.astype(np.int64)
+            summary[f"avg_active_promotions_per_{name[:-1]}"] = (
+                np.bincount(promo, weights=active_cumsum[hi] - active_cumsum[lo], minlength=len(summary))
+                / np.maximum(counts, 1)
+            )
+        return summary
+
+    def _eligible(self, promo) -> tuple[np.ndarray, list[str]]:
+        notes = []
+        mask = np.isin(self._home_city, self._scope(promo.city_scope))
+        segment = promo.target_segment
+        if segment == "Gold+":
+            mask &= np.isin(self._loyalty, ["Gold", "Platinum"])
+        elif segment == "New":
+            lookback = promo.start_ns - SEGMENT_LOOKBACK_DAYS * NS_PER_DAY
+            mask &= (self._signup_ns >= lookback) & (self._signup_ns < promo.end_ns)
+        elif segment == "Active":
+            lookback = promo.start_ns - SEGMENT_LOOKBACK_DAYS * NS_PER_DAY
+            active = np.zeros(len(self.riders), dtype=bool)
+            for data in [self._sessions] + ([self._trips] if self.has_trips else []):
+                recent = (data["time"] >= lookback) & (data["time"] < promo.start_ns) & (data["rider"] >= 0)
+                active[data["rider"][recent]] = True
+            if active.any():
+                mask &= active
+            else:
+                mask &= self._signup_ns < promo.start_ns
+                notes.append("No activity before the start date in the data; 'Active' = riders signed up before it.")
+        elif segment != "All":
+            notes.append(f"Unknown target segment {segment!r}; all riders in scope are used.")
+        return mask, notes
+
+    def _per_rider(self, data: dict, promo, weights_key: str = None) -> tuple[np.ndarray, np.ndarray]:
+        """Event count (and summed weights) per rider inside the promotion's (city, time) intervals."""
+        scope = self._scope(promo.city_scope)
+        _, position = data["index"].join(scope, [promo.start_ns] * len(scope), [promo.end_ns] * len(scope))
+        rider = data["rider"][position]
+        keep = rider >= 0
+        rider, position = rider[keep], position[keep]
+        counts = np.bincount(rider, minlength=len(self.riders)).astype(np.float64)
+        weights = None if weights_key is None or data[weights_key] is None else \
+            np.bincount(rider, weights=data[weights_key][position], minlength=len(self.riders))
+        return counts, weights
+
+    def analyze(self, promo_id: str) -> dict:
+        """Per-variant metrics and uplift vs Control for one promotion (cached)."""
+        if promo_id in self._results:
+            return self._results[promo_id]
+        promo = self.promotions.loc[self.promotions["promo_id"] == promo_id].iloc[0]
+        eligible, notes = self._eligible(promo)
+        rider_idx = np.flatnonzero(eligible)
+        variant = assign_variants(self.riders["user_id"].to_numpy()[rider_idx], promo_id, promo.groups, promo.allocation)
+
+        sessions, conversions = self._per_rider(self._sessions, promo, "converted")
+        metrics = {"converted": (conversions[rider_idx] > 0).astype(np.float64), "sessions": sessions[rider_idx]}
+        if self.has_trips:
+            trips, revenue = self._per_rider(self._trips, promo, "revenue")
+            metrics["trips"] = trips[rider_idx]
+            if revenue is not None:
+                metrics["revenue"] = revenue[rider_idx]
+        else:
+            notes.append("No trip data (riders_trips.csv); trips and revenue uplift are not available.")
+
+        rows = []
+        for g, group in enumerate(promo.groups):
+            in_group = variant == g
+            row = {"variant": group, "riders": int(in_group.sum())}
+            for name, values in metrics.items():
+                row[f"{name}_per_rider" if name != "converted" else "conversion_rate"] = \
+                    values[in_group].mean() if in_group.any() else np.nan
+            row["sessions"] = int(metrics["sessions"][in_group].sum())
+            rows.append(row)
+        variants = pd.DataFrame(rows)
+
+        uplift = []
+        if CONTROL in promo.groups:
+            control = variant == promo.groups.index(CONTROL)
+            for g, group in enumerate(promo.groups):
+                treated = variant == g
+                if group == CONTROL or treated.sum() < 2 or control.sum() < 2:
+                    continue
+                for name, values in metrics.items():
+                    if name == "converted":
+                        diff, low, high = proportion_diff_ci(values[treated].sum(), treated.sum(),
+                                                             values[control].sum(), control.sum())
+                        metric = "conversion_rate"
+                    else:
+                        diff, low, high = mean_diff_ci(values[treated], values[control])
+                        metric = f"{name}_per_rider"
+                    base = values[control].mean()
+                    uplift.append({
+                        "variant": group, "metric": metric, "control": base, "variant_value": values[treated].mean(),
+                        "uplift": diff, "ci_low": low, "ci_high": high,
+                        "relative_uplift": diff / base if base else np.nan,
+                    })
+        else:
+            notes.append("No Control group; per-group metrics only.")
+
+        result = {
+            "promotion": promo.drop(["groups", "allocation", "start_ns", "end_ns"]).to_dict(),
+            "eligible_riders": int(eligible.sum()),
+            # The data records no A/B assignment; variants come from assign_variants
+            "simulated_assignment": True,
+            "variants": variants,
+            "uplift": pd.DataFrame(uplift, columns=["variant", "metric", "control", "variant_value", "uplift",
+                                                    "ci_low", "ci_high", "relative_uplift"]),
+            "notes": notes,
+        }
+        self._results[promo_id] = result
+        return result
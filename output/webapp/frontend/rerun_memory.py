@@ -0,0 +1,94 @@
+"""
+Per-rerun memory instrumentation of the dashboard.
+
+Set DASHBOARD_MEMORY_PROFILE=1 to turn it on. `tracemalloc` then starts at
+import, and `Home.py` wraps every page run in `measure`. It records:
+
+* the peak of Python and NumPy/pandas allocations above the level at the start
+  of the run (`peak_bytes`);
+* what was still allocated at the end (`retained_bytes`);
+* the growth of the Arrow memory pool, which holds pandas' Arrow-backed strings
+  (`arrow_bytes`);
+* the process's resident memory.
+
+The last measurement is shown in the sidebar. The last LOG_SIZE are kept per
+process (`history`) for comparisons across sessions. tracemalloc traces the
+whole process, so reruns of concurrent sessions that overlap are counted in
+each other's numbers. It also slows allocations down, which is why it is
+opt-in.
+"""
+import os
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+import streamlit as st
+
+ENABLED = os.getenv("DASHBOARD_MEMORY_PROFILE", "").lower() not in ("", "0", "off", "false")
+LOG_SIZE = 256
+MB = 2 ** 20
+
+if ENABLED and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+
+@st.cache_resource(show_spinner=False)
+def _log() -> deque:
+    return deque(maxlen=LOG_SIZE)
+
+
+def rss_mb() -> float:
+    """Resident memory of this process (VmRSS), or 0 where /proc is not available."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+@contextmanager
+def measure(page: str):
+    """Measure the allocations of one page run; the result goes to session state and the process log."""
+    if not ENABLED:
+        yield
+        return
+    # Only needed when profiling; the dashboard itself does not import pyarrow
+    import pyarrow as pa
+
+    start_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    start_arrow = pa.total_allocated_bytes()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        current, peak = tracemalloc.get_traced_memory()
+        result = {
+            "page": page,
+            "seconds": time.perf_counter() - start,
+            "peak_bytes": max(peak - start_bytes, 0),
+            "retained_bytes": current - start_bytes,
+            "arrow_bytes": pa.total_allocated_bytes() - start_arrow,
+            "rss_mb": rss_mb(),
+        }
+        st.session_state["rerun_memory"] = result
+        _log().append(result)
+
+
+def history() -> list[dict]:
+    return list(_log())
+
+
+def show():
+    """One sidebar line with the last measurement of this session."""
+    result = st.session_state.get("rerun_memory") if ENABLED else None
+    if result:
+        st.sidebar.caption(
+            f"Last rerun ({result['page']}): {result['peak_bytes'] / MB:,.1f} MB peak, "
+            f"{result['retained_bytes'] / MB:+,.1f} MB kept, Arrow {result['arrow_bytes'] / MB:+,.1f} MB, "
+            f"RSS {result['rss_mb']:,.0f} MB"
+        )
@@ -0,0 +1,72 @@
+"""
+Static assets for the dashboard.
+
+Assets are compressed and written to frontend/static/ once per process under a
+content-hashed name, so pages reference a small URL (served by Streamlit static
+file serving, revalidated by ETag) instead of re-sending a base64 data URI on
+every rerun. If static serving is disabled, the compressed bytes are inlined.
+"""
+import base64
+import hashlib
+import io
+from pathlib import Path
+
+import streamlit as st
+
+_FRONTEND_DIR = Path(__file__).resolve().parent
+ASSETS_DIR = _FRONTEND_DIR / "assets"
+# Streamlit serves <main script dir>/static/ at app/static/ when server.enableStaticServing is on
+STATIC_DIR = _FRONTEND_DIR / "static"
+STATIC_URL = "app/static"
+
+# The background sits under a ~90% opaque overlay, so lossy compression is invisible
+BACKGROUND_QUALITY = 70
+
+
+def _compress_image(raw: bytes, suffix: str) -> tuple[bytes, str, str]:
+    """Re-encode as WebP when Pillow is available and it is smaller; returns (bytes, extension, mime)."""
+    try:
+        from PIL import Image
+
+        with Image.open(io.BytesIO(raw)) as img:
+            out = io.BytesIO()
+            img.convert("RGB").save(out, format="WEBP", quality=BACKGROUND_QUALITY, method=6)
+        if out.tell() < len(raw):
+            return out.getvalue(), "webp", "image/webp"
+    except Exception:
+        pass
+    ext = suffix.lstrip(".").lower()
+    return raw, ext, f"image/{ext}"
+
+
+def _publish(data: bytes, stem: str, ext: str) -> str:
+    """Write `data` to static/ under a content-hashed name (once) and return its URL."""
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    name = f"{stem}.{digest}.{ext}"
+    path = STATIC_DIR / name
+    if not path.exists():
+        STATIC_DIR.mkdir(exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_bytes(data)
+        tmp.replace(path)
+    return f"{STATIC_URL}/{name}"
+
+
+@st.cache_resource(show_spinner=False)
+def image_url(filename: str):
+    """
+    URL for an image in assets/, compressed once per process.
+
+    Returns None if the file is missing. Falls back to a data URI when static
+    serving is off or static/ is not writable.
+    """
+    src = ASSETS_DIR / filename
+    if not src.exists():
+        return None
+    data, ext, mime = _compress_image(src.read_bytes(), src.suffix)
+    if st.get_option("server.enableStaticServing"):
+        try:
+            return _publish(data, src.stem, ext)
+        except OSError:
+            pass
+    return f"data:{mime};base64," + base64.b64encode(data).decode("utf-8")
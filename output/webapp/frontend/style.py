@@ -1,26 +1,25 @@
-import base64
-from pathlib import Path
-
 import streamlit as st
 
-_FRONTEND_DIR = Path(__file__).resolve().parent
-_BG_PATH = _FRONTEND_DIR / "assets" / "background.png"
+from static_assets import image_url
 
 
 def inject_background_style():
-    """Use frontend/assets/background.png as full-app background for all pages."""
+    """
+    Use frontend/assets/background.png as full-app background for all pages.
+
+    Called once per run from Home.py (the navigation entrypoint), so pages don't
+    inject it again. The image is referenced by URL, not inlined, so each rerun only
+    sends a few hundred bytes of CSS.
+    """
     bg_css = ".main { background: linear-gradient(135deg, #0E1117 0%, #1A1D24 50%, #0d1117 100%); }"
-    if _BG_PATH.exists():
-        try:
-            bg_b64 = base64.b64encode(_BG_PATH.read_bytes()).decode("utf-8")
-            bg_css = (
-                ".stApp, [data-testid=\"stAppViewContainer\"] {"
-                " background-image: linear-gradient(135deg, rgba(14, 17, 23, 0.91) 0%, rgba(26, 29, 36, 0.9) 50%, rgba(13, 17, 23, 0.91) 100%),"
-                " url(\"data:image/png;base64," + bg_b64 + "\");"
-                " background-size: cover; background-position: center; background-attachment: fixed; }"
-            )
-        except Exception:
-            pass
+    bg_url = image_url("background.png")
+    if bg_url:
+        bg_css = (
+            ".stApp, [data-testid=\"stAppViewContainer\"] {"
+            " background-image: linear-gradient(135deg, rgba(14, 17, 23, 0.91) 0%, rgba(26, 29, 36, 0.9) 50%, rgba(13, 17, 23, 0.91) 100%),"
+            " url(\"" + bg_url + "\");"
+            " background-size: cover; background-position: center; background-attachment: fixed; }"
+        )
     st.markdown("<style>" + bg_css + "</style>", unsafe_allow_html=True)
 
 
@@ -0,0 +1,13 @@
+"""
+Puts the web app directory (output/webapp/) on sys.path, so the frontend can
+import the `common` package it shares with the data pipeline.
+
+Streamlit only adds frontend/ itself; the Docker image already sets PYTHONPATH
+to the web app directory. Import this module before any `common.*` import.
+"""
+import sys
+from pathlib import Path
+
+WEBAPP_DIR = str(Path(__file__).resolve().parent.parent)
+if WEBAPP_DIR not in sys.path:
+    sys.path.insert(1, WEBAPP_DIR)
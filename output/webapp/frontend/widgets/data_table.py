@@ -0,0 +1,131 @@
+import io
+import math
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+EXPORT_CHUNK_ROWS = 50_000
+
+
+def _search_mask(df, query, columns):
+    """Boolean mask of rows where any of `columns` contains `query` (case-insensitive)."""
+    needle = query.strip().lower()
+    if not needle:
+        return np.ones(len(df), dtype=bool)
+    mask = np.zeros(len(df), dtype=bool)
+    for col in columns:
+        values = df[col].astype(str).str.lower()
+        mask |= values.str.contains(needle, regex=False).to_numpy()
+    return mask
+
+
+def _sort_positions(values, positions, descending, top_n=None):
+    """
+    Order `positions` by `values[positions]`.
+
+    When `top_n` is smaller than the number of rows only the first `top_n`
+    positions are returned, using argpartition so the remaining rows are never
+    fully sorted.
+    """
+    keys = values[positions]
+    if keys.dtype.kind not in "biuf":
+        keys = pd.factorize(keys, sort=True)[0]
+    keys = keys.astype(float)
+    # NaNs always go last, whichever the direction
+    keys = np.where(np.isnan(keys), np.inf, -keys if descending else keys)
+
+    if top_n is not None and top_n < len(keys):
+        head = np.argpartition(keys, top_n - 1)[:top_n]
+        order = head[np.argsort(keys[head], kind="stable")]
+    else:
+        order = np.argsort(keys, kind="stable")
+    return positions[order]
+
+
+def _csv_export(df, positions, sort_by=None, descending=True):
+    """
+    Callable for st.download_button that builds the full result as one CSV in memory.
+
+    The full sort is deferred until the user actually clicks the button. Rows are
+    converted EXPORT_CHUNK_ROWS at a time, so only one chunk's intermediate frame
+    and string exist at once; Streamlit itself keeps the finished file in memory.
+    """
+    def build():
+        ordered = positions
+        if sort_by is not None:
+            ordered = _sort_positions(df[sort_by].to_numpy(), positions, descending)
+        buffer = io.BytesIO()
+        for start in range(0, len(ordered), EXPORT_CHUNK_ROWS):
+            chunk = df.iloc[ordered[start:start + EXPORT_CHUNK_ROWS]]
+            buffer.write(chunk.to_csv(index=False, header=(start == 0)).encode("utf-8"))
+        if len(ordered) == 0:
+            buffer.write(df.head(0).to_csv(index=False).encode("utf-8"))
+        buffer.seek(0)
+        return buffer
+    return build
+
+
+def data_table(
+    df,
+    key,
+    sort_columns=None,
+    search_columns=None,
+    page_size=50,
+    height=525,
+    file_name="export.csv",
+):
+    """
+    Paginated table that keeps the full frame on the server.
+
+    Search, sorting and paging are done with NumPy on row positions, and only the
+    visible page is sent to the browser. The export button builds the full
+    filtered and sorted result as a CSV when clicked.
+    """
+    if sort_columns is None:
+        sort_columns = [c for c in df.columns if pd.api.types.is_numeric_dtype(df[c])]
+    if search_columns is None:
+        # Text columns are "str" rather than object under pandas 3
+        search_columns = [c for c in df.columns
+                          if pd.api.types.is_string_dtype(df[c]) or pd.api.types.is_object_dtype(df[c])]
+
+    col_search, col_sort, col_dir = st.columns([2, 1.2, 0.8])
+    with col_search:
+        query = st.text_input("Search", key=f"{key}_search", placeholder="Search...")
+    with col_sort:
+        sort_by = st.selectbox("Sort by", options=sort_columns, key=f"{key}_sort") if sort_columns else None
+    with col_dir:
+        descending = st.toggle("Descending", value=True, key=f"{key}_desc")
+
+    positions = np.flatnonzero(_search_mask(df, query, search_columns)) if query else np.arange(len(df))
+    total_rows = len(positions)
+    total_pages = max(1, math.ceil(total_rows / page_size))
+
+    # A narrower search can leave the current page out of range
+    page_key = f"{key}_page"
+    if st.session_state.get(page_key, 1) > total_pages:
+        st.session_state[page_key] = total_pages
+    page = st.number_input("Page", min_value=1, max_value=total_pages, step=1, key=page_key)
+    start = (int(page) - 1) * page_size
+    stop = min(start + page_size, total_rows)
+
+    if sort_by is not None:
+        values = df[sort_by].to_numpy()
+        visible = _sort_positions(values, positions, descending, top_n=stop)[start:stop]
+    else:
+        visible = positions[start:stop]
+
+    st.dataframe(df.iloc[visible], height=height, use_container_width=True, hide_index=True)
+    st.caption(
+        f"Showing rows {start + 1 if total_rows else 0:,}–{stop:,} of {total_rows:,} "
+        f"(page {int(page):,} of {total_pages:,})"
+    )
+
+    st.download_button(
+        "Download CSV",
+        _csv_export(df, positions, sort_by, descending),
+        file_name=file_name,
+        mime="text/csv",
+        key=f"{key}_export",
+        on_click="ignore",
+    )
@@ -0,0 +1,7 @@
+"""
+Data-preparation pipeline.
+
+Reproduces the processed datasets in data/processed_data/ from the raw CSVs in
+data/ as a DAG of stages that only re-run when their code or inputs change.
+Run from the repository root with `python -m pipeline`.
+"""
@@ -0,0 +1,137 @@
+"""
+Overload benchmark of the API's admission control.
+
+The API is started on a free port for each of three runs (SCENARIOS): no flood,
+a flood with admission control off (ADMISSION_CONTROL=off), and the same flood
+with its defaults. Each run lasts `seconds` and has up to three kinds of
+traffic:
+
+* FLOOD_CLIENTS threads post FLOOD_ROWS-rider /predict/batch requests back to
+  back, the way a campaign tool would, pausing only when a 503 asks them to
+  (Retry-After);
+* SINGLE_CLIENTS threads post one rider to /predict every SINGLE_PAUSE seconds;
+* one thread polls /health every HEALTH_PAUSE seconds.
+
+The runs are reported side by side: the status counts per endpoint, latency
+percentiles of the successful (admitted) requests, the slowest health check, and
+the server's own /admission metrics. Payloads are serialized once up front, so
+the client threads mostly wait on the network.
+"""
+import json
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import requests
+
+from .dashboard_bench import start_api
+from .paths import PROCESSED_DIR
+from .synthetic import RIDERS_FILE, rider_features
+
+RIDERS_PATH = PROCESSED_DIR / RIDERS_FILE
+FLOOD_CLIENTS = 16
+FLOOD_ROWS = 2000
+SINGLE_CLIENTS = 4
+SINGLE_PAUSE = 0.05
+HEALTH_PAUSE = 0.5
+REQUEST_TIMEOUT = 30
+RUN_SECONDS = 20.0
+# (label, API environment, flooding clients)
+SCENARIOS = [
+    ("no flood", {}, 0),
+    ("flood, admission off", {"ADMISSION_CONTROL": "off"}, FLOOD_CLIENTS),
+    ("flood, admission on", {}, FLOOD_CLIENTS),
+]
+
+
+def _client(url: str, body: bytes, pause: float, stop: threading.Event, log: list, method: str = "post"):
+    session = requests.Session()
+    headers = {"Content-Type": "application/json"}
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            if method == "post":
+                r = session.post(url, data=body, headers=headers, timeout=REQUEST_TIMEOUT)
+            else:
+                r = session.get(url, timeout=REQUEST_TIMEOUT)
+            status = r.status_code
+        except requests.exceptions.RequestException:
+            status = "error"
+        log.append((status, time.perf_counter() - start))
+        # Back off as long as a 503 asks, as the dashboard's batch client does
+        retry_after = r.headers.get("Retry-After", "") if status == 503 else ""
+        wait = max(pause, int(retry_after)) if retry_after.isdigit() else pause
+        if wait:
+            stop.wait(wait)
+
+
+def _summary(log: list) -> dict:
+    ok = np.array([seconds for status, seconds in log if status == 200])
+    counts = {}
+    for status, _ in log:
+        counts[str(status)] = counts.get(str(status), 0) + 1
+    summary = {"requests": len(log), "status": counts}
+    if len(ok):
+        summary.update({f"p{q}_ms": round(float(np.percentile(ok, q)) * 1e3, 1) for q in (50, 99)})
+        summary["max_ms"] = round(float(ok.max()) * 1e3, 1)
+    return summary
+
+
+def overload(api_url: str, riders: pd.DataFrame, seconds: float = RUN_SECONDS,
+             flood_clients: int = FLOOD_CLIENTS) -> dict:
+    records = riders.to_dict(orient="records")
+    batch_body = json.dumps(records[:FLOOD_ROWS]).encode()
+    single_body = json.dumps(records[0]).encode()
+    logs = {"batch": [], "single": [], "health": []}
+    stop = threading.Event()
+    threads = [threading.Thread(target=_client, args=(f"{api_url}/predict/batch", batch_body, 0, stop, logs["batch"]))
+               for _ in range(flood_clients)]
+    threads += [threading.Thread(target=_client, args=(f"{api_url}/predict", single_body, SINGLE_PAUSE, stop,
+                                                       logs["single"]))
+                for _ in range(SINGLE_CLIENTS)]
+    threads.append(threading.Thread(target=_client, args=(f"{api_url}/health", b"", HEALTH_PAUSE, stop,
+                                                          logs["health"], "get")))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    result = {name: _summary(log) for name, log in logs.items()}
+    result["server"] = requests.get(f"{api_url}/admission", timeout=REQUEST_TIMEOUT).json()
+    return result
+
+
+def run(seconds: float = RUN_SECONDS, riders_path: Path = RIDERS_PATH) -> dict:
+    riders = rider_features(riders_path).drop(columns="user_id")
+    results = {}
+    for label, env, flood_clients in SCENARIOS:
+        with tempfile.TemporaryDirectory() as jobs_dir:
+            api, api_url = start_api(jobs_dir, env)
+            try:
+                results[label] = overload(api_url, riders, seconds, flood_clients)
+            finally:
+                api.terminate()
+                api.wait()
+    return results
+
+
+def report(results: dict) -> str:
+    lines = [
+        f"{FLOOD_CLIENTS} clients flooding /predict/batch ({FLOOD_ROWS} rows), {SINGLE_CLIENTS} clients on /predict, "
+        f"/health every {HEALTH_PAUSE:g} s",
+        "",
+        "| | " + " | ".join(results) + " |",
+        "|---|" + "---|" * len(results),
+    ]
+    for name in ("single", "batch", "health"):
+        for key, title in (("status", "responses"), ("p50_ms", "p50 ms"), ("p99_ms", "p99 ms"), ("max_ms", "max ms")):
+            cells = []
+            for result in results.values():
+                value = result[name].get(key, "–")
+                cells.append(", ".join(f"{k}: {v}" for k, v in value.items()) if isinstance(value, dict) else str(value))
+            lines.append(f"| {name} {title} | " + " | ".join(cells) + " |")
+    return "\n".join(lines) + "\n"
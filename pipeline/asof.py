@@ -0,0 +1,144 @@
+"""
+Point-in-time rider features (`user_agg_df`) for many as-of dates at once.
+
+`user_agg_df` aggregates every trip against one snapshot (the last pickup plus
+one day). `AsOfFeatures` sorts the trips once by (rider, pickup time) into
+contiguous arrays and keeps a prefix sum per aggregated column. For an as-of
+date, one `searchsorted` per rider finds how many of the rider's trips were
+picked up strictly before it; every sum, count and mean is then a difference of
+two prefix-sum entries, and the first and last pickup are direct lookups. No
+trips are filtered or regrouped per date.
+
+`features(dates)` returns one long table keyed by (user_id, as_of_date) with the
+columns of `user_agg_df`, `recency` measured from the as-of date. Every rider
+in the input gets a row for every date; riders with no trips before the date
+have total_trips 0, zero totals and NaN means, recency and active_days, as
+`user_agg_df` gives riders without trips. As of the pipeline's own snapshot the
+table equals `user_agg_df` (`check_against_pipeline`).
+"""
+import numpy as np
+import pandas as pd
+
+from output.webapp.common.timestamps import NAT, epoch_ns
+
+from .stages import user_agg_df
+
+# user_agg_df column -> source column of data_EDA, for the sums and means
+SUMS = {"total_spend": "fare", "total_tip": "tip"}
+MEANS = {
+    "avg_spend": "fare",
+    "avg_surge": "surge_multiplier",
+    "avg_tip": "tip",
+    "avg_rating_given": "avg_rating_given",
+    "avg_distance": "trip_distance_km",
+    "avg_duration": "trip_duration_min",
+}
+FIRSTS = ["loyalty_status", "city"]
+COLUMNS = ["user_id", "as_of_date", "recency", "total_trips", "total_spend", "avg_spend", "avg_surge", "total_tip",
+           "avg_tip", "avg_rating_given", "loyalty_status", "city", "avg_distance", "avg_duration", "active_days"]
+DAY_NS = 86_400 * 1_000_000_000
+
+
+class AsOfFeatures:
+    def __init__(self, data_eda: pd.DataFrame):
+        pickup = epoch_ns(data_eda["pickup_time"])
+        # Riders sorted like groupby output; loyalty and city as groupby "first" (first non-null, row order)
+        riders = data_eda.groupby("user_id")[FIRSTS].first()
+        self.user_ids = riders.index
+        self.firsts = riders.reset_index(drop=True)
+        rider = self.user_ids.get_indexer(data_eda["user_id"])
+
+        # Trips are the rows with a pickup (riders without trips come from the outer merge)
+        has_trip = (pickup != NAT) & data_eda["trip_id"].notna().to_numpy()
+        rider = rider[has_trip]
+        time = pickup[has_trip]
+        order = np.lexsort((time, rider))
+        self.rider = rider[order]
+        self.time = time[order]
+        self.n = len(self.user_ids)
+        counts = np.bincount(self.rider, minlength=self.n)
+        self.start = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+        # Composite key: rider * (distinct times + 1) + rank of the time, sorted because of the lexsort
+        self.times, rank = np.unique(self.time, return_inverse=True)
+        self._stride = len(self.times) + 1
+        self.key = self.rider * self._stride + rank
+
+        # Prefix sums over the sorted trips: values (NaN as 0) and non-null counts per column
+        self.prefix = {}
+        for column in set(SUMS.values()) | set(MEANS.values()):
+            values = data_eda[column].to_numpy(dtype=np.float64)[has_trip][order]
+            valid = ~np.isnan(values)
+            self.prefix[column] = (
+                np.concatenate([[0.0], np.cumsum(np.where(valid, values, 0.0))]),
+                np.concatenate([[0], np.cumsum(valid)]),
+            )
+        # user_agg_df's snapshot: the last pickup plus one day
+        self.snapshot = int(self.time.max()) + DAY_NS if len(self.time) else None
+
+    def positions(self, as_of: int) -> np.ndarray:
+        """Per rider, the end (index into the sorted trips) of their trips picked up before `as_of` (epoch ns)."""
+        rank = np.searchsorted(self.times, as_of, side="left")
+        return np.searchsorted(self.key, np.arange(self.n) * self._stride + rank, side="left")
+
+    def _features(self, as_of: int) -> dict:
+        end = self.positions(as_of)
+        count = end - self.start
+        has = count > 0
+        out = {"total_trips": count}
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for name, column in SUMS.items():
+                sums, _ = self.prefix[column]
+                out[name] = sums[end] - sums[self.start]
+            for name, column in MEANS.items():
+                sums, valid = self.prefix[column]
+                out[name] = (sums[end] - sums[self.start]) / (valid[end] - valid[self.start])
+        time = self.time if len(self.time) else np.zeros(1, dtype=np.int64)
+        last = np.where(has, time[np.maximum(end - 1, 0)], 0)
+        first = np.where(has, time[np.minimum(self.start, len(time) - 1)], 0)
+        out["recency"] = np.where(has, (as_of - last) // DAY_NS, np.nan)
+        out["active_days"] = np.where(has, (last - first) // DAY_NS, np.nan)
+        return out
+
+    def features(self, as_of_dates=None) -> pd.DataFrame:
+        """The long (user_id, as_of_date) table; the default date is the pipeline's snapshot."""
+        dates = [self.snapshot] if as_of_dates is None else [_epoch_ns(d) for d in as_of_dates]
+        frames = []
+        for as_of in dates:
+            frame = self.firsts.assign(user_id=self.user_ids, as_of_date=pd.Timestamp(as_of, tz="UTC"),
+                                       **self._features(as_of))
+            frames.append(frame[COLUMNS])
+        return pd.concat(frames, ignore_index=True)
+
+
+def _epoch_ns(date) -> int:
+    """UTC epoch nanoseconds of one as-of date; naive dates are taken as UTC."""
+    ts = pd.Timestamp(date)
+    if ts is pd.NaT:
+        raise ValueError(f"Invalid as-of date: {date!r}")
+    return (ts.tz_localize("UTC") if ts.tzinfo is None else ts).as_unit("ns").value
+
+
+def asof_features(data_eda: pd.DataFrame, as_of_dates=None) -> pd.DataFrame:
+    return AsOfFeatures(data_eda).features(as_of_dates)
+
+
+def check_against_pipeline(data_eda: pd.DataFrame) -> float:
+    """Largest absolute difference to `user_agg_df` as of its own snapshot; raises if rows or labels differ."""
+    builder = AsOfFeatures(data_eda)
+    ours = builder.features().drop(columns="as_of_date")
+    theirs = user_agg_df(data_eda)
+    if not ours["user_id"].equals(theirs["user_id"]):
+        raise AssertionError("Rider rows differ from user_agg_df")
+    worst = 0.0
+    for column in theirs.columns.drop("user_id"):
+        a, b = ours[column], theirs[column]
+        if a.dtype.kind in "fiu" and b.dtype.kind in "fiu":
+            a, b = a.to_numpy(dtype=np.float64), b.to_numpy(dtype=np.float64)
+            if not np.array_equal(np.isnan(a), np.isnan(b)):
+                raise AssertionError(f"{column}: missing values differ")
+            both = ~np.isnan(a)
+            worst = max(worst, float(np.abs(a[both] - b[both]).max(initial=0.0)))
+        elif not a.astype(object).equals(b.astype(object)):
+            raise AssertionError(f"{column} differs")
+    return worst
@@ -0,0 +1,121 @@
+"""
+Request-latency cost of the API's prediction audit log.
+
+The API is started on a free port twice: with the audit log off
+(AUDIT_DB_PATH="") and on (a fresh database in a temporary directory). Each run
+sends SINGLE_REQUESTS one-rider /predict requests and then BATCH_REQUESTS
+BATCH_ROWS-row /predict/batch requests, one at a time, and reports latency
+percentiles. With the log on, the server's /audit metrics (request-path submit
+time, rows written, group commits) are read once the writer has flushed.
+
+For comparison, `sync_commit_ms` times what the request path would pay to
+commit each single-rider request itself: one INSERT plus COMMIT on a WAL
+database, with the writer's synchronous=NORMAL and with synchronous=FULL (an
+fsync per commit).
+"""
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import requests
+
+from .admission_bench import RIDERS_PATH
+from .dashboard_bench import start_api
+from .synthetic import rider_features
+
+SINGLE_REQUESTS = 1000
+BATCH_REQUESTS = 30
+BATCH_ROWS = 1000
+WARMUP_REQUESTS = 20
+REQUEST_TIMEOUT = 30
+
+
+def _latencies(session: requests.Session, url: str, bodies: list) -> np.ndarray:
+    seconds = []
+    for body in bodies:
+        start = time.perf_counter()
+        session.post(url, json=body, timeout=REQUEST_TIMEOUT).raise_for_status()
+        seconds.append(time.perf_counter() - start)
+    return np.array(seconds)
+
+
+def _summary(seconds: np.ndarray) -> dict:
+    return {f"p{q}_ms": round(float(np.percentile(seconds, q)) * 1e3, 2) for q in (50, 99)}
+
+
+def measure(api_url: str, riders: list[dict]) -> dict:
+    session = requests.Session()
+    _latencies(session, f"{api_url}/predict", riders[:WARMUP_REQUESTS])
+    single = _latencies(session, f"{api_url}/predict", [riders[i % len(riders)] for i in range(SINGLE_REQUESTS)])
+    batches = [riders[(i * BATCH_ROWS) % len(riders):][:BATCH_ROWS] for i in range(BATCH_REQUESTS)]
+    batch = _latencies(session, f"{api_url}/predict/batch", batches)
+    return {"single": _summary(single), "batch": _summary(batch)}
+
+
+def sync_commit_ms(rider: dict, synchronous: str = "NORMAL", repeats: int = 200) -> float:
+    """Median time of one single-row transaction, as a synchronous audit write would take."""
+    # Imported here: the backend package loads the model
+    from output.webapp.backend.audit import COLUMNS, INSERT, SCHEMA
+
+    record = tuple(rider.get(column) for column in COLUMNS)
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(Path(tmp) / "audit.db", isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={synchronous}")
+        conn.executescript(SCHEMA)
+        seconds = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            conn.execute("BEGIN")
+            conn.execute(INSERT, record)
+            conn.execute("COMMIT")
+            seconds.append(time.perf_counter() - start)
+        conn.close()
+    return round(float(np.median(seconds)) * 1e3, 3)
+
+
+def run(riders_path: Path = RIDERS_PATH) -> dict:
+    riders = rider_features(riders_path).to_dict(orient="records")
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, env in (("audit off", {"AUDIT_DB_PATH": ""}), ("audit on", {"AUDIT_DB_PATH": f"{tmp}/audit.db"})):
+            with tempfile.TemporaryDirectory() as jobs_dir:
+                api, api_url = start_api(jobs_dir, env)
+                try:
+                    results[label] = measure(api_url, riders)
+                    if env["AUDIT_DB_PATH"]:
+                        time.sleep(2.5)  # let the writer's next flush pass
+                        results[label]["server"] = requests.get(f"{api_url}/audit", timeout=REQUEST_TIMEOUT).json()
+                finally:
+                    api.terminate()
+                    api.wait()
+    results["sync_commit_ms"] = {mode: sync_commit_ms(riders[0], mode) for mode in ("NORMAL", "FULL")}
+    return results
+
+
+def report(results: dict) -> str:
+    labels = [label for label in results if label != "sync_commit_ms"]
+    lines = [
+        f"{SINGLE_REQUESTS} sequential /predict requests, then {BATCH_REQUESTS} /predict/batch requests of "
+        f"{BATCH_ROWS} rows",
+        "",
+        "| | " + " | ".join(labels) + " |",
+        "|---|" + "---|" * len(labels),
+    ]
+    for name in ("single", "batch"):
+        for key in ("p50_ms", "p99_ms"):
+            lines.append(f"| {name} {key.replace('_', ' ')} | "
+                         + " | ".join(str(results[label][name][key]) for label in labels) + " |")
+    server = next((results[label]["server"] for label in labels if "server" in results[label]), None)
+    if server:
+        lines += [
+            "",
+            f"Audit log: {server['rows']['written']:,} of {server['rows']['submitted']:,} rows written in "
+            f"{server['transactions']} transactions, {server['rows']['dropped']} dropped; "
+            f"submit {server['overhead']['submit_us_mean']:.1f} µs per request on average",
+        ]
+    lines.append("A synchronous single-row commit would take "
+                 + ", ".join(f"{ms} ms ({mode})" for mode, ms in results["sync_commit_ms"].items()) + " per request")
+    return "\n".join(lines) + "\n"
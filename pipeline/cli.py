@@ -0,0 +1,368 @@
+"""
+Command line interface of the data-preparation pipeline.
+
+    python -m pipeline run                      # run every stage that is out of date
+    python -m pipeline run data_preprocessed    # one target and whatever it depends on
+    python -m pipeline run --force --workers 4
+    python -m pipeline status
+    python -m pipeline list
+    python -m pipeline sessions-agg big_sessions.csv --block-mb 256 --workers 8 -o sessions_agg.parquet
+    python -m pipeline train --folds 5 --jobs -1 --fn-cost 5 --fp-cost 1
+    python -m pipeline segment --algorithm minibatch --k 4
+    python -m pipeline assign-segments new_riders.csv -o new_riders_clusters.csv
+    python -m pipeline export-forest output/webapp/model/rf_churn_model.joblib --benchmark
+    python -m pipeline drift-reference
+    python -m pipeline referrals --top 10
+    python -m pipeline synth --scale 10 -o data/synthetic/10x
+    python -m pipeline bench-dashboard --scales 1 10 100
+    python -m pipeline bench-admission --seconds 20
+    python -m pipeline bench-audit
+    python -m pipeline audit-history R00042 --limit 20
+    python -m pipeline asof-features --start 2024-01-01 --end 2025-01-01 --freq MS -o features_asof.parquet
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+from .sessions_chunked import aggregate_sessions
+from .stages import PIPELINE
+
+
+def _cmd_run(args) -> int:
+    outcome = PIPELINE.run(
+        targets=args.targets or None,
+        force=args.force,
+        workers=args.workers,
+        write_csv=not args.no_csv,
+        dry_run=args.dry_run,
+    )
+    counts = {}
+    for result in outcome.values():
+        counts[result] = counts.get(result, 0) + 1
+    print(", ".join(f"{n} {result}" for result, n in sorted(counts.items())))
+    return 1 if "failed" in counts else 0
+
+
+def _cmd_status(args) -> int:
+    for name, state in PIPELINE.status().items():
+        print(f"{name:<28} {state}")
+    return 0
+
+
+def _cmd_list(args) -> int:
+    for name in PIPELINE.topological_order():
+        stage = PIPELINE.stages[name]
+        print(f"{name:<28} {', '.join(stage.inputs)} -> {', '.join(stage.outputs)}")
+    return 0
+
+
+def _cmd_sessions_agg(args) -> int:
+    df = aggregate_sessions(args.path, block_bytes=args.block_mb * 1024 * 1024, workers=args.workers)
+    if args.output.endswith(".parquet"):
+        df.to_parquet(args.output, index=False)
+    else:
+        df.to_csv(args.output, index=False)
+    print(f"{len(df)} riders -> {args.output}")
+    return 0
+
+
+def _cmd_train(args) -> int:
+    # Imported here so the other commands do not load the model service
+    from . import train
+
+    start = time.perf_counter()
+    report, _ = train.select_model(n_splits=args.folds, n_jobs=args.jobs, fn_cost=args.fn_cost, fp_cost=args.fp_cost)
+    print(report.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+    best = report.iloc[0]
+    print(f"Selected {best['model']} at threshold {best['threshold']:.2f}")
+    if args.dry_run:
+        return 0
+    written = train.train_and_save(best["model"], best["threshold"], output_dir=args.output_dir)
+    for key, path in written.items():
+        print(f"  {key:<12} -> {path}")
+    print(f"Done in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+def _cmd_segment(args) -> int:
+    from . import segmentation
+
+    start = time.perf_counter()
+    raw, scaler = segmentation.load_features()
+    X = scaler.transform(raw[segmentation.FEATURES].to_numpy(dtype=float))
+    results = segmentation.sweep(X, ks=range(args.k_min, args.k_max + 1), algorithm=args.algorithm,
+                                 n_jobs=args.jobs, sample_size=args.sample)
+    print(segmentation.sweep_report(results).to_string(index=False, float_format=lambda v: f"{v:,.4f}"))
+    chosen = segmentation.choose(results, args.k)
+    print(f"Selected k={chosen['k']} ({args.algorithm}), sizes {chosen['sizes'].tolist()}")
+    if not args.dry_run:
+        print(f"  segmentation -> {segmentation.save(chosen, scaler, raw, args.algorithm, args.output_dir)}")
+    print(f"Done in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+def _cmd_assign_segments(args) -> int:
+    import pandas as pd
+
+    from output.webapp.backend.segmentation import SEGMENTATION_PATH, SegmentAssigner
+
+    assigner = SegmentAssigner(Path(args.artifact) if args.artifact else SEGMENTATION_PATH)
+    df = pd.read_csv(args.path)
+    df["cluster"] = assigner.assign(df)
+    df.to_csv(args.output, index=False)
+    print(f"{len(df)} riders assigned to {assigner.k} clusters -> {args.output}")
+    return 0
+
+
+def _cmd_export_forest(args) -> int:
+    import joblib
+
+    from output.webapp.backend.forest import FlatForest, export_forest, file_sha256
+    from output.webapp.backend.model_loader import MODEL_PATH, _patch_tree_monotonic_cst
+
+    source = Path(args.model) if args.model else MODEL_PATH.parent / "rf_churn_model.joblib"
+    model = joblib.load(source)
+    _patch_tree_monotonic_cst(model)
+    path = export_forest(model, source.with_suffix(".forest"), file_sha256(source))
+    print(f"{source.name} ({source.stat().st_size:,} bytes) -> {path} ({path.stat().st_size:,} bytes)")
+    if args.benchmark:
+        from . import forest_bench
+
+        print(forest_bench.report(model, source, FlatForest(path)).to_string(index=False))
+    return 0
+
+
+def _cmd_drift_reference(args) -> int:
+    from output.webapp.backend.model_loader import ChurnModelService
+
+    from .train import write_drift_reference
+
+    service = ChurnModelService()
+    path = write_drift_reference(service.preprocessor, service.model, args.output_dir)
+    print(f"Training distributions scored by the live model -> {path}")
+    return 0
+
+
+def _cmd_referrals(args) -> int:
+    import pandas as pd
+
+    from .referrals import ReferralGraph
+    from .storage import read_dataset
+
+    riders = pd.read_csv(args.path) if args.path else read_dataset("riders")
+    start = time.perf_counter()
+    graph = ReferralGraph(riders["user_id"], riders["referred_by"])
+    components = graph.components()
+    elapsed = time.perf_counter() - start
+    referred = int((graph.parent >= 0).sum())
+    print(f"{graph.n:,} riders, {referred:,} referred, {len(components):,} referral trees "
+          f"(largest {components['size'].iloc[0]:,}, deepest {components['depth'].max()}), "
+          f"{int(graph.cycle_root.sum())} cycles cut, {int(graph.unknown_referrer.sum())} unknown referrers")
+    print(components.head(args.top).to_string(index=False))
+    print(f"Built and traversed in {elapsed:.2f}s")
+    return 0
+
+
+def _cmd_synth(args) -> int:
+    from . import synthetic
+
+    output = args.output or synthetic.DEFAULT_DIR / f"{args.scale:g}x"
+    counts = synthetic.generate(args.scale, output, seed=args.seed)
+    print(f"{counts['riders']:,} riders, {counts['trips']:,} trips, {counts['sessions']:,} sessions "
+          f"-> {output} in {counts['seconds']:.1f}s")
+    return 0
+
+
+def _cmd_bench_dashboard(args) -> int:
+    from . import dashboard_bench
+
+    print(dashboard_bench.run(args.scales, api_url=args.api_url, output=args.output))
+    return 0
+
+
+def _cmd_bench_admission(args) -> int:
+    from . import admission_bench
+
+    results = admission_bench.run(args.seconds)
+    print(admission_bench.report(results))
+    for label, result in results.items():
+        print(f"Server metrics, {label}:")
+        print(json.dumps(result["server"]["classes"], indent=2))
+    return 0
+
+
+def _cmd_bench_audit(args) -> int:
+    from . import audit_bench
+
+    print(audit_bench.report(audit_bench.run()))
+    return 0
+
+
+def _cmd_audit_history(args) -> int:
+    import pandas as pd
+
+    from output.webapp.backend.audit import DEFAULT_AUDIT_PATH, rider_history
+
+    try:
+        history = rider_history(args.user_id, args.db or DEFAULT_AUDIT_PATH, limit=args.limit, since=args.since)
+    except FileNotFoundError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if args.output:
+        history.to_csv(args.output, index=False)
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(history[["scored_at", "endpoint", "model_version", "churn_probability", "risk_level",
+                       "recommendation", "recency", "total_trips", "RFMS_segment"]].to_string(index=False))
+    print(f"{len(history)} scores of {args.user_id}" + (f" -> {args.output}" if args.output else ""))
+    return 0
+
+
+def _cmd_asof_features(args) -> int:
+    import pandas as pd
+
+    from .asof import AsOfFeatures, check_against_pipeline
+    from .storage import read_dataset
+
+    data_eda = read_dataset("data_EDA") if args.path is None else (
+        pd.read_parquet(args.path) if args.path.endswith(".parquet") else pd.read_csv(args.path))
+    if args.check:
+        print(f"Largest difference to user_agg_df at its snapshot: {check_against_pipeline(data_eda):.3g}")
+    if args.dates:
+        dates = args.dates
+    elif args.start:
+        dates = pd.date_range(args.start, args.end, freq=args.freq, tz="UTC")
+    else:
+        dates = None
+    start = time.perf_counter()
+    builder = AsOfFeatures(data_eda)
+    prepared = time.perf_counter() - start
+    df = builder.features(dates)
+    elapsed = time.perf_counter() - start
+    if args.output:
+        if args.output.endswith(".parquet"):
+            df.to_parquet(args.output, index=False)
+        else:
+            df.to_csv(args.output, index=False)
+    print(f"{df['as_of_date'].nunique()} as-of dates x {builder.n:,} riders = {len(df):,} rows "
+          f"in {elapsed:.2f}s (sorting {prepared:.2f}s)" + (f" -> {args.output}" if args.output else ""))
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m pipeline", description="Incremental data-preparation pipeline.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Run out-of-date stages")
+    run.add_argument("targets", nargs="*", help="Stages to bring up to date (default: all)")
+    run.add_argument("--force", action="store_true", help="Re-run selected stages even if their inputs are unchanged")
+    run.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    run.add_argument("--no-csv", action="store_true", help="Write Parquet only, skip the CSV exports")
+    run.add_argument("--dry-run", action="store_true", help="Show which stages would run")
+    run.set_defaults(func=_cmd_run)
+
+    status = sub.add_parser("status", help="Show which stages are up to date")
+    status.set_defaults(func=_cmd_status)
+
+    lst = sub.add_parser("list", help="List stages with their inputs and outputs")
+    lst.set_defaults(func=_cmd_list)
+
+    sessions = sub.add_parser("sessions-agg", help="Aggregate a session log of any size per rider, in blocks")
+    sessions.add_argument("path", help="Session CSV with the columns of data/sessions.csv")
+    sessions.add_argument("--block-mb", type=int, default=64, help="Approximate block size in MiB (default: 64)")
+    sessions.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    sessions.add_argument("-o", "--output", required=True, help="Output file (.parquet or .csv)")
+    sessions.set_defaults(func=_cmd_sessions_agg)
+
+    train = sub.add_parser("train", help="Cross-validate churn models in parallel and write the serving artifacts")
+    train.add_argument("--folds", type=int, default=5, help="Cross-validation folds (default: 5)")
+    train.add_argument("--jobs", type=int, default=-1, help="Parallel fits (default: -1, all cores)")
+    train.add_argument("--fn-cost", type=float, default=5.0, help="Cost of a missed churner (default: 5)")
+    train.add_argument("--fp-cost", type=float, default=1.0, help="Cost of an unneeded retention offer (default: 1)")
+    train.add_argument("--output-dir", default=None,
+                       help="Write artifacts here instead of output/webapp/model/ (same file names)")
+    train.add_argument("--dry-run", action="store_true", help="Only print the model comparison")
+    train.set_defaults(func=_cmd_train)
+
+    segment = sub.add_parser("segment", help="Sweep k in parallel, pick a clustering and save its centroids")
+    segment.add_argument("--algorithm", choices=["kmeans", "minibatch"], default="kmeans",
+                         help="Full KMeans (notebook settings) or MiniBatchKMeans for large rider counts")
+    segment.add_argument("--k-min", type=int, default=2)
+    segment.add_argument("--k-max", type=int, default=10)
+    segment.add_argument("--k", type=int, default=None, help="Use this k (default: best sampled silhouette)")
+    segment.add_argument("--jobs", type=int, default=-1, help="Parallel fits (default: -1, all cores)")
+    segment.add_argument("--sample", type=int, default=10_000, help="Rows used for the quality metrics")
+    segment.add_argument("--output-dir", default=None, help="Write segmentation.joblib here instead of output/webapp/model/")
+    segment.add_argument("--dry-run", action="store_true", help="Only print the sweep")
+    segment.set_defaults(func=_cmd_segment)
+
+    assign = sub.add_parser("assign-segments", help="Assign riders in a CSV to the saved clusters")
+    assign.add_argument("path", help="CSV with recency, total_trips and avg_spend per rider")
+    assign.add_argument("-o", "--output", required=True, help="Output CSV (input columns plus `cluster`)")
+    assign.add_argument("--artifact", default=None, help="segmentation.joblib to use (default: output/webapp/model/)")
+    assign.set_defaults(func=_cmd_assign_segments)
+
+    export = sub.add_parser("export-forest", help="Write a tree model as a flat, memory-mappable .forest file")
+    export.add_argument("model", nargs="?", default=None,
+                        help="Fitted RandomForest/DecisionTree joblib file (default: the RF churn model)")
+    export.add_argument("--benchmark", action="store_true",
+                        help="Compare load time, batch latency and probabilities with the pickle")
+    export.set_defaults(func=_cmd_export_forest)
+
+    drift = sub.add_parser("drift-reference",
+                           help="Save the training feature/score histograms the backend's drift monitor compares with")
+    drift.add_argument("--output-dir", default=None,
+                       help="Write drift_reference.joblib here instead of output/webapp/model/")
+    drift.set_defaults(func=_cmd_drift_reference)
+
+    referral = sub.add_parser("referrals", help="Summarize the referral trees of riders.csv")
+    referral.add_argument("path", nargs="?", default=None, help="Riders CSV with user_id and referred_by (default: data/riders.csv)")
+    referral.add_argument("--top", type=int, default=10, help="Largest trees to list (default: 10)")
+    referral.set_defaults(func=_cmd_referrals)
+
+    synth = sub.add_parser("synth", help="Generate riders, trips, sessions and the web app's tables at a scale factor")
+    synth.add_argument("--scale", type=float, default=1.0, help="Multiple of the riders in data/riders.csv (default: 1)")
+    synth.add_argument("-o", "--output", default=None, help="Output directory (default: data/synthetic/<scale>x)")
+    synth.add_argument("--seed", type=int, default=7)
+    synth.set_defaults(func=_cmd_synth)
+
+    bench = sub.add_parser("bench-dashboard",
+                           help="Time every dashboard page (AppTest) and the API on synthetic data per scale")
+    bench.add_argument("--scales", type=float, nargs="+", default=[1, 10, 100], help="Scale factors (default: 1 10 100)")
+    bench.add_argument("--api-url", default=None, help="Use this running API (default: start one on a free port)")
+    bench.add_argument("-o", "--output", default=None, help="Report file (default: data/synthetic/scaling_report.md)")
+    bench.set_defaults(func=_cmd_bench_dashboard)
+
+    admission = sub.add_parser("bench-admission",
+                               help="Time single-rider requests while batches flood the API, admission off vs on")
+    admission.add_argument("--seconds", type=float, default=20.0, help="Length of each run (default: 20)")
+    admission.set_defaults(func=_cmd_bench_admission)
+
+    audit = sub.add_parser("bench-audit", help="Time /predict and /predict/batch with the audit log off vs on")
+    audit.set_defaults(func=_cmd_bench_audit)
+
+    history = sub.add_parser("audit-history", help="A rider's audited churn scores, newest first")
+    history.add_argument("user_id", help="Rider id")
+    history.add_argument("--db", default=None, help="Audit database (default: output/webapp/audit/predictions.db)")
+    history.add_argument("--limit", type=int, default=100, help="Most recent scores to show (default: 100)")
+    history.add_argument("--since", default=None, help="Only scores from this date/time on (UTC)")
+    history.add_argument("-o", "--output", default=None, help="Also write all columns to this CSV")
+    history.set_defaults(func=_cmd_audit_history)
+
+    asof = sub.add_parser("asof-features", help="user_agg_df features of every rider as of each of several dates")
+    asof.add_argument("path", nargs="?", default=None, help="data_EDA file (default: the pipeline's data_EDA)")
+    asof.add_argument("--dates", nargs="+", default=None, help="As-of dates, e.g. 2024-06-01 2024-07-01")
+    asof.add_argument("--start", default=None, help="First as-of date of a range (with --end and --freq)")
+    asof.add_argument("--end", default=None, help="Last as-of date of the range")
+    asof.add_argument("--freq", default="MS", help="pandas frequency of the range (default: MS, month starts)")
+    asof.add_argument("--check", action="store_true",
+                      help="First compare with user_agg_df at its own snapshot (last pickup + 1 day)")
+    asof.add_argument("-o", "--output", default=None, help="Output file (.parquet or .csv)")
+    asof.set_defaults(func=_cmd_asof_features)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    sys.exit(args.func(args))
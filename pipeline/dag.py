@@ -0,0 +1,263 @@
+"""
+Stage declarations and the incremental, parallel DAG runner.
+
+Each stage declares the datasets it reads and writes. A stage is skipped when its
+fingerprint (stage code and its declared dependencies + content hashes of its
+input files) matches the one
+recorded in the manifest after its last successful run and its outputs still
+exist. Stages whose dependencies are satisfied run concurrently in worker
+processes.
+"""
+import hashlib
+import inspect
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from .paths import MANIFEST_PATH
+from .storage import dataset_file, file_sha256, read_dataset, write_dataset
+
+
+class Stage:
+    """
+    One step of the pipeline. `func` receives the input datasets as DataFrames in
+    `inputs` order, or their file paths when `read_inputs` is False (for stages
+    that stream files larger than memory).
+
+    `deps` lists what `func` relies on besides its own body: modules and helper
+    functions (hashed by source) and constants (hashed by repr). Editing any of
+    them makes the stage stale like editing `func` does.
+    """
+
+    def __init__(self, name: str, func, inputs: list[str], outputs: list[str], read_inputs: bool = True,
+                 deps: list = ()):
+        self.name = name
+        self.func = func
+        self.inputs = inputs
+        self.outputs = outputs
+        self.read_inputs = read_inputs
+        # Hashed up front: stages are pickled to the worker processes, modules are not picklable
+        self.deps_hash = hashlib.sha256("".join(_source(dep) for dep in deps).encode("utf-8")).hexdigest()
+
+    def code_hash(self) -> str:
+        digest = hashlib.sha256(inspect.getsource(self.func).encode("utf-8"))
+        digest.update(self.deps_hash.encode("utf-8"))
+        return digest.hexdigest()
+
+    def __repr__(self):
+        return f"Stage({self.name}: {self.inputs} -> {self.outputs})"
+
+
+def _source(obj) -> str:
+    """Source of a module, class or function; repr of a constant."""
+    try:
+        return inspect.getsource(obj)
+    except TypeError:
+        return repr(obj)
+
+
+def load_manifest() -> dict:
+    if MANIFEST_PATH.exists():
+        return json.loads(MANIFEST_PATH.read_text())
+    return {"files": {}, "stages": {}}
+
+
+def save_manifest(manifest: dict):
+    MANIFEST_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp = MANIFEST_PATH.with_name(MANIFEST_PATH.name + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    tmp.replace(MANIFEST_PATH)
+
+
+def _execute_stage(stage: Stage, write_csv: bool) -> float:
+    """Worker-process entry point: load inputs, run the stage, write its outputs."""
+    start = time.perf_counter()
+    load = read_dataset if stage.read_inputs else dataset_file
+    result = stage.func(*(load(name) for name in stage.inputs))
+    if len(stage.outputs) == 1 and not isinstance(result, dict):
+        result = {stage.outputs[0]: result}
+    missing = set(stage.outputs) - set(result)
+    if missing:
+        raise RuntimeError(f"Stage '{stage.name}' did not return outputs: {sorted(missing)}")
+    for name in stage.outputs:
+        write_dataset(name, result[name], write_csv=write_csv)
+    return time.perf_counter() - start
+
+
+class Pipeline:
+    def __init__(self, stages: list[Stage]):
+        self.stages = {s.name: s for s in stages}
+        self.producer = {}
+        for s in stages:
+            for out in s.outputs:
+                if out in self.producer:
+                    raise ValueError(f"Dataset '{out}' is produced by both '{self.producer[out]}' and '{s.name}'")
+                self.producer[out] = s.name
+        self.upstream = {
+            s.name: {self.producer[i] for i in s.inputs if i in self.producer} for s in stages
+        }
+        self._check_acyclic()
+
+    def _check_acyclic(self):
+        visiting, done = set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Cycle in pipeline at stage '{name}'")
+            visiting.add(name)
+            for dep in self.upstream[name]:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    def topological_order(self) -> list[str]:
+        order, seen = [], set()
+
+        def visit(name):
+            if name in seen:
+                return
+            seen.add(name)
+            for dep in sorted(self.upstream[name]):
+                visit(dep)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def with_upstream(self, targets: list[str]) -> set[str]:
+        unknown = set(targets) - set(self.stages)
+        if unknown:
+            raise KeyError(f"Unknown stage(s): {sorted(unknown)}. Available: {sorted(self.stages)}")
+        selected, stack = set(), list(targets)
+        while stack:
+            name = stack.pop()
+            if name not in selected:
+                selected.add(name)
+                stack.extend(self.upstream[name])
+        return selected
+
+    def fingerprint(self, stage: Stage, file_cache: dict):
+        """Hash of the stage code and its input file contents; None if an input file is missing."""
+        digest = hashlib.sha256(stage.code_hash().encode("utf-8"))
+        for name in sorted(stage.inputs):
+            path = dataset_file(name)
+            if path is None:
+                return None
+            digest.update(f"{name}:{path.name}:{file_sha256(path, file_cache)}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def _rebuilt_upstream(self, stage: Stage, states: dict, rebuilding: set) -> bool:
+        """
+        True when an upstream stage in a `rebuilding` state will rewrite one of the
+        stage's inputs and every missing input is produced by such a stage, so a
+        real run would execute this stage too.
+        """
+        rebuilt = {dep for dep in self.upstream[stage.name] if states.get(dep) in rebuilding}
+        return bool(rebuilt) and all(dataset_file(i) is not None or self.producer.get(i) in rebuilt
+                                     for i in stage.inputs)
+
+    def status(self) -> dict[str, str]:
+        """
+        'up to date', 'stale', 'never run' or 'blocked' per stage, from files on disk
+        (no stage is run). A stage downstream of a stale or never-run stage is stale
+        (or never run) too, since a run would rebuild its inputs.
+        """
+        manifest = load_manifest()
+        result = {}
+        for name in self.topological_order():
+            stage = self.stages[name]
+            fp = self.fingerprint(stage, manifest["files"])
+            recorded = manifest["stages"].get(name, {}).get("fingerprint")
+            if self._rebuilt_upstream(stage, result, {"stale", "never run"}):
+                result[name] = "stale" if recorded else "never run"
+            elif fp is None:
+                result[name] = "blocked"
+            elif recorded is None:
+                result[name] = "never run"
+            elif recorded == fp and all(dataset_file(o) for o in stage.outputs):
+                result[name] = "up to date"
+            else:
+                result[name] = "stale"
+        return result
+
+    def run(self, targets=None, force=False, workers=None, write_csv=True, dry_run=False, log=print) -> dict[str, str]:
+        """
+        Run the selected stages (and their upstream stages) in dependency order.
+
+        Returns {stage: outcome}, where outcome is 'ran', 'skipped', 'blocked',
+        'failed' or 'would run' (dry run).
+        """
+        manifest = load_manifest()
+        file_cache = manifest["files"]
+        selected = self.with_upstream(targets) if targets else set(self.stages)
+        order = [n for n in self.topological_order() if n in selected]
+        outcome = {}
+        running = {}
+
+        def ready(name):
+            return all(dep in outcome for dep in self.upstream[name] if dep in selected)
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            while len(outcome) < len(order):
+                for name in order:
+                    if name in outcome or name in running or not ready(name):
+                        continue
+                    stage = self.stages[name]
+                    if any(outcome.get(dep) == "failed" for dep in self.upstream[name]):
+                        outcome[name] = "failed"
+                        log(f"[{name}] not run: an upstream stage failed")
+                        continue
+                    # An upstream stage that would run would rebuild this stage's inputs
+                    if dry_run and self._rebuilt_upstream(stage, outcome, {"would run"}):
+                        outcome[name] = "would run"
+                        log(f"[{name}] would run (after upstream)")
+                        continue
+                    fp = self.fingerprint(stage, file_cache)
+                    if fp is None:
+                        missing = [i for i in stage.inputs if dataset_file(i) is None]
+                        kept = all(dataset_file(o) for o in stage.outputs)
+                        outcome[name] = "blocked"
+                        log(f"[{name}] blocked: missing input(s) {missing}"
+                            + ("; keeping existing output" if kept else ""))
+                        continue
+                    recorded = manifest["stages"].get(name, {}).get("fingerprint")
+                    if not force and recorded == fp and all(dataset_file(o) for o in stage.outputs):
+                        outcome[name] = "skipped"
+                        log(f"[{name}] up to date")
+                        continue
+                    if dry_run:
+                        outcome[name] = "would run"
+                        log(f"[{name}] would run")
+                        continue
+                    log(f"[{name}] running")
+                    running[name] = (pool.submit(_execute_stage, stage, write_csv), fp)
+
+                if not running:
+                    continue
+                finished, _ = wait([f for f, _ in running.values()], return_when=FIRST_COMPLETED)
+                for name in [n for n, (f, _) in running.items() if f in finished]:
+                    future, fp = running.pop(name)
+                    try:
+                        seconds = future.result()
+                    except Exception as e:
+                        outcome[name] = "failed"
+                        log(f"[{name}] failed: {type(e).__name__}: {e}")
+                        continue
+                    outcome[name] = "ran"
+                    manifest["stages"][name] = {
+                        "fingerprint": fp,
+                        "outputs": {o: file_sha256(dataset_file(o), file_cache) for o in self.stages[name].outputs},
+                        "seconds": round(seconds, 3),
+                        "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    }
+                    save_manifest(manifest)
+                    log(f"[{name}] done in {seconds:.2f}s")
+
+        save_manifest(manifest)
+        return outcome
@@ -0,0 +1,298 @@
+"""
+End-to-end scaling benchmark of the dashboard and the API on synthetic data.
+
+For every scale factor the data is generated once with `synthetic.generate`
+into data/synthetic/<scale>x/ (reused while its manifest.json exists). Then:
+
+* each Streamlit page runs headlessly through `AppTest` in a fresh process with
+  DASHBOARD_DATA_DIR pointing at the generated files, so its first run starts
+  from empty caches and includes reading the data. The first run, a rerun with
+  the same inputs and one widget change (PAGE_INTERACTIONS) are timed, together
+  with the process's peak memory;
+* the API is timed against the generated rider table: one rider on /predict
+  (median of API_REPEATS), one 500-rider /predict/batch chunk, the whole table
+  in one /predict/proba call (what the model-based pages send) and the whole
+  table as a /jobs upload, until its result is ready.
+
+A page stops being interactive at the first scale where a rerun or the widget
+change takes longer than INTERACTIVE_SECONDS, the first run takes longer than
+FIRST_RUN_SECONDS, or the page fails or times out. The report is a Markdown
+file (data/synthetic/scaling_report.md by default).
+"""
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import requests
+
+from .paths import ROOT_DIR
+from . import synthetic
+
+WEBAPP_DIR = ROOT_DIR / "output" / "webapp"
+FRONTEND_DIR = WEBAPP_DIR / "frontend"
+SYNTHETIC_DIR = synthetic.DEFAULT_DIR
+
+PAGES = ["0_Dashboard.py", "1_Overview.py", "2_Demand_Revenue.py", "4_Exposure_Analysis.py",
+         "5_Churn_Predictor.py", "6_Promotions.py"]
+# (element type, label, new value) of the widget changed on each page; values exist in the generated data
+PAGE_INTERACTIONS = {
+    "1_Overview.py": ("selectbox", "City", "Lagos"),
+    "2_Demand_Revenue.py": ("selectbox", "Select Month", 1),
+    "4_Exposure_Analysis.py": ("radio", "Revenue at risk from", "Churn model (P(churn) × monetary)"),
+    "6_Promotions.py": ("selectbox", "Promotion", "P001"),
+}
+INTERACTIVE_SECONDS = 1.0
+FIRST_RUN_SECONDS = 10.0
+PAGE_TIMEOUT = 600
+API_REPEATS = 20
+API_BATCH_ROWS = 500
+API_TIMEOUT = 600
+JOB_POLL_SECONDS = 0.5
+RESULT_PREFIX = "RESULT "
+
+
+def scale_dir(scale: float) -> Path:
+    return SYNTHETIC_DIR / f"{scale:g}x"
+
+
+def ensure_data(scale: float) -> dict:
+    """Generate the data for `scale` unless a finished run is already on disk; returns its manifest."""
+    out_dir = scale_dir(scale)
+    manifest = out_dir / "manifest.json"
+    # Runs from before the rider table was added are generated again
+    if manifest.exists() and (out_dir / synthetic.RIDERS_FILE).exists():
+        return json.loads(manifest.read_text())
+    print(f"Generating {scale:g}x data in {out_dir}")
+    counts = synthetic.generate(scale, out_dir)
+    counts["trips_mb"] = round((out_dir / "riders_trips.csv").stat().st_size / 2 ** 20, 1)
+    manifest.write_text(json.dumps(counts, indent=2))
+    return counts
+
+
+# ---------------------------------------------------------------- pages (one process per page)
+
+def _peak_mb() -> float:
+    """Peak resident memory of this process (VmHWM; ru_maxrss would include the parent's before exec)."""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _time_page(page: str) -> dict:
+    """Runs in the page's own process: first run, rerun and widget change of one page."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(FRONTEND_DIR / "pages" / page), default_timeout=PAGE_TIMEOUT)
+    result = {"page": page}
+
+    def run(measure: str) -> bool:
+        start = time.perf_counter()
+        at.run()
+        result[measure] = time.perf_counter() - start
+        if at.exception:
+            result["error"] = at.exception[0].value.splitlines()[0]
+            return False
+        return True
+
+    if run("first_run") and run("rerun") and page in PAGE_INTERACTIONS:
+        kind, label, value = PAGE_INTERACTIONS[page]
+        widget = next((w for w in getattr(at, kind) if w.label == label), None)
+        if widget is None:
+            result["error"] = f"No {kind} '{label}'"
+        else:
+            widget.set_value(value)
+            run("change")
+    result["peak_mb"] = _peak_mb()
+    return result
+
+
+def page_timings(data_dir: Path, api_url: str) -> list[dict]:
+    env = dict(os.environ, DASHBOARD_DATA_DIR=str(data_dir), API_URL=api_url,
+               PYTHONPATH=os.pathsep.join([str(FRONTEND_DIR), str(ROOT_DIR)]))
+    results = []
+    for page in PAGES:
+        try:
+            proc = subprocess.run([sys.executable, "-m", "pipeline.dashboard_bench", "--page", page],
+                                  cwd=FRONTEND_DIR, env=env, capture_output=True, text=True,
+                                  timeout=PAGE_TIMEOUT * 3)
+        except subprocess.TimeoutExpired:
+            results.append({"page": page, "error": f"timed out after {PAGE_TIMEOUT * 3} s"})
+            continue
+        lines = [line for line in proc.stdout.splitlines() if line.startswith(RESULT_PREFIX)]
+        if lines:
+            results.append(json.loads(lines[-1][len(RESULT_PREFIX):]))
+        else:
+            reason = "killed (out of memory?)" if proc.returncode < 0 else (proc.stderr.strip().splitlines() or ["?"])[-1]
+            results.append({"page": page, "error": f"exit {proc.returncode}: {reason}"})
+        print(f"  {page:<24} {_page_cell(results[-1])}")
+    return results
+
+
+# ---------------------------------------------------------------- API
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_api(jobs_dir: str, env: dict = None) -> tuple[subprocess.Popen, str]:
+    """uvicorn on a free local port, with its bulk jobs kept in `jobs_dir` and `env` added to its environment."""
+    port = _free_port()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port)],
+                            cwd=WEBAPP_DIR, env=dict(os.environ, JOBS_DIR=jobs_dir, **(env or {})),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(120):
+        try:
+            if requests.get(f"{url}/health", timeout=1).ok:
+                return proc, url
+        except requests.exceptions.RequestException:
+            pass
+        if proc.poll() is not None:
+            break
+        time.sleep(0.5)
+    proc.terminate()
+    raise RuntimeError("The API did not start")
+
+
+def _timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def _median_seconds(func, repeats: int) -> float:
+    times = sorted(_timed(func) for _ in range(repeats))
+    return times[len(times) // 2]
+
+
+def _post(url: str, payload):
+    r = requests.post(url, json=payload, timeout=API_TIMEOUT)
+    r.raise_for_status()
+    return r
+
+
+def _job(api_url: str, path: Path):
+    with open(path, "rb") as f:
+        r = requests.post(f"{api_url}/jobs", files={"file": (path.name, f, "text/csv")},
+                          headers={"X-Client-Id": "dashboard-bench"}, timeout=API_TIMEOUT)
+    r.raise_for_status()
+    job_id = r.json()["id"]
+    deadline = time.monotonic() + API_TIMEOUT
+    while time.monotonic() < deadline:
+        status = requests.get(f"{api_url}/jobs/{job_id}", timeout=10).json()["status"]
+        if status == "succeeded":
+            return
+        if status in ("failed", "cancelled"):
+            raise RuntimeError(f"job {status}")
+        time.sleep(JOB_POLL_SECONDS)
+    raise TimeoutError(f"job not finished after {API_TIMEOUT} s")
+
+
+def api_timings(data_dir: Path, api_url: str) -> dict:
+    path = data_dir / synthetic.RIDERS_FILE
+    riders = synthetic.rider_features(path).drop(columns="user_id")
+    records = riders.to_dict(orient="records")
+    measures = {
+        "predict_one": lambda: _median_seconds(lambda: _post(f"{api_url}/predict", records[0]), API_REPEATS),
+        f"predict_batch_{API_BATCH_ROWS}": lambda: _timed(lambda: _post(f"{api_url}/predict/batch",
+                                                                        records[:API_BATCH_ROWS])),
+        "predict_proba_all": lambda: _timed(lambda: _post(f"{api_url}/predict/proba", records)),
+        "job_all": lambda: _timed(lambda: _job(api_url, path)),
+    }
+    results = {}
+    for name, measure in measures.items():
+        try:
+            results[name] = measure()
+        except (requests.exceptions.RequestException, RuntimeError, TimeoutError) as e:
+            results[name] = f"{type(e).__name__}: {e}"[:80]
+        print(f"  {name:<24} {_seconds(results[name])}")
+    return results
+
+
+# ---------------------------------------------------------------- report
+
+def _seconds(value) -> str:
+    return f"{value:.2f} s" if isinstance(value, float) else str(value)
+
+
+def _interactive(result: dict) -> bool:
+    if "error" in result:
+        return False
+    return (result["first_run"] <= FIRST_RUN_SECONDS and result["rerun"] <= INTERACTIVE_SECONDS
+            and result.get("change", 0.0) <= INTERACTIVE_SECONDS)
+
+
+def _page_cell(result: dict) -> str:
+    if "error" in result:
+        return f"✗ {result['error']}"[:80]
+    times = " / ".join(f"{result[m]:.2f}" if m in result else "–" for m in ("first_run", "rerun", "change"))
+    return f"{'' if _interactive(result) else '✗ '}{times} s, {result['peak_mb']:.0f} MB"
+
+
+def report(runs: dict) -> str:
+    scales = list(runs)
+    lines = [
+        "# Dashboard scaling report",
+        "",
+        f"Pages: first run / rerun / widget change in seconds and peak process memory "
+        f"(✗: first run > {FIRST_RUN_SECONDS:g} s, rerun or change > {INTERACTIVE_SECONDS:g} s, or failed).",
+        "",
+        "| | " + " | ".join(f"{s:g}x" for s in scales) + " |",
+        "|---|" + "---|" * len(scales),
+        "| riders / trips | " + " | ".join(f"{runs[s]['data']['riders']:,} / {runs[s]['data']['trips']:,}"
+                                         for s in scales) + " |",
+    ]
+    for i, page in enumerate(PAGES):
+        cells = [_page_cell(runs[s]["pages"][i]) for s in scales]
+        lines.append(f"| {page} | " + " | ".join(cells) + " |")
+    for name in runs[scales[0]]["api"]:
+        lines.append(f"| API {name} | " + " | ".join(_seconds(runs[s]["api"][name]) for s in scales) + " |")
+    lines += ["", "Interactive up to:", ""]
+    for i, page in enumerate(PAGES):
+        ok = [s for s in scales if _interactive(runs[s]["pages"][i])]
+        first_bad = next((s for s in scales if not _interactive(runs[s]["pages"][i])), None)
+        limit = "not at any measured scale" if not ok else f"{max(ok):g}x"
+        lines.append(f"- {page}: {limit}" + ("" if first_bad is None else f" (not interactive at {first_bad:g}x)"))
+    return "\n".join(lines) + "\n"
+
+
+def run(scales=synthetic.SCALES, api_url: str = None, output: Path = None) -> str:
+    runs = {}
+    api = None
+    with tempfile.TemporaryDirectory() as jobs_dir:
+        if api_url is None:
+            api, api_url = start_api(jobs_dir)
+        try:
+            for scale in scales:
+                data = ensure_data(scale)
+                print(f"{scale:g}x: {data['riders']:,} riders, {data['trips']:,} trips")
+                runs[scale] = {
+                    "data": data,
+                    "pages": page_timings(scale_dir(scale), api_url),
+                    "api": api_timings(scale_dir(scale), api_url),
+                }
+        finally:
+            if api is not None:
+                api.terminate()
+                api.wait()
+    text = report(runs)
+    output = Path(output or SYNTHETIC_DIR / "scaling_report.md")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(text)
+    return text
+
+
+if __name__ == "__main__":
+    # Page worker: python -m pipeline.dashboard_bench --page 1_Overview.py
+    page = sys.argv[sys.argv.index("--page") + 1]
+    print(RESULT_PREFIX + json.dumps(_time_page(page)), flush=True)
@@ -0,0 +1,57 @@
+"""
+Flat `.forest` artifact vs the joblib pickle: load time, per-batch latency and
+agreement of the probabilities, on the preprocessed training riders.
+"""
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from output.webapp.backend.forest import FlatForest
+from output.webapp.backend.model_loader import PREPROCESSOR_PATH, RAW_FEATURE_ORDER
+
+from .train import TRAINING_DATASET
+from .storage import read_dataset
+
+BATCH_SIZES = (1, 100, 1_000, 10_000)
+
+
+def _best_of(func, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _features() -> pd.DataFrame:
+    preprocessor = joblib.load(PREPROCESSOR_PATH)
+    X = preprocessor.transform(read_dataset(TRAINING_DATASET)[RAW_FEATURE_ORDER])
+    return pd.DataFrame(X, columns=preprocessor.get_feature_names_out())
+
+
+def report(model, source: Path, flat: FlatForest, batch_sizes=BATCH_SIZES) -> pd.DataFrame:
+    X = _features()
+    if len(X) < max(batch_sizes):
+        X = pd.concat([X] * -(-max(batch_sizes) // len(X)), ignore_index=True)
+
+    rows = [{
+        "measure": "load",
+        "pickle_ms": _best_of(lambda: joblib.load(source), 3) * 1000,
+        "flat_ms": _best_of(lambda: FlatForest(flat.path), 3) * 1000,
+    }]
+    for n in batch_sizes:
+        batch = X.iloc[:n]
+        repeats = max(3, 1_000 // n)
+        rows.append({
+            "measure": f"predict_proba x{n}",
+            "pickle_ms": _best_of(lambda: model.predict_proba(batch), repeats) * 1000,
+            "flat_ms": _best_of(lambda: flat.predict_proba(batch), repeats) * 1000,
+        })
+    diff = np.abs(model.predict_proba(X)[:, 1] - flat.predict_churn_proba(X))
+    result = pd.DataFrame(rows).round(2)
+    print(f"max |P(churn) pickle - flat| over {len(X)} rows: {diff.max():.2e}")
+    return result
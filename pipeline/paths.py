@@ -0,0 +1,7 @@
+"""Filesystem layout shared by the pipeline stages."""
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+DATA_DIR = ROOT_DIR / "data"
+PROCESSED_DIR = DATA_DIR / "processed_data"
+MANIFEST_PATH = PROCESSED_DIR / ".pipeline_manifest.json"
@@ -0,0 +1,160 @@
+"""
+Referral network of riders (`riders.referred_by`).
+
+Every rider has at most one referrer, so the network is a forest: each
+referral tree hangs off a rider nobody referred. `ReferralGraph` stores the
+children of every rider in compressed sparse row form (`indptr`, `indices`),
+built with one stable argsort of the parent array, and walks the trees one
+level at a time: a level's children are gathered for the whole frontier with
+`np.repeat` over the CSR row bounds, and subtree totals are pushed up with one
+`bincount` per level from the deepest one. Nothing recurses, so chain length
+only adds loop iterations, and the work is O(riders) per traversal.
+
+Referral cycles (A referred B, B referred A) leave riders unreachable from
+any root. Only those riders are searched, with pointer doubling, and each
+cycle is cut at its smallest rider index, which becomes the root of its tree
+(`cycle_root`).
+
+`referral_features` derives one row per rider that joins into the modeling
+tables on user_id: tree size, depth and component, the referrer's churn label,
+and the churn share among the rider's direct and indirect referrals. A rider's
+own label is never used in their features.
+"""
+import numpy as np
+import pandas as pd
+
+
+def index_of(keys, values) -> np.ndarray:
+    """Position of each of `values` in the unique `keys`, -1 when absent or null (one factorize of both)."""
+    keys, values = pd.Series(keys, copy=False), pd.Series(values, copy=False)
+    codes, uniques = pd.factorize(pd.concat([keys, values], ignore_index=True))
+    key_codes, value_codes = codes[:len(keys)], codes[len(keys):]
+    if (key_codes < 0).any() or np.bincount(key_codes, minlength=len(uniques)).max(initial=0) > 1:
+        raise ValueError("Keys must be unique and not null")
+    position = np.full(len(uniques) + 1, -1, dtype=np.int64)  # the extra slot maps null (-1) to -1
+    position[key_codes] = np.arange(len(keys))
+    return position[value_codes]
+
+
+class ReferralGraph:
+    def __init__(self, user_ids, referred_by):
+        self.user_ids = pd.Index(user_ids)
+        parent = index_of(self.user_ids, referred_by)
+        # Referrers that are not riders themselves cannot be followed; their referrals become roots
+        self.unknown_referrer = pd.notna(pd.Series(referred_by, copy=False)).to_numpy() & (parent < 0)
+        self.n = len(parent)
+        parent[parent == np.arange(self.n)] = -1
+        self.parent = parent
+        self.cycle_root = np.zeros(self.n, dtype=bool)
+        self._build_csr()
+        self._traverse()
+        unreached = np.flatnonzero(self.depth < 0)
+        if unreached.size:
+            self._break_cycles(unreached)
+            self._build_csr()
+            self._traverse()
+
+    def _break_cycles(self, nodes: np.ndarray):
+        """
+        Cut every referral cycle among `nodes` (riders no root reaches, whose
+        referrers are therefore unreached too) at its smallest member.
+        """
+        local = np.full(self.n, -1, dtype=np.int64)
+        local[nodes] = np.arange(len(nodes))
+        step = local[self.parent[nodes]]
+        lowest = nodes.copy()
+        # After 2^k >= len(nodes) doublings every pointer sits on a cycle, and
+        # `lowest` of a cycle member is the minimum over the whole cycle
+        for _ in range(int(np.ceil(np.log2(len(nodes)))) + 1):
+            lowest = np.minimum(lowest, lowest[step])
+            step = step[step]
+        roots = np.unique(lowest[step])
+        self.parent[roots] = -1
+        self.cycle_root[roots] = True
+
+    def _build_csr(self):
+        children = np.flatnonzero(self.parent >= 0)
+        order = np.argsort(self.parent[children], kind="stable")
+        self.indices = children[order]
+        counts = np.bincount(self.parent[children], minlength=self.n)
+        self.indptr = np.concatenate([[0], np.cumsum(counts)])
+        self.out_degree = counts
+
+    def children(self, frontier: np.ndarray) -> np.ndarray:
+        """All children of the riders in `frontier`, grouped by referrer."""
+        lo, hi = self.indptr[frontier], self.indptr[frontier + 1]
+        counts = hi - lo
+        starts = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+        return self.indices[starts + np.arange(counts.sum())]
+
+    def _traverse(self):
+        """Breadth-first from every root at once: depth, root and the level order."""
+        self.depth = np.full(self.n, -1, dtype=np.int64)
+        self.root = np.full(self.n, -1, dtype=np.int64)
+        frontier = np.flatnonzero(self.parent < 0)
+        self.depth[frontier] = 0
+        self.root[frontier] = frontier
+        self.levels = []
+        while frontier.size:
+            self.levels.append(frontier)
+            nxt = self.children(frontier)
+            self.depth[nxt] = len(self.levels)
+            self.root[nxt] = self.root[self.parent[nxt]]
+            frontier = nxt
+
+    def subtree_sum(self, values: np.ndarray) -> np.ndarray:
+        """Sum of `values` over each rider's subtree (the rider and everyone referred through them)."""
+        total = np.asarray(values, dtype=np.float64).copy()
+        for level in reversed(self.levels[1:]):
+            total += np.bincount(self.parent[level], weights=total[level], minlength=self.n)
+        return total
+
+    def components(self) -> pd.DataFrame:
+        """One row per referral tree: root rider, size and depth."""
+        sizes = np.bincount(self.root, minlength=self.n)
+        heights = np.zeros(self.n, dtype=np.int64)
+        np.maximum.at(heights, self.root, self.depth)
+        roots = np.flatnonzero(self.parent < 0)
+        return pd.DataFrame({
+            "root_user_id": self.user_ids[roots],
+            "size": sizes[roots],
+            "depth": heights[roots],
+            "cycle_broken": self.cycle_root[roots],
+        }).sort_values("size", ascending=False, ignore_index=True)
+
+
+def referral_features(riders: pd.DataFrame, churned: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Network features per rider. `churned` (user_id, churned) supplies the labels
+    for the churn shares (the last row wins for a repeated user_id); riders
+    without a label are left out of the shares.
+    """
+    graph = ReferralGraph(riders["user_id"], riders["referred_by"])
+    df = pd.DataFrame({"user_id": graph.user_ids})
+    has_referrer = graph.parent >= 0
+    df["referred"] = has_referrer.astype(int)
+    df["referral_depth"] = graph.depth
+    df["direct_referrals"] = graph.out_degree
+    tree_size = graph.subtree_sum(np.ones(graph.n))
+    df["indirect_referrals"] = (tree_size - 1 - graph.out_degree).astype(np.int64)
+    df["referral_root"] = graph.user_ids[graph.root]
+    df["component_size"] = np.bincount(graph.root, minlength=graph.n)[graph.root]
+
+    if churned is not None:
+        label = np.full(graph.n, np.nan)
+        position = index_of(graph.user_ids, churned["user_id"])
+        found = position >= 0
+        label[position[found]] = churned["churned"].to_numpy(dtype=np.float64)[found]
+        known = ~np.isnan(label)
+        churn = np.where(known, label, 0.0)
+        # Labelled direct referrals, and labelled referrals anywhere below the rider
+        direct_known = np.bincount(graph.parent[has_referrer], weights=known[has_referrer], minlength=graph.n)
+        direct_churned = np.bincount(graph.parent[has_referrer], weights=churn[has_referrer], minlength=graph.n)
+        below_known = graph.subtree_sum(known) - known
+        below_churned = graph.subtree_sum(churn) - churn
+        with np.errstate(invalid="ignore", divide="ignore"):
+            df["churned_referral_share"] = direct_churned / direct_known
+            df["churned_downstream_share"] = below_churned / below_known
+        parent_label = np.where(has_referrer, label[np.maximum(graph.parent, 0)], np.nan)
+        df["referrer_churned"] = parent_label
+    return df
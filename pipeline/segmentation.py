@@ -0,0 +1,108 @@
+"""
+Rider segmentation: parallel k-sweep, persisted centroids and batch assignment.
+
+Ports "02_Customer Segmentation/03_Clustering Model Development.ipynb". Riders
+are clustered on recency, total_trips and avg_spend after the RobustScaler
+transform of `data_preprocessed.csv`. Each k is fitted in its own worker, with
+full KMeans (the notebook's settings) or MiniBatchKMeans for large rider
+counts. Silhouette, Davies-Bouldin and Calinski-Harabasz are computed on a
+fixed random sample so their cost does not grow with the data.
+
+The chosen centroids are saved together with the scaler's center/scale to
+output/webapp/model/segmentation.joblib, which the backend loads to assign
+clusters at scoring time (`backend/segmentation.py`).
+"""
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import calinski_harabasz_score, davies_bouldin_score, silhouette_score
+from sklearn.preprocessing import RobustScaler
+
+from output.webapp.backend.segmentation import SEGMENTATION_PATH, nearest_centroid
+
+from .storage import read_dataset
+
+SOURCE_DATASET = "riders_trips_rfms_churned"
+FEATURES = ["recency", "total_trips", "avg_spend"]
+METRIC_SAMPLE = 10_000
+MINIBATCH_SIZE = 4096
+
+
+def load_features() -> tuple[pd.DataFrame, RobustScaler]:
+    """Raw clustering features and the RobustScaler that produces their data_preprocessed.csv values."""
+    df = read_dataset(SOURCE_DATASET)
+    raw = df[["user_id"] + FEATURES].reset_index(drop=True)
+    scaler = RobustScaler().fit(raw[FEATURES].to_numpy(dtype=np.float64))
+    return raw, scaler
+
+
+def make_estimator(k: int, algorithm: str):
+    if algorithm == "minibatch":
+        return MiniBatchKMeans(n_clusters=k, random_state=42, batch_size=MINIBATCH_SIZE, n_init=3, max_iter=500)
+    return KMeans(n_clusters=k, random_state=42, n_init=20, max_iter=500)
+
+
+def _fit_k(k: int, X: np.ndarray, sample_idx: np.ndarray, algorithm: str) -> dict:
+    start = time.perf_counter()
+    model = make_estimator(k, algorithm).fit(X)
+    fit_seconds = time.perf_counter() - start
+    X_s, labels_s = X[sample_idx], model.labels_[sample_idx]
+    return {
+        "k": k,
+        "inertia": model.inertia_,
+        "silhouette": silhouette_score(X_s, labels_s),
+        "davies_bouldin": davies_bouldin_score(X_s, labels_s),
+        "calinski_harabasz": calinski_harabasz_score(X_s, labels_s),
+        "fit_seconds": fit_seconds,
+        "centroids": model.cluster_centers_,
+        "sizes": np.bincount(model.labels_, minlength=k),
+    }
+
+
+def sweep(X: np.ndarray, ks=range(2, 11), algorithm: str = "kmeans", n_jobs: int = -1,
+          sample_size: int = METRIC_SAMPLE) -> list[dict]:
+    """Fit every k in parallel; quality metrics use the same random sample of rows for every k."""
+    rng = np.random.default_rng(42)
+    sample_idx = np.sort(rng.choice(len(X), size=min(sample_size, len(X)), replace=False))
+    return Parallel(n_jobs=n_jobs)(delayed(_fit_k)(k, X, sample_idx, algorithm) for k in ks)
+
+
+def sweep_report(results: list[dict]) -> pd.DataFrame:
+    columns = ["k", "inertia", "silhouette", "davies_bouldin", "calinski_harabasz", "fit_seconds"]
+    return pd.DataFrame([{c: r[c] for c in columns} for r in results])
+
+
+def choose(results: list[dict], k: int = None) -> dict:
+    """The requested k, or the one with the highest (sampled) silhouette."""
+    if k is not None:
+        matches = [r for r in results if r["k"] == k]
+        if not matches:
+            raise ValueError(f"k={k} was not part of the sweep ({[r['k'] for r in results]})")
+        return matches[0]
+    return max(results, key=lambda r: r["silhouette"])
+
+
+def save(chosen: dict, scaler: RobustScaler, raw: pd.DataFrame, algorithm: str, output_dir: Path = None) -> Path:
+    labels = nearest_centroid(scaler.transform(raw[FEATURES].to_numpy(dtype=np.float64)), chosen["centroids"])
+    profile = raw.assign(cluster=labels).groupby("cluster")[FEATURES].mean()
+    artifact = {
+        "features": FEATURES,
+        "center": scaler.center_,
+        "scale": scaler.scale_,
+        "centroids": chosen["centroids"],
+        "algorithm": algorithm,
+        "metrics": {m: float(chosen[m]) for m in ("inertia", "silhouette", "davies_bouldin", "calinski_harabasz")},
+        "sizes": np.bincount(labels, minlength=len(chosen["centroids"])),
+        "profile": profile.to_dict(orient="index"),
+    }
+    path = SEGMENTATION_PATH if output_dir is None else Path(output_dir) / SEGMENTATION_PATH.name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    joblib.dump(artifact, tmp)
+    tmp.replace(path)
+    return path
@@ -0,0 +1,141 @@
+"""
+Out-of-core per-rider aggregation of the session log.
+
+The file is split into byte ranges aligned on line boundaries; each block is
+parsed on its own (optionally in worker processes) and reduced to per-rider
+partial sums, counts and min/max times. Partials are merged into a running
+total, so memory is bounded by the block size plus one row per rider rather
+than by the size of the log.
+
+Means are computed at the end as sum / count. The session columns are integer
+counts (time_on_app, pages_visited, converted, weekend/peak flags), so the
+partial sums are exact and the result is identical to a single in-memory
+groupby (`stages.sessions_agg`). Blocks are split on newlines, which assumes no
+quoted field contains a line break (true for sessions.csv).
+"""
+import io
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+import pandas as pd
+
+from output.webapp.common.timestamps import to_datetime_utc
+
+DEFAULT_BLOCK_BYTES = 64 * 1024 * 1024
+USECOLS = ["session_id", "rider_id", "session_time", "time_on_app", "pages_visited", "converted"]
+
+# Averaged columns: partials keep <name>_sum and the non-null count <name>_n
+_MEAN_COLUMNS = ("time_on_app", "pages_visited", "converted")
+_SUM_COLUMNS = ["rows", "n_sessions"] + [f"{c}_{s}" for c in _MEAN_COLUMNS for s in ("sum", "n")] + [
+    "weekend_sum", "peak_sum"
+]
+
+
+def block_ranges(path: Path, block_bytes: int = DEFAULT_BLOCK_BYTES) -> tuple[bytes, list[tuple[int, int]]]:
+    """Header line and (start, end) byte offsets of line-aligned blocks of roughly `block_bytes`."""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        header = f.readline()
+        start = f.tell()
+        ranges = []
+        while start < size:
+            f.seek(min(start + block_bytes, size))
+            if f.tell() < size:
+                f.readline()  # move to the end of the line the target offset fell in
+            end = f.tell()
+            ranges.append((start, end))
+            start = end
+    return header, ranges
+
+
+def read_block(path: Path, header: bytes, start: int, end: int) -> pd.DataFrame:
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return pd.read_csv(io.BytesIO(header + data), usecols=USECOLS)
+
+
+def partial_aggregate(sessions: pd.DataFrame) -> pd.DataFrame:
+    """Per-rider sums, non-null counts and min/max session time for one block."""
+    session_time = to_datetime_utc(sessions["session_time"], errors="coerce")
+    frame = pd.DataFrame({
+        "user_id": sessions["rider_id"],
+        "rows": 1,
+        "n_sessions": sessions["session_id"].notna().astype("int64"),
+        "weekend_sum": (session_time.dt.weekday >= 5).astype("int64"),
+        "peak_sum": session_time.dt.hour.between(7, 10).astype("int64"),
+        "session_time_min": session_time,
+        "session_time_max": session_time,
+    })
+    for col in _MEAN_COLUMNS:
+        frame[f"{col}_sum"] = sessions[col]
+        frame[f"{col}_n"] = sessions[col].notna().astype("int64")
+    return _reduce(frame)
+
+
+def _reduce(frame: pd.DataFrame) -> pd.DataFrame:
+    agg = {c: "sum" for c in _SUM_COLUMNS}
+    agg.update(session_time_min="min", session_time_max="max")
+    return frame.groupby("user_id").agg(agg)
+
+
+def merge_partials(partials: list[pd.DataFrame]) -> pd.DataFrame:
+    return _reduce(pd.concat(partials).reset_index())
+
+
+def _aggregate_block(path: Path, header: bytes, start: int, end: int) -> pd.DataFrame:
+    return partial_aggregate(read_block(path, header, start, end))
+
+
+def finalize(partial: pd.DataFrame) -> pd.DataFrame:
+    """Turn merged partials into the sessions_agg columns."""
+    out = pd.DataFrame(index=partial.index)
+    out["total_sessions"] = partial["n_sessions"]
+    out["total_time_on_app"] = partial["time_on_app_sum"]
+    out["avg_time_on_app"] = partial["time_on_app_sum"] / partial["time_on_app_n"]
+    out["total_pages_visited"] = partial["pages_visited_sum"]
+    out["avg_pages_visited"] = partial["pages_visited_sum"] / partial["pages_visited_n"]
+    out["conversion_rate"] = partial["converted_sum"] / partial["converted_n"]
+    out["last_session_time"] = partial["session_time_max"]
+    out["first_session_time"] = partial["session_time_min"]
+    out["weekend_session_ratio"] = partial["weekend_sum"] / partial["rows"]
+    out["peak_hour_session_ratio"] = partial["peak_sum"] / partial["rows"]
+    return out.reset_index()
+
+
+def aggregate_sessions(path, block_bytes: int = DEFAULT_BLOCK_BYTES, workers: int = 1) -> pd.DataFrame:
+    """
+    Per-rider session aggregates of the CSV at `path`, reading it in blocks.
+
+    With `workers` > 1 (None for one per CPU) and more than one block, blocks are
+    parsed and reduced in a process pool with at most 2 x `workers` in flight.
+    """
+    path = Path(path)
+    header, ranges = block_ranges(path, block_bytes)
+    if not ranges:
+        return finalize(partial_aggregate(pd.read_csv(path, usecols=USECOLS)))
+
+    total = None
+    if workers == 1 or len(ranges) == 1:
+        for start, end in ranges:
+            part = _aggregate_block(path, header, start, end)
+            total = part if total is None else merge_partials([total, part])
+        return finalize(total)
+
+    max_workers = workers or os.cpu_count()
+    pending_ranges = iter(ranges)
+    in_flight = set()
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        while True:
+            while len(in_flight) < 2 * max_workers:
+                block = next(pending_ranges, None)
+                if block is None:
+                    break
+                in_flight.add(pool.submit(_aggregate_block, path, header, *block))
+            if not in_flight:
+                break
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            parts = [f.result() for f in done]
+            total = merge_partials(parts if total is None else [total, *parts])
+    return finalize(total)
@@ -0,0 +1,254 @@
+"""
+Stage functions of the data-preparation pipeline.
+
+Each function ports the transformation done by one of the notebooks in
+notebooks/ (noted per stage) and takes/returns DataFrames; reading and writing
+files is left to the DAG runner. Row-wise `apply` calls from the notebooks are
+replaced by vectorized column operations with the same results.
+"""
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import RobustScaler
+
+from output.webapp.common import timestamps
+from output.webapp.common.timestamps import to_datetime_utc
+
+from . import referrals, sessions_chunked
+from .dag import Pipeline, Stage
+from .sessions_chunked import DEFAULT_BLOCK_BYTES, aggregate_sessions
+
+EARTH_RADIUS_KM = 6371.0088  # mean earth radius, as used by the `haversine` package
+CHURN_THRESHOLD_DAYS = 30
+
+SEASONS = {12: "Winter", 1: "Winter", 2: "Winter",
+           3: "Spring", 4: "Spring", 5: "Spring",
+           6: "Summer", 7: "Summer", 8: "Summer"}
+
+LOYALTY_ORDER = {"Bronze": 0, "Silver": 1, "Gold": 2, "Platinum": 3}
+RFMS_ORDER = {"At Risk": 0, "Occasional Riders": 1, "Core Loyal Riders": 2, "High-Value Surge-Tolerant": 3}
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(a, dtype=float)) for a in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+# ---------------------------------------------------------------- 00_Dataset_Exploration
+
+def riders_trips(riders: pd.DataFrame, trips: pd.DataFrame) -> pd.DataFrame:
+    # Parsed once here; Parquet keeps them as UTC timestamps for every downstream stage
+    trips = trips.assign(
+        pickup_time=to_datetime_utc(trips["pickup_time"]),
+        dropoff_time=to_datetime_utc(trips["dropoff_time"]),
+    )
+    df = pd.merge(riders, trips, on="user_id", how="outer")
+    df = df.drop(columns=["referred_by", "loyalty_status_y", "city_y"])
+    return df.rename(columns={"loyalty_status_x": "loyalty_status", "city_x": "city"})
+
+
+def sessions_agg(sessions: pd.DataFrame) -> pd.DataFrame:
+    """In-memory reference for `sessions_agg_chunked`."""
+    sessions = sessions.rename(columns={"rider_id": "user_id"})
+    session_time = pd.to_datetime(sessions["session_time"], errors="coerce", utc=True)
+    sessions = sessions.assign(
+        session_time=session_time,
+        is_weekend=session_time.dt.weekday >= 5,
+        is_peak_hour=session_time.dt.hour.between(7, 10),
+    )
+    return (
+        sessions.groupby("user_id")
+        .agg(
+            total_sessions=("session_id", "count"),
+            total_time_on_app=("time_on_app", "sum"),
+            avg_time_on_app=("time_on_app", "mean"),
+            total_pages_visited=("pages_visited", "sum"),
+            avg_pages_visited=("pages_visited", "mean"),
+            conversion_rate=("converted", "mean"),
+            last_session_time=("session_time", "max"),
+            first_session_time=("session_time", "min"),
+            weekend_session_ratio=("is_weekend", "mean"),
+            peak_hour_session_ratio=("is_peak_hour", "mean"),
+        )
+        .reset_index()
+    )
+
+
+def sessions_agg_chunked(sessions_path) -> pd.DataFrame:
+    """Same result as `sessions_agg`, reading the session log in bounded blocks (one process per CPU when it spans several)."""
+    return aggregate_sessions(sessions_path, block_bytes=DEFAULT_BLOCK_BYTES, workers=None)
+
+
+def riders_trips_sessions(riders: pd.DataFrame, trips: pd.DataFrame, sessions_agg: pd.DataFrame) -> pd.DataFrame:
+    pickup_time = to_datetime_utc(trips["pickup_time"], errors="coerce")
+    trips = trips.assign(
+        pickup_time=pickup_time,
+        is_weekend=pickup_time.dt.weekday >= 5,
+        is_peak_hour=pickup_time.dt.hour.between(7, 10),
+    )
+    trips_agg = (
+        trips.groupby("user_id")
+        .agg(
+            total_trips=("trip_id", "count"),
+            total_spent=("fare", "sum"),
+            avg_fare=("fare", "mean"),
+            total_tip=("tip", "sum"),
+            avg_tip=("tip", "mean"),
+            avg_surge=("surge_multiplier", "mean"),
+            last_trip_time=("pickup_time", "max"),
+            first_trip_time=("pickup_time", "min"),
+            weekend_trip_ratio=("is_weekend", "mean"),
+            peak_hour_trip_ratio=("is_peak_hour", "mean"),
+        )
+        .reset_index()
+    )
+    df = riders.merge(trips_agg, on="user_id", how="left").merge(sessions_agg, on="user_id", how="left")
+    df["was_referred"] = df["referred_by"].notna().astype(int)
+    return df
+
+
+# ---------------------------------------------------------------- 01_EDA_of_Business/01_Feature_Engineering_for_EDA
+
+def data_eda(riders_trips: pd.DataFrame) -> pd.DataFrame:
+    df = riders_trips.copy()
+    df["pickup_time"] = to_datetime_utc(df["pickup_time"])
+    dropoff_time = to_datetime_utc(df["dropoff_time"])
+    df["age"] = df["age"].astype("int64")
+
+    pickup = df["pickup_time"].dt
+    df["pickup_time_year"] = pickup.year
+    df["pickup_time_month"] = pickup.month
+    df["pickup_time_month_year"] = pickup.strftime("%b %Y")
+    df["pickup_time_day"] = pickup.day_name()
+    df["pickup_time_day_num"] = pickup.day
+    df["pickup_hour"] = pickup.hour
+    df["time_of_day"] = pd.cut(df["pickup_hour"], bins=[-1, 5, 11, 17, 21, 24],
+                               labels=["Night", "Morning", "Afternoon", "Evening", "Late Night"])
+    df["pickup_is_weekend"] = pickup.weekday >= 5
+    df["pickup_is_peak_hour"] = df["pickup_hour"].between(7, 9) | df["pickup_hour"].between(16, 19)
+    df["pickup_is_night"] = df["pickup_hour"].between(22, 23) | df["pickup_hour"].between(0, 5)
+    df["pickup_time_season"] = df["pickup_time_month"].map(SEASONS).fillna("Autumn")
+
+    df["trip_duration_min"] = (dropoff_time - df["pickup_time"]).dt.total_seconds() / 60
+    df["trip_distance_km"] = haversine_km(df["pickup_lat"], df["pickup_lng"], df["dropoff_lat"], df["dropoff_lng"])
+
+    df["total_fare"] = df["fare"] * df["surge_multiplier"]
+    df["total_fare_with_tip"] = df["total_fare"] + df["tip"]
+    df["tip_percentage"] = df["tip"] / df["total_fare_with_tip"]
+    df["is_surge_trip"] = df["surge_multiplier"] > 1
+    df["total_fare_bucket"] = pd.qcut(df["total_fare"], q=4, labels=["low", "medium", "high", "very_high"])
+
+    df["bad_weather_flag"] = df["weather"].isin(["Rainy", "Foggy"]).astype(int)
+    df["weather_surge_interaction"] = df["bad_weather_flag"] * df["surge_multiplier"]
+    df["weather_demand_index"] = df["weather"].map(df["weather"].value_counts(normalize=True))
+
+    return df.drop(columns=["signup_date", "dropoff_time"])
+
+
+# ---------------------------------------------------------------- 02_Customer_Segmentation/01_Feature_Engineering_&_EDA
+
+def user_agg_df(data_eda: pd.DataFrame) -> pd.DataFrame:
+    df = data_eda.assign(pickup_time=to_datetime_utc(data_eda["pickup_time"]))
+    snapshot_date = df["pickup_time"].max() + pd.Timedelta(days=1)
+    user_df = df.groupby("user_id").agg(
+        total_trips=("trip_id", "count"),
+        total_spend=("fare", "sum"),
+        avg_spend=("fare", "mean"),
+        avg_surge=("surge_multiplier", "mean"),
+        total_tip=("tip", "sum"),
+        avg_tip=("tip", "mean"),
+        avg_rating_given=("avg_rating_given", "mean"),
+        loyalty_status=("loyalty_status", "first"),
+        city=("city", "first"),
+        first_trip=("pickup_time", "min"),
+        last_trip=("pickup_time", "max"),
+        avg_distance=("trip_distance_km", "mean"),
+        avg_duration=("trip_duration_min", "mean"),
+    ).reset_index()
+    user_df.insert(1, "recency", (snapshot_date - user_df["last_trip"]).dt.days)
+    user_df["active_days"] = (user_df["last_trip"] - user_df["first_trip"]).dt.days
+    return user_df.drop(columns=["first_trip", "last_trip"])
+
+
+# ---------------------------------------------------------------- 02_Customer_Segmentation/04_RFM_Analysis
+
+def riders_trips_rfms(user_agg_df: pd.DataFrame) -> pd.DataFrame:
+    rfms = user_agg_df[["user_id", "recency", "total_trips", "total_spend", "avg_surge"]].copy()
+    rfms["R_score"] = pd.qcut(rfms["recency"], q=4, labels=[4, 3, 2, 1]).astype(int)
+    rfms["F_score"] = pd.qcut(rfms["total_trips"].rank(method="first"), q=4, labels=[1, 2, 3, 4]).astype(int)
+    rfms["M_score"] = pd.qcut(rfms["total_spend"].rank(method="first"), q=4, labels=[1, 2, 3, 4]).astype(int)
+    rfms["S_score"] = pd.qcut(rfms["avg_surge"].rank(method="first"), q=4, labels=[1, 2, 3, 4]).astype(int)
+    rfms["RFMS_weighted_score"] = (
+        0.30 * rfms["R_score"]
+        + 0.25 * rfms["F_score"]
+        + 0.25 * rfms["M_score"]
+        + 0.20 * rfms["S_score"]
+    )
+    rfms["RFMS_segment"] = pd.qcut(rfms["RFMS_weighted_score"], q=4, labels=list(RFMS_ORDER))
+    return user_agg_df.merge(rfms[["user_id", "RFMS_weighted_score", "RFMS_segment"]], on="user_id", how="left")
+
+
+# ---------------------------------------------------------------- 03_Customer_Churn_Prediction/01_Churn_Definition_&_Churn_EDA
+
+def riders_trips_rfms_churned(riders_trips_rfms: pd.DataFrame) -> pd.DataFrame:
+    df = riders_trips_rfms.copy()
+    df["churned"] = (df["recency"] > CHURN_THRESHOLD_DAYS).astype(int)
+    return df
+
+
+# ---------------------------------------------------------------- 03_Customer_Churn_Prediction/02_Data_Processing_&_Classification_Model_Development
+
+def data_preprocessed(riders_trips_rfms_churned: pd.DataFrame) -> pd.DataFrame:
+    df = riders_trips_rfms_churned.drop(columns=["active_days", "RFMS_weighted_score", "total_spend", "avg_surge"])
+    num_cols = df.select_dtypes(include="number").columns.tolist()
+    df[num_cols] = RobustScaler().fit_transform(df[num_cols])
+    df = pd.get_dummies(df, columns=["city"])
+    df["loyalty_status"] = df["loyalty_status"].map(LOYALTY_ORDER)
+    df["RFMS_segment"] = df["RFMS_segment"].map(RFMS_ORDER)
+    return df
+
+
+def data_modeling(user_agg_df: pd.DataFrame, sessions_agg: pd.DataFrame) -> pd.DataFrame:
+    """Rider-level trip aggregates joined with the rider's session aggregates (one row per rider)."""
+    sessions = sessions_agg.rename(columns={
+        "conversion_rate": "avg_conversion_rate",
+        "first_session_time": "first_session",
+        "last_session_time": "last_session",
+    })[["user_id", "total_time_on_app", "avg_time_on_app", "total_pages_visited", "avg_pages_visited",
+        "avg_conversion_rate", "first_session", "last_session"]]
+    df = user_agg_df.merge(sessions, on="user_id", how="left")
+    columns = [
+        "user_id", "recency", "total_trips", "total_spend", "avg_spend", "avg_surge", "total_tip", "avg_tip",
+        "avg_rating_given", "total_time_on_app", "avg_time_on_app", "total_pages_visited", "avg_pages_visited",
+        "avg_conversion_rate", "loyalty_status", "city", "first_session", "last_session", "avg_distance",
+        "avg_duration", "active_days",
+    ]
+    return df[columns]
+
+
+# ---------------------------------------------------------------- Referral network (pipeline/referrals.py)
+
+def referral_features(riders: pd.DataFrame, riders_trips_rfms_churned: pd.DataFrame) -> pd.DataFrame:
+    """Per-rider referral tree features and churn shares of the rider's referrals (one row per rider)."""
+    return referrals.referral_features(riders, riders_trips_rfms_churned[["user_id", "churned"]])
+
+
+PIPELINE = Pipeline([
+    Stage("riders_trips", riders_trips, inputs=["riders", "trips"], outputs=["riders_trips"], deps=[timestamps]),
+    Stage("sessions_agg", sessions_agg_chunked, inputs=["sessions"], outputs=["sessions_agg"], read_inputs=False,
+          deps=[sessions_chunked, timestamps]),
+    Stage("riders_trips_sessions", riders_trips_sessions,
+          inputs=["riders", "trips", "sessions_agg"], outputs=["riders_trips_sessions"], deps=[timestamps]),
+    Stage("data_eda", data_eda, inputs=["riders_trips"], outputs=["data_EDA"],
+          deps=[timestamps, haversine_km, EARTH_RADIUS_KM, SEASONS]),
+    Stage("user_agg_df", user_agg_df, inputs=["data_EDA"], outputs=["user_agg_df"], deps=[timestamps]),
+    Stage("riders_trips_rfms", riders_trips_rfms, inputs=["user_agg_df"], outputs=["riders_trips_rfms"],
+          deps=[RFMS_ORDER]),
+    Stage("riders_trips_rfms_churned", riders_trips_rfms_churned,
+          inputs=["riders_trips_rfms"], outputs=["riders_trips_rfms_churned"], deps=[CHURN_THRESHOLD_DAYS]),
+    Stage("data_preprocessed", data_preprocessed,
+          inputs=["riders_trips_rfms_churned"], outputs=["data_preprocessed"], deps=[LOYALTY_ORDER, RFMS_ORDER]),
+    Stage("data_modeling", data_modeling, inputs=["user_agg_df", "sessions_agg"], outputs=["data_modeling"]),
+    Stage("referral_features", referral_features,
+          inputs=["riders", "riders_trips_rfms_churned"], outputs=["referral_features"], deps=[referrals]),
+])
@@ -0,0 +1,80 @@
+"""Reading/writing pipeline datasets and content hashing of files."""
+import hashlib
+from pathlib import Path
+
+import pandas as pd
+
+from .paths import DATA_DIR, PROCESSED_DIR
+
+# Raw inputs are the CSVs in data/; everything else is a stage output in data/processed_data/
+RAW_DATASETS = {"riders", "trips", "sessions", "promotions", "drivers"}
+
+_HASH_BLOCK = 1 << 20
+
+
+def dataset_paths(name: str) -> list[Path]:
+    """Candidate files for a dataset, in order of preference."""
+    if name in RAW_DATASETS:
+        return [DATA_DIR / f"{name}.csv"]
+    # Parquet is the pipeline's own format; CSV keeps notebook-produced files usable
+    return [PROCESSED_DIR / f"{name}.parquet", PROCESSED_DIR / f"{name}.csv"]
+
+
+def dataset_file(name: str):
+    """Existing file backing a dataset, or None."""
+    for path in dataset_paths(name):
+        if path.exists():
+            return path
+    return None
+
+
+def read_dataset(name: str) -> pd.DataFrame:
+    path = dataset_file(name)
+    if path is None:
+        raise FileNotFoundError(f"No file for dataset '{name}'. Expected one of: {dataset_paths(name)}")
+    if path.suffix == ".parquet":
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def write_dataset(name: str, df: pd.DataFrame, write_csv: bool = True) -> list[Path]:
+    """Write a stage output as Parquet, plus a CSV export for the notebooks and the dashboard."""
+    PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+    written = []
+    parquet_path = PROCESSED_DIR / f"{name}.parquet"
+    _atomic_write(parquet_path, lambda p: df.to_parquet(p, index=False))
+    written.append(parquet_path)
+    if write_csv:
+        csv_path = PROCESSED_DIR / f"{name}.csv"
+        _atomic_write(csv_path, lambda p: df.to_csv(p, index=False))
+        written.append(csv_path)
+    return written
+
+
+def _atomic_write(path: Path, writer):
+    tmp = path.with_name(path.name + ".tmp")
+    writer(tmp)
+    tmp.replace(path)
+
+
+def file_sha256(path: Path, cache: dict = None) -> str:
+    """
+    SHA-256 of a file's contents.
+
+    `cache` maps str(path) -> {"size", "mtime_ns", "sha256"}; when size and mtime
+    are unchanged the stored digest is reused instead of re-reading the file.
+    """
+    stat = path.stat()
+    key = str(path)
+    if cache is not None:
+        entry = cache.get(key)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry["sha256"]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+            digest.update(block)
+    sha = digest.hexdigest()
+    if cache is not None:
+        cache[key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha}
+    return sha
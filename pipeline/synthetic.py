@@ -0,0 +1,273 @@
+"""
+Synthetic riders, trips and sessions at a multiple of the repository's data.
+
+`generate(scale, out_dir)` writes `scale` times as many riders as
+data/riders.csv, with their trips and sessions, in the raw schemas of data/
+(riders.csv, trips.csv, sessions.csv, plus a copy of promotions.csv) and the web
+app's files of frontend/data/ (riders_trips.csv, rfm_data.csv, and the
+rider table riders_trips_rfms_churned.csv that the pipeline writes to
+data/processed_data/). Pointing the dashboard at the directory
+(DASHBOARD_DATA_DIR) runs every page on the generated data.
+
+Each synthetic rider copies the attributes and the trip behaviour (trip count,
+average fare, surge and tip) of a resampled real rider from
+data/riders_trips_churned.csv, so per-rider spread and its correlation with
+city and loyalty tier carry over. Individual trips scatter around those
+averages with the trip-level spread printed by the EDA notebooks (the raw trip
+file is not in data/), rescaled so each rider's fare and tip means equal the
+copied averages; pickup times are uniform over the observed trip window
+and sessions resample (time on app, pages, converted) rows of data/sessions.csv.
+
+Riders are generated in blocks of BLOCK_RIDERS and appended to the CSVs, so
+memory stays bounded at 100x. Rider-level tables reuse the pipeline's own stage
+functions per block (`riders_trips`, `data_eda`, `user_agg_df`); recency is then
+recomputed against the snapshot of the whole trip table and RFMS segments
+(`riders_trips_rfms`) are assigned over all riders at once.
+"""
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from output.webapp.common.timestamps import to_datetime_utc
+
+from .paths import DATA_DIR
+from .stages import data_eda, riders_trips, riders_trips_rfms, riders_trips_rfms_churned, user_agg_df
+
+SCALES = (1, 10, 100)
+DEFAULT_DIR = DATA_DIR / "synthetic"
+BLOCK_RIDERS = 50_000
+SEED = 7
+
+# Trip-level spread printed by notebooks/01_EDA of Business (`describe` and
+# `value_counts` of the 200k-trip table). Cloudy/Foggy split the non-Sunny,
+# non-Rainy share evenly; the notebooks only show the first two.
+FARE_STD = 6.163
+TIP_SHARE = 0.35            # trips with a tip (median tip is 0, 75th percentile 0.40)
+SURGE_SHARE = 0.45          # trips with surge (median multiplier is 1.0, 75th percentile 1.2)
+MAX_SURGE_STEPS = 28        # multiplier capped at 3.8
+PAYMENT_SHARES = {"Card": 0.5, "Mobile Money": 0.4, "Cash": 0.1}
+WEATHER_SHARES = {"Sunny": 0.6, "Rainy": 0.2, "Cloudy": 0.1, "Foggy": 0.1}
+CITY_CENTRES = {"Nairobi": (-1.29, 36.82), "Lagos": (6.52, 3.38), "Cairo": (30.04, 31.24)}
+CITY_SPREAD_DEG = 0.2
+MEAN_DISTANCE_KM = 4.15     # mean of riders_trips_rfms_churned.avg_distance
+DISTANCE_SHAPE = 6.0        # gamma shape; matches the spread of avg_distance over ~20 trips
+DURATION_MINUTES = (5, 60)  # uniform; mean matches riders_trips_rfms_churned.avg_duration
+DRIVERS_PER_RIDER = 0.5     # data/drivers.csv: 5,000 drivers for 10,000 riders
+
+# Frontend files: the trip columns the pages read, and the rider table (the pipeline's
+# riders_trips_rfms_churned) whose user_id and model features the churn benches and pages use
+RIDERS_FILE = "riders_trips_rfms_churned.csv"
+WEBAPP_TRIP_COLUMNS = ["trip_id", "user_id", "city", "loyalty_status", "pickup_time", "pickup_hour",
+                       "fare", "tip", "total_fare", "total_fare_with_tip"]
+RIDER_FEATURE_COLUMNS = ["user_id", "recency", "total_trips", "avg_spend", "total_tip", "avg_tip",
+                         "avg_rating_given", "avg_distance", "avg_duration", "loyalty_status",
+                         "RFMS_segment", "city"]
+
+
+def rider_features(path: Path) -> pd.DataFrame:
+    """user_id and the model's raw features from a rider table."""
+    return pd.read_csv(path, usecols=RIDER_FEATURE_COLUMNS, dtype={"user_id": str})[RIDER_FEATURE_COLUMNS]
+
+
+# rfm_data.csv: quintile scores of recency (reversed), frequency and monetary, summed
+RFM_SEGMENTS = [(5, "At Risk Users"), (8, "Occasional Riders"), (11, "Regular Commuters"),
+                (15, "High‑Value Loyalists")]
+
+
+class Profile:
+    """Distributions fitted from the repository's data files."""
+
+    def __init__(self, data_dir: Path = DATA_DIR):
+        riders = pd.read_csv(data_dir / "riders_trips_churned.csv")
+        self.riders = riders[["signup_date", "loyalty_status", "age", "city", "avg_rating_given", "churn_prob",
+                              "total_trips", "avg_fare", "avg_tip", "avg_surge"]].reset_index(drop=True)
+        self.referred_share = riders["referred_by"].notna().mean()
+        first = to_datetime_utc(riders["first_trip_time"]).min()
+        last = to_datetime_utc(riders["last_trip_time"]).max()
+        self.trip_window = (first.value, last.value)
+        # Between-rider spread of average fares is already in the resampled riders; trips add the rest
+        between = riders["avg_fare"].std()
+        self.fare_sigma = np.sqrt(np.log1p(max(FARE_STD ** 2 - between ** 2, 0.0) / riders["avg_fare"].mean() ** 2))
+
+        sessions = pd.read_csv(data_dir / "sessions.csv")
+        self.sessions = sessions[["time_on_app", "pages_visited", "converted"]].reset_index(drop=True)
+        per_rider = sessions["rider_id"].value_counts().reindex(riders["user_id"], fill_value=0)
+        self.sessions_per_rider = per_rider.to_numpy()
+        times = to_datetime_utc(sessions["session_time"])
+        self.session_window = (times.min().value, times.max().value)
+
+
+def _utc(ns: np.ndarray) -> pd.Series:
+    return pd.Series(pd.to_datetime(ns, utc=True)).dt.floor("s")
+
+
+def _choice(rng, shares: dict, n: int) -> np.ndarray:
+    return rng.choice(np.array(list(shares), dtype=object), size=n, p=list(shares.values()))
+
+
+def _riders(rng, profile: Profile, start: int, n: int, total: int, width: int) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """A block of riders (data/riders.csv schema) and the real riders' trip behaviour they copy."""
+    source = profile.riders.iloc[rng.integers(0, len(profile.riders), n)].reset_index(drop=True)
+    ids = np.arange(start, start + n)
+    referred = rng.random(n) < profile.referred_share
+    referrer = rng.integers(0, total, n)
+    riders = pd.DataFrame({
+        "user_id": [f"R{i:0{width}d}" for i in ids],
+        "signup_date": source["signup_date"],
+        "loyalty_status": source["loyalty_status"],
+        "age": np.clip(source["age"] + rng.normal(0, 1, n), 18, 70),
+        "city": source["city"],
+        "avg_rating_given": source["avg_rating_given"],
+        "churn_prob": source["churn_prob"],
+        "referred_by": [f"R{r:0{width}d}" if ok and r != i else None for r, ok, i in zip(referrer, referred, ids)],
+    })
+    return riders, source[["total_trips", "avg_fare", "avg_tip", "avg_surge"]]
+
+
+def _rescaled(rider: np.ndarray, values: np.ndarray, target_mean: np.ndarray) -> np.ndarray:
+    """Scale each rider's values so their mean is the copied rider's average (riders with all zeros stay zero)."""
+    counts = np.bincount(rider, minlength=len(target_mean))
+    mean = np.bincount(rider, weights=values, minlength=len(target_mean)) / np.maximum(counts, 1)
+    factor = np.divide(target_mean, mean, out=np.zeros_like(mean), where=mean > 0)
+    return values * factor[rider]
+
+
+def _trips(rng, profile: Profile, riders: pd.DataFrame, behaviour: pd.DataFrame, first_trip: int,
+           drivers: int, width: int) -> pd.DataFrame:
+    """Trips of a block of riders in the schema of the raw trips table, shuffled."""
+    counts = behaviour["total_trips"].to_numpy()
+    rider = np.repeat(np.arange(len(riders)), counts)
+    n = len(rider)
+    sigma = profile.fare_sigma
+    fare = np.round(_rescaled(rider, np.exp(rng.normal(0, sigma, n)), behaviour["avg_fare"].to_numpy()), 2)
+
+    # Surge in steps of 0.1: none with probability 1 - SURGE_SHARE, else a geometric number of
+    # steps whose mean reproduces the rider's average multiplier
+    excess = np.maximum(behaviour["avg_surge"].to_numpy()[rider] - 1, 1e-3)
+    step_p = np.clip(SURGE_SHARE * 0.1 / excess, 0.05, 1.0)
+    steps = np.where(rng.random(n) < SURGE_SHARE, np.minimum(rng.geometric(step_p), MAX_SURGE_STEPS), 0)
+    surge = np.round(1 + 0.1 * steps, 1)
+
+    tip = np.where(rng.random(n) < TIP_SHARE, rng.exponential(1.0, n), 0.0)
+    tip = np.round(_rescaled(rider, tip, behaviour["avg_tip"].to_numpy()), 2)
+
+    pickup_ns = rng.integers(*profile.trip_window, n)
+    duration_min = rng.integers(*DURATION_MINUTES, n)
+    city = riders["city"].to_numpy()[rider]
+    centre = np.array([CITY_CENTRES[c] for c in riders["city"]])[rider]
+    pickup_lat = centre[:, 0] + rng.normal(0, CITY_SPREAD_DEG, n)
+    pickup_lng = centre[:, 1] + rng.normal(0, CITY_SPREAD_DEG, n)
+    distance_km = rng.gamma(DISTANCE_SHAPE, MEAN_DISTANCE_KM / DISTANCE_SHAPE, n)
+    bearing = rng.uniform(0, 2 * np.pi, n)
+    dlat = distance_km * np.cos(bearing) / 111.32
+    dlng = distance_km * np.sin(bearing) / (111.32 * np.cos(np.radians(pickup_lat)))
+
+    order = rng.permutation(n)
+    ids = np.arange(first_trip, first_trip + n)
+    pickup = _utc(pickup_ns[order])
+    return pd.DataFrame({
+        "trip_id": [f"T{i:0{width + 1}d}" for i in ids],
+        "user_id": riders["user_id"].to_numpy()[rider][order],
+        "driver_id": [f"D{d:0{width}d}" for d in rng.integers(0, drivers, n)],
+        "fare": fare[order],
+        "surge_multiplier": surge[order],
+        "tip": tip[order],
+        "payment_type": _choice(rng, PAYMENT_SHARES, n),
+        "pickup_time": pickup,
+        "dropoff_time": pickup + pd.to_timedelta(duration_min[order], unit="min"),
+        "pickup_lat": pickup_lat[order],
+        "pickup_lng": pickup_lng[order],
+        "dropoff_lat": (pickup_lat + dlat)[order],
+        "dropoff_lng": (pickup_lng + dlng)[order],
+        "weather": _choice(rng, WEATHER_SHARES, n),
+        "city": city[order],
+        "loyalty_status": riders["loyalty_status"].to_numpy()[rider][order],
+    })
+
+
+def _sessions(rng, profile: Profile, riders: pd.DataFrame, first_session: int, width: int) -> pd.DataFrame:
+    counts = rng.choice(profile.sessions_per_rider, len(riders))
+    rider = np.repeat(np.arange(len(riders)), counts)
+    n = len(rider)
+    source = profile.sessions.iloc[rng.integers(0, len(profile.sessions), n)].reset_index(drop=True)
+    order = rng.permutation(n)
+    return pd.DataFrame({
+        "session_id": [f"S{i:0{width + 1}d}" for i in range(first_session, first_session + n)],
+        "rider_id": riders["user_id"].to_numpy()[rider][order],
+        "session_time": _utc(rng.integers(*profile.session_window, n)),
+        "time_on_app": source["time_on_app"],
+        "pages_visited": source["pages_visited"],
+        "converted": source["converted"],
+        "city": riders["city"].to_numpy()[rider][order],
+        "loyalty_status": riders["loyalty_status"].to_numpy()[rider][order],
+    })
+
+
+def _quintile(values: pd.Series, reverse: bool = False) -> pd.Series:
+    score = pd.qcut(values, 5, labels=False, duplicates="drop") + 1
+    return score.max() + 1 - score if reverse else score
+
+
+def rfm_table(users: pd.DataFrame, last_trip: pd.Series) -> pd.DataFrame:
+    """frontend/data/rfm_data.csv from per-rider aggregates (`user_agg_df`) and each rider's last pickup."""
+    rfm = pd.DataFrame({
+        "user_id": users["user_id"],
+        "recency": users["recency"],
+        "frequency": users["total_trips"],
+        "monetary": users["total_spend"].round(2),
+        "last_trip_time": last_trip.dt.strftime("%Y-%m-%d").to_numpy(),
+    })
+    rfm["rfm_score"] = _quintile(rfm["recency"], reverse=True) + _quintile(rfm["frequency"]) + _quintile(rfm["monetary"])
+    bounds, names = zip(*RFM_SEGMENTS)
+    rfm["segments"] = np.asarray(names, dtype=object)[np.searchsorted(bounds, rfm["rfm_score"])]
+    return rfm
+
+
+def _append(df: pd.DataFrame, path: Path, first: bool):
+    df.to_csv(path, mode="w" if first else "a", header=first, index=False)
+
+
+def generate(scale: float, out_dir, data_dir: Path = DATA_DIR, seed: int = SEED,
+             block_riders: int = BLOCK_RIDERS) -> dict:
+    """Write the raw and web-app tables for `scale` times the riders of `data_dir`; returns row counts."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    profile = Profile(data_dir)
+    total = max(int(round(len(profile.riders) * scale)), 1)
+    width = max(5, len(str(total - 1)))
+    drivers = max(int(total * DRIVERS_PER_RIDER), 1)
+
+    started = time.perf_counter()
+    users, last_trips = [], []
+    n_trips = n_sessions = 0
+    for start in range(0, total, block_riders):
+        first = start == 0
+        riders, behaviour = _riders(rng, profile, start, min(block_riders, total - start), total, width)
+        trips = _trips(rng, profile, riders, behaviour, n_trips, drivers, width)
+        sessions = _sessions(rng, profile, riders, n_sessions, width)
+        _append(riders, out_dir / "riders.csv", first)
+        _append(trips, out_dir / "trips.csv", first)
+        _append(sessions, out_dir / "sessions.csv", first)
+        n_trips += len(trips)
+        n_sessions += len(sessions)
+
+        eda = data_eda(riders_trips(riders, trips))
+        _append(eda[WEBAPP_TRIP_COLUMNS], out_dir / "riders_trips.csv", first)
+        users.append(user_agg_df(eda))
+        last_trips.append(eda.groupby("user_id")["pickup_time"].max())
+        print(f"  {start + len(riders):,}/{total:,} riders, {n_trips:,} trips ({time.perf_counter() - started:.0f} s)")
+
+    users = pd.concat(users, ignore_index=True)
+    last_trip = pd.concat(last_trips).reindex(users["user_id"])
+    # Each block's recency used its own latest pickup; all riders share the table's snapshot
+    snapshot = last_trip.max() + pd.Timedelta(days=1)
+    users["recency"] = (snapshot - last_trip).dt.days.to_numpy()
+    rfms = riders_trips_rfms(users)
+    riders_trips_rfms_churned(rfms).to_csv(out_dir / RIDERS_FILE, index=False)
+    rfm_table(users, last_trip).to_csv(out_dir / "rfm_data.csv", index=False)
+    shutil.copyfile(data_dir / "promotions.csv", out_dir / "promotions.csv")
+    return {"riders": total, "trips": n_trips, "sessions": n_sessions, "seconds": time.perf_counter() - started}
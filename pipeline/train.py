@@ -0,0 +1,210 @@
+"""
+Churn model training and selection.
+
+Ports the model comparison of
+"03_Customer Churn Prediction/02_Data Processing & Classification Model Development.ipynb"
+to a command that:
+
+1. builds the same preprocessor (RobustScaler / OrdinalEncoder / OneHotEncoder),
+   fitted once per CV fold and shared by every candidate model;
+2. fits all (model, fold) pairs in parallel and collects out-of-fold probabilities;
+3. sweeps the notebook's threshold grid on those probabilities and picks the model
+   and threshold with the lowest business cost (missed churners cost more than
+   unneeded retention offers);
+4. refits the winner on all riders and writes the preprocessor, model and metadata
+   to the files `ChurnModelService` loads. A tree-based winner is also exported
+   as a flat, memory-mapped `.forest` file (`backend/forest.py`), and the training
+   distributions the drift monitor compares traffic with are saved next to it.
+
+Artifacts are written with the installed scikit-learn, so the loader's
+monotonic_cst compatibility patch is not needed for them.
+"""
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import AdaBoostClassifier, GradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import StratifiedKFold
+from sklearn.naive_bayes import GaussianNB
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, RobustScaler
+from sklearn.tree import DecisionTreeClassifier
+
+from output.webapp.backend.drift import DRIFT_REFERENCE_PATH, build_reference, save_reference
+from output.webapp.backend.forest import export_forest, file_sha256
+from output.webapp.backend.model_loader import METADATA_PATH, MODEL_PATH, PREPROCESSOR_PATH, RAW_FEATURE_ORDER
+
+from .storage import read_dataset
+
+TRAINING_DATASET = "riders_trips_rfms_churned"
+TARGET = "churned"
+
+NUMERIC_FEATURES = [
+    "recency", "total_trips", "avg_spend", "total_tip", "avg_tip",
+    "avg_rating_given", "avg_distance", "avg_duration",
+]
+ORDINAL_FEATURES = ["loyalty_status", "RFMS_segment"]
+NOMINAL_FEATURES = ["city"]
+ORDINAL_CATEGORIES = [
+    ["Bronze", "Silver", "Gold", "Platinum"],
+    ["At Risk", "Occasional Riders", "Core Loyal Riders", "High-Value Surge-Tolerant"],
+]
+
+THRESHOLD_GRID = np.round(np.arange(0.05, 0.95, 0.05), 2)
+DEFAULT_FN_COST = 5.0  # a churner we did not target
+DEFAULT_FP_COST = 1.0  # a retention offer sent to a rider who would have stayed
+
+
+def build_preprocessor() -> ColumnTransformer:
+    return ColumnTransformer(
+        transformers=[
+            ("num", Pipeline(steps=[("scaler", RobustScaler())]), NUMERIC_FEATURES),
+            ("ord", Pipeline(steps=[("ordinal_encoder", OrdinalEncoder(
+                categories=ORDINAL_CATEGORIES, handle_unknown="use_encoded_value", unknown_value=-1))]),
+             ORDINAL_FEATURES),
+            ("cat", Pipeline(steps=[("encoder", OneHotEncoder(handle_unknown="ignore", sparse_output=False))]),
+             NOMINAL_FEATURES),
+        ],
+        verbose_feature_names_out=False,
+    )
+
+
+def candidate_models() -> dict:
+    return {
+        "LogisticRegression": LogisticRegression(random_state=42, class_weight="balanced", solver="lbfgs", max_iter=1000),
+        "RF_Classifier": RandomForestClassifier(random_state=42, class_weight="balanced"),
+        "GB_Classifier": GradientBoostingClassifier(random_state=42),
+        "AdaBoost_Classifier": AdaBoostClassifier(random_state=42),
+        "Dt_Classifier": DecisionTreeClassifier(random_state=42),
+        "KNN_Classifier": KNeighborsClassifier(),
+        "NB_Classifier": GaussianNB(),
+    }
+
+
+def load_training_data() -> tuple[pd.DataFrame, np.ndarray]:
+    df = read_dataset(TRAINING_DATASET)
+    return df[RAW_FEATURE_ORDER], df[TARGET].to_numpy().astype(int)
+
+
+def transform_folds(X: pd.DataFrame, y: np.ndarray, n_splits: int) -> list[tuple]:
+    """Fit the preprocessor once per fold; every candidate model reuses the transformed arrays."""
+    folds = []
+    for train_idx, val_idx in StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=42).split(X, y):
+        pre = build_preprocessor().fit(X.iloc[train_idx])
+        columns = pre.get_feature_names_out()
+        X_train = pd.DataFrame(pre.transform(X.iloc[train_idx]), columns=columns)
+        X_val = pd.DataFrame(pre.transform(X.iloc[val_idx]), columns=columns)
+        folds.append((X_train, y[train_idx], X_val, val_idx))
+    return folds
+
+
+def _fit_fold(name: str, model, fold: tuple) -> tuple[str, np.ndarray, np.ndarray, float]:
+    X_train, y_train, X_val, val_idx = fold
+    start = time.perf_counter()
+    proba = clone(model).fit(X_train, y_train).predict_proba(X_val)[:, 1]
+    return name, val_idx, proba, time.perf_counter() - start
+
+
+def threshold_costs(y: np.ndarray, proba: np.ndarray, fn_cost: float, fp_cost: float) -> pd.DataFrame:
+    """Confusion counts, precision/recall and business cost for every threshold in THRESHOLD_GRID."""
+    predicted = proba[None, :] >= THRESHOLD_GRID[:, None]
+    actual = y.astype(bool)[None, :]
+    tp = (predicted & actual).sum(axis=1)
+    fp = (predicted & ~actual).sum(axis=1)
+    fn = (~predicted & actual).sum(axis=1)
+    return pd.DataFrame({
+        "threshold": THRESHOLD_GRID,
+        "precision": np.divide(tp, tp + fp, out=np.zeros(len(tp)), where=(tp + fp) > 0),
+        "recall": np.divide(tp, tp + fn, out=np.zeros(len(tp)), where=(tp + fn) > 0),
+        "false_positives": fp,
+        "false_negatives": fn,
+        "cost": fn_cost * fn + fp_cost * fp,
+    })
+
+
+def select_model(n_splits: int = 5, n_jobs: int = -1, fn_cost: float = DEFAULT_FN_COST,
+                 fp_cost: float = DEFAULT_FP_COST, models: dict = None, log=print) -> tuple[pd.DataFrame, dict]:
+    """
+    Cross-validate the candidate models in parallel.
+
+    Returns one row per model (best threshold, its cost, recall, precision, ROC AUC,
+    fit time), sorted best first, and the out-of-fold probabilities per model.
+    """
+    models = models or candidate_models()
+    X, y = load_training_data()
+    start = time.perf_counter()
+    folds = transform_folds(X, y, n_splits)
+    log(f"Preprocessed {n_splits} folds of {len(X)} riders in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_fold)(name, model, fold) for name, model in models.items() for fold in folds
+    )
+    log(f"Fitted {len(results)} model/fold pairs in {time.perf_counter() - start:.2f}s")
+
+    oof = {name: np.empty(len(y)) for name in models}
+    fit_seconds = dict.fromkeys(models, 0.0)
+    for name, val_idx, proba, seconds in results:
+        oof[name][val_idx] = proba
+        fit_seconds[name] += seconds
+
+    rows = []
+    for name, proba in oof.items():
+        costs = threshold_costs(y, proba, fn_cost, fp_cost)
+        best = costs.loc[costs["cost"].idxmin()]
+        rows.append({
+            "model": name,
+            "threshold": best["threshold"],
+            "cost": best["cost"],
+            "recall": best["recall"],
+            "precision": best["precision"],
+            "roc_auc": roc_auc_score(y, proba),
+            "fit_seconds": fit_seconds[name],
+        })
+    report = pd.DataFrame(rows).sort_values(["cost", "roc_auc"], ascending=[True, False]).reset_index(drop=True)
+    return report, oof
+
+
+def write_drift_reference(preprocessor, model, output_dir: Path = None) -> Path:
+    """Histograms of the training riders and of the model's probabilities on them (`backend/drift.py`)."""
+    X, _ = load_training_data()
+    X_t = pd.DataFrame(preprocessor.transform(X), columns=preprocessor.get_feature_names_out())
+    path = DRIFT_REFERENCE_PATH if output_dir is None else Path(output_dir) / DRIFT_REFERENCE_PATH.name
+    return save_reference(build_reference(X, model.predict_proba(X_t)[:, 1]), path)
+
+
+def train_and_save(model_name: str, threshold: float, output_dir: Path = None, models: dict = None) -> dict:
+    """Refit the preprocessor and the chosen model on all riders and write the serving artifacts."""
+    models = models or candidate_models()
+    X, y = load_training_data()
+    preprocessor = build_preprocessor().fit(X)
+    columns = preprocessor.get_feature_names_out()
+    model = clone(models[model_name]).fit(pd.DataFrame(preprocessor.transform(X), columns=columns), y)
+    metadata = {
+        "business_threshold": float(threshold),
+        "feature_columns": list(columns),
+        "model_name": model_name,
+        "sklearn_version": sklearn.__version__,
+    }
+
+    paths = {"model": MODEL_PATH, "metadata": METADATA_PATH, "preprocessor": PREPROCESSOR_PATH}
+    if output_dir is not None:
+        paths = {key: Path(output_dir) / path.name for key, path in paths.items()}
+    paths["model"].parent.mkdir(parents=True, exist_ok=True)
+    for key, obj in (("preprocessor", preprocessor), ("model", model), ("metadata", metadata)):
+        tmp = paths[key].with_name(paths[key].name + ".tmp")
+        joblib.dump(obj, tmp)
+        tmp.replace(paths[key])
+    if hasattr(model, "tree_") or isinstance(model, RandomForestClassifier):
+        paths["forest"] = export_forest(model, paths["model"].with_suffix(".forest"), file_sha256(paths["model"]))
+    paths["drift_reference"] = write_drift_reference(preprocessor, model, output_dir)
+    return {key: str(path) for key, path in paths.items()}
@@ -0,0 +1,63 @@
+import asyncio
+
+from output.webapp.backend.admission import MAX_ROW_BYTES, AdmissionController, AdmissionMiddleware
+
+
+def _controller():
+    return AdmissionController(limits={"single": 1, "batch": 1}, queue_limits={"single": 4, "batch": 4},
+                               queue_timeouts={"single": 5.0, "batch": 5.0}, enabled=True)
+
+
+def test_cancelled_waiter_gives_back_its_place():
+    async def scenario():
+        admission = _controller()
+        assert await admission.acquire("batch") == 0.0
+        queued = asyncio.create_task(admission.acquire("batch"))
+        await asyncio.sleep(0)
+        assert len(admission.classes["batch"].waiters) == 1
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+        admission.release("batch")
+        return admission.classes["batch"]
+
+    batch = asyncio.run(scenario())
+    assert batch.in_flight == 0
+    assert not batch.waiters
+
+
+def test_cancelled_after_dispatch_releases_the_slot():
+    async def scenario():
+        admission = _controller()
+        await admission.acquire("batch")
+        queued = asyncio.create_task(admission.acquire("batch"))
+        await asyncio.sleep(0)
+        admission.release("batch")  # hands the slot to the queued request
+        queued.cancel()             # which is cancelled before it resumes
+        (result,) = await asyncio.gather(queued, return_exceptions=True)
+        # Either the cancellation won (the slot was given back) or acquire returned and the caller owns the slot
+        if not isinstance(result, BaseException):
+            admission.release("batch")
+        return admission.classes["batch"]
+
+    assert asyncio.run(scenario()).in_flight == 0
+
+
+def test_oversize_content_length_is_rejected_before_the_body_is_read():
+    calls, sent = [], []
+
+    async def app(scope, receive, send):
+        calls.append(scope["path"])
+
+    async def receive():
+        raise AssertionError("the body must not be read")
+
+    async def send(message):
+        sent.append(message)
+
+    length = str(10 ** 9).encode()
+    scope = {"type": "http", "method": "POST", "path": "/predict/batch",
+             "headers": [(b"content-length", length)]}
+    asyncio.run(AdmissionMiddleware(app, _controller())(scope, receive, send))
+    assert not calls
+    assert sent[0]["status"] == 413
+    assert 10 ** 9 > MAX_ROW_BYTES
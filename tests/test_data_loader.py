@@ -0,0 +1,29 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "output" / "webapp" / "frontend"))
+
+import data_loader  # noqa: E402
+
+
+def test_writes_to_the_trip_table_never_reach_the_shared_copy(tmp_path, monkeypatch):
+    path = tmp_path / "riders_trips.csv"
+    pd.DataFrame({
+        "trip_id": ["T1", "T2"], "city": ["Lagos", "Cairo"], "fare": [10.0, 20.0],
+        "pickup_time": ["2025-04-01 08:00:00+00:00", "2025-04-02 09:30:00+01:00"],
+    }).to_csv(path, index=False)
+    monkeypatch.setattr(data_loader, "TRIPS_PATH", path)
+    expected = data_loader.trip_table().copy(deep=True)
+
+    df = data_loader.trip_table()
+    df.loc[0, "fare"] = -1.0
+    df.loc[0, "city"] = "Nowhere"
+    df.iloc[1, df.columns.get_loc("pickup_time")] = pd.Timestamp("2000-01-01", tz="UTC")
+    df["fare"] = 0.0
+    df["extra"] = 1
+    df.drop(columns="trip_id", inplace=True)
+    data_loader.load_data().loc[1, "fare"] = -2.0
+
+    pd.testing.assert_frame_equal(data_loader.trip_table(), expected)